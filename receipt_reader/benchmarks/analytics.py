@@ -0,0 +1,183 @@
+"""
+Times reader.analytics against the per-row Python loop it replaces.
+
+    python -m benchmarks.analytics --size 100000 --days 365 --repeat 5 --output analytics.json
+
+The loop walks every receipt's json_data the way ExpenseTrackerView used to, parsing dates
+and amounts row by row into dicts. The vectorized side is timed cold (loading the NumPy columns
+from the database, then computing) and warm (columns already loaded, as on every request
+until a receipt changes). Both sides compute the same report, and the daily series are
+checked against each other before any timing is reported.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from .run import PROJECT_DIR, git_revision
+
+
+def loop_report(start, end, window, year, month, limit, today):
+    from reader.models import Receipt
+    from reader.parsing import normalize_category, parse_amount, parse_date
+
+    daily = defaultdict(Decimal)
+    by_category = defaultdict(lambda: defaultdict(Decimal))
+    month_daily = defaultdict(Decimal)
+    amounts = defaultdict(list)
+    history_start = start - timedelta(days=window - 1)
+    month_start = date(year, month, 1)
+
+    for receipt in Receipt.objects.filter(json_data__isnull=False):
+        data = receipt.json_data
+        day = parse_date(data.get('Transaction Date'))
+        total = parse_amount(data.get('Total Amount'))
+        if day is None or total is None:
+            continue
+        category = normalize_category(data.get('Category'))
+        if start <= day < end:
+            daily[day] += total
+            amounts[category].append((receipt.id, day, total))
+        if history_start <= day < end:
+            by_category[category][day] += total
+        if day.year == year and day.month == month:
+            month_daily[day] += total
+
+    days = [start + timedelta(days=offset) for offset in range((end - start).days)]
+    daily_series = [float(daily.get(day, Decimal('0.00'))) for day in days]
+
+    weekly = defaultdict(Decimal)
+    for day in days:
+        weekly[day - timedelta(days=day.weekday())] += daily.get(day, Decimal('0.00'))
+
+    averages = {}
+    for category, per_day in by_category.items():
+        series = []
+        for day in days:
+            series.append(sum(per_day.get(day - timedelta(days=back), Decimal('0.00')) for back in range(window)) / window)
+        averages[category] = series
+
+    elapsed = min(max((today - month_start).days + 1, 0), 31)
+    spent = sum(total for day, total in month_daily.items() if day <= today)
+    days_in_month = ((month_start.replace(day=28) + timedelta(days=4)).replace(day=1) - month_start).days
+    elapsed = min(elapsed, days_in_month)
+    projected = spent + (spent / elapsed if elapsed else 0) * (days_in_month - elapsed)
+
+    outliers = []
+    for category, rows in amounts.items():
+        values = [float(total) for _, _, total in rows]
+        median = statistics.median(values)
+        mad = statistics.median([abs(value - median) for value in values])
+        if mad:
+            outliers.extend((0.6745 * (value - median) / mad, row) for value, row in zip(values, rows)
+                            if 0.6745 * (value - median) / mad > 3.5)
+    outliers.sort(key=lambda pair: -pair[0])
+
+    return {
+        'daily': daily_series,
+        'weekly': weekly,
+        'moving_averages': averages,
+        'projection': (spent, projected, limit),
+        'outliers': outliers[:20],
+    }
+
+
+def vectorized_report(columns, start, end, window, year, month, limit, today):
+    from reader import analytics
+
+    return {
+        'daily': analytics.daily_series(columns, start, end)['data'],
+        'weekly': analytics.weekly_series(columns, start, end),
+        'moving_averages': analytics.moving_averages(columns, start, end, window),
+        'projection': analytics.month_projection(columns, year, month, limit, today),
+        'outliers': analytics.outliers(columns, start, end),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, {'min_ms': round(min(samples), 2), 'median_ms': round(statistics.median(samples), 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark vectorized spend analytics against the per-row loop.")
+    parser.add_argument('--size', type=int, default=100000, help="Receipts in the dataset.")
+    parser.add_argument('--days', type=int, default=365, help="Length of the analysed range, ending today.")
+    parser.add_argument('--window', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='analytics-results.json')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    sys.path.insert(0, str(PROJECT_DIR))
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+
+    from reader.analytics import SpendColumns
+
+    from .datasets import seed
+
+    call_command('migrate', verbosity=0)
+    seed(args.size, stdout=sys.stdout)
+
+    today = date.today()
+    end = today + timedelta(days=1)
+    start = end - timedelta(days=args.days)
+    limit = Decimal('50000.00')
+    options = (start, end, args.window, today.year, today.month, limit, today)
+
+    loop, loop_times = timed(lambda: loop_report(*options), args.repeat)
+    columns, load_times = timed(SpendColumns.load, args.repeat)
+    vectorized, compute_times = timed(lambda: vectorized_report(columns, *options), args.repeat)
+    _, cold_times = timed(lambda: vectorized_report(SpendColumns.load(), *options), args.repeat)
+
+    mismatches = sum(1 for a, b in zip(loop['daily'], vectorized['daily']) if abs(a - b) > 0.005)
+    if mismatches or len(loop['daily']) != len(vectorized['daily']):
+        print(f"Daily series differ on {mismatches} days; not reporting timings.")
+        return 1
+
+    results = {
+        'loop': loop_times,
+        'vectorized_cold': cold_times,
+        'vectorized_load': load_times,
+        'vectorized_warm': compute_times,
+        'speedup_cold': round(loop_times['median_ms'] / cold_times['median_ms'], 1),
+        'speedup_warm': round(loop_times['median_ms'] / compute_times['median_ms'], 1),
+        'column_bytes': int(columns.ids.nbytes + columns.days.nbytes + columns.amounts.nbytes
+                            + columns.categories.nbytes),
+    }
+    for name in ('loop', 'vectorized_cold', 'vectorized_load', 'vectorized_warm'):
+        print(f"  {name:<16} median {results[name]['median_ms']:>10.2f} ms  min {results[name]['min_ms']:>10.2f} ms")
+    print(f"  speedup: {results['speedup_cold']}x cold, {results['speedup_warm']}x warm; "
+          f"{len(columns)} receipts in {results['column_bytes'] / 2 ** 20:.1f} MB of columns")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'receipts': len(columns),
+            'days': args.days,
+            'window': args.window,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Synthetic receipts with realistic json_data, in the shape the extraction prompt asks the model for.
+"""
+import random
+from datetime import date, timedelta
+
+MERCHANTS = {
+    'Groceries': ['City Mart', 'FreshBasket', 'Nature\'s Pantry', 'Reliance Fresh', 'More Supermarket'],
+    'Dining': ['Cafe Coffee Day', 'Domino\'s Pizza', 'Barbeque Nation', 'Haldiram\'s', 'Chai Point'],
+    'Transport': ['Indian Oil', 'HP Petrol Pump', 'Uber', 'Ola Cabs', 'Metro Card Recharge'],
+    'Shopping': ['Lifestyle', 'Decathlon', 'Croma', 'Westside', 'Reliance Digital'],
+    'Utilities': ['BESCOM', 'Airtel', 'Jio Fiber', 'BWSSB', 'Tata Power'],
+    'Entertainment': ['PVR Cinemas', 'BookMyShow', 'INOX', 'Timezone', 'Smaaash'],
+    'Other': ['Apollo Pharmacy', 'Post Office', 'Local Store', 'MedPlus', 'Stationery World'],
+}
+
+ITEMS = {
+    'Groceries': [('Basmati Rice 5kg', 450, 900), ('Toor Dal 1kg', 120, 180), ('Milk 1L', 54, 70),
+                  ('Sunflower Oil 1L', 140, 210), ('Eggs (12)', 70, 110), ('Pressure Cooker', 1200, 2800)],
+    'Dining': [('Masala Dosa', 80, 160), ('Paneer Tikka', 220, 380), ('Cappuccino', 150, 260),
+               ('Veg Biryani', 180, 320), ('Margherita Pizza', 250, 550)],
+    'Transport': [('Petrol', 500, 3500), ('Diesel', 500, 3000), ('Trip fare', 90, 650), ('Metro recharge', 200, 1000)],
+    'Shopping': [('Running Shoes', 1500, 6000), ('Bluetooth Headphones', 1200, 9000), ('Cotton Shirt', 600, 2200),
+                 ('Backpack', 800, 3500), ('Smart Watch', 2500, 15000)],
+    'Utilities': [('Electricity bill', 600, 4500), ('Mobile recharge', 199, 999), ('Broadband', 499, 1499),
+                  ('Water bill', 150, 900)],
+    'Entertainment': [('Movie ticket', 180, 450), ('Popcorn combo', 250, 550), ('Game credits', 300, 1500)],
+    'Other': [('Paracetamol', 20, 60), ('Speed post', 40, 120), ('Notebook', 40, 150), ('Vitamins', 250, 900)],
+}
+
+
+def fake_receipt(rng: random.Random, transaction_date: date = None) -> dict:
+    """
+    One receipt's json_data: a merchant, one to eight line items, tax and a total that adds up.
+    """
+    category = rng.choice(list(MERCHANTS))
+    transaction_date = transaction_date or date.today() - timedelta(days=rng.randrange(365))
+    items = []
+    for name, low, high in rng.sample(ITEMS[category], k=min(len(ITEMS[category]), rng.randint(1, 8))):
+        items.append({'Item': name, 'Price': f"{rng.uniform(low, high):.2f}"})
+    subtotal = sum(float(item['Price']) for item in items)
+    tax = round(subtotal * rng.choice([0, 0.05, 0.12, 0.18]), 2)
+    return {
+        'Merchant Name': rng.choice(MERCHANTS[category]),
+        'Transaction Date': transaction_date.isoformat(),
+        'Items': items,
+        'Tax': f"{tax:.2f}",
+        'Total Amount': f"{subtotal + tax:.2f}",
+        'Category': category,
+    }
+
+
+def seed(count, days=365, seed_value=0, batch_size=2000, stdout=None):
+    """
+    Tops the database up to at least `count` extracted receipts spread over the last `days` days,
+    with their line items, then rebuilds the spend rollups. Returns the number of receipts added.
+    """
+    from django.db import transaction
+
+    from reader.models import MonthlySpendRollup, Receipt, ReceiptItem
+
+    existing = Receipt.objects.filter(json_data__isnull=False).count()
+    missing = count - existing
+    if missing <= 0:
+        return 0
+
+    rng = random.Random(seed_value + existing)
+    today = date.today()
+    added = 0
+    while added < missing:
+        receipts = []
+        for index in range(min(batch_size, missing - added)):
+            receipt = Receipt(image=f"receipts/bench-{existing + added + index}.png")
+            receipt.set_extraction(fake_receipt(rng, today - timedelta(days=rng.randrange(days))))
+            receipts.append(receipt)
+        with transaction.atomic():
+            receipts = Receipt.objects.bulk_create(receipts)
+            if receipts[0].pk is None:
+                # MySQL does not return primary keys from bulk inserts
+                receipts = list(Receipt.objects.filter(image__in=[receipt.image.name for receipt in receipts]))
+            ReceiptItem.objects.bulk_create(
+                [item for receipt in receipts for item in receipt.build_items()], batch_size=batch_size
+            )
+        added += len(receipts)
+        if stdout:
+            stdout.write(f"  seeded {existing + added}/{count} receipts\n")
+
+    MonthlySpendRollup.rebuild()
+    return added
@@ -0,0 +1,105 @@
+"""
+A stand-in for google.generativeai with the same surface the app uses.
+
+Point GENAI_MODULE at 'benchmarks.fake_genai' and every model call sleeps for a configurable
+latency and returns canned output instead of going over the network:
+
+    BENCHMARK_LLM_LATENCY   seconds per call (default 0.5)
+    BENCHMARK_LLM_JITTER    +/- random seconds added to each call (default 0.1)
+    BENCHMARK_LLM_ERROR_RATE share of calls that fail with a quota error (default 0)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+
+from .datasets import fake_receipt
+
+CHAT_ANSWER = (
+    "You spent the most on Groceries this month. Your largest single purchase was a pressure cooker "
+    "from City Mart, and your spending is within your budget so far."
+)
+
+_configured = {}
+
+
+def configure(**kwargs):
+    _configured.update(kwargs)
+
+
+class ResourceExhausted(Exception):
+    """Same name and code as the google.api_core error for HTTP 429."""
+    code = 429
+
+
+def _latency():
+    latency = float(os.getenv('BENCHMARK_LLM_LATENCY', '0.5'))
+    jitter = float(os.getenv('BENCHMARK_LLM_JITTER', '0.1'))
+    return max(0.0, latency + random.uniform(-jitter, jitter))
+
+
+def _maybe_fail():
+    if random.random() < float(os.getenv('BENCHMARK_LLM_ERROR_RATE', '0')):
+        raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+
+
+def _sleep():
+    time.sleep(_latency())
+    _maybe_fail()
+
+
+async def _asleep():
+    await asyncio.sleep(_latency())
+    _maybe_fail()
+
+
+class UsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class GenerateContentResponse:
+    def __init__(self, text, prompt_chars=0):
+        self.text = text
+        self.usage_metadata = UsageMetadata(prompt_chars // 4 + 1, len(text) // 4 + 1)
+
+
+class UploadedFile:
+    def __init__(self, mime_type):
+        self.name = f"files/fake-{random.getrandbits(32):08x}"
+        self.mime_type = mime_type
+
+
+def upload_file(path=None, mime_type=None, **kwargs):
+    _sleep()
+    return UploadedFile(mime_type)
+
+
+class GenerativeModel:
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+
+    def _answer(self, contents):
+        if isinstance(contents, (list, tuple)):
+            # Prompt plus image part: an extraction call
+            prompt = str(contents[0])
+            return json.dumps(fake_receipt(random.Random())), len(prompt)
+        return CHAT_ANSWER, len(str(contents))
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        _sleep()
+        text, prompt_chars = self._answer(contents)
+        if not stream:
+            return GenerateContentResponse(text, prompt_chars)
+        words = text.split(' ')
+        chunks = [GenerateContentResponse(' '.join(words[i:i + 8]) + ' ') for i in range(0, len(words), 8)]
+        # Like the real SDK, the final chunk reports the usage for the whole call
+        chunks[-1].usage_metadata = GenerateContentResponse(text, prompt_chars).usage_metadata
+        return iter(chunks)
+
+    async def generate_content_async(self, contents, **kwargs):
+        await _asleep()
+        return GenerateContentResponse(*self._answer(contents))
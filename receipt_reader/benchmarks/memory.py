@@ -0,0 +1,192 @@
+"""
+Compares memory per in-flight model request between the WSGI and ASGI deployments.
+
+    python -m benchmarks.memory --concurrency 10 50 200 --latency 2 --output memory.json
+
+Each server runs as a single process against the Gemini stand-in: gunicorn with one thread
+per concurrent request for WSGI (a blocked model call holds its thread), and uvicorn for ASGI
+(the async views await it). After a warm-up, `--concurrency` chatbot requests are fired at once
+and the server's resident memory is sampled until they finish. Memory per request is the peak
+growth over the idle baseline divided by the number of requests.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .run import CHAT_QUESTIONS, PROJECT_DIR, git_revision, percentile
+
+SERVERS = {
+    'wsgi': {
+        'path': '/api/chatbot/',
+        'command': lambda port, concurrency: [
+            sys.executable, '-m', 'gunicorn', 'receipt_reader.wsgi', '--bind', f'127.0.0.1:{port}',
+            '--workers', '1', '--worker-class', 'gthread', '--threads', str(concurrency), '--timeout', '120',
+        ],
+    },
+    'asgi': {
+        'path': '/api/async/chatbot/',
+        'command': lambda port, concurrency: [
+            sys.executable, '-m', 'uvicorn', 'receipt_reader.asgi:application', '--host', '127.0.0.1',
+            '--port', str(port), '--workers', '1', '--no-access-log', '--backlog', str(max(2048, concurrency)),
+        ],
+    },
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def rss(process):
+    """Resident memory of a process and its children, in bytes."""
+    import psutil
+
+    total = 0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += proc.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+def wait_until_up(port, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with status {server.returncode}.")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("The server did not start in time.")
+
+
+def measure(mode, concurrency, env, warmup=5):
+    import psutil
+    import requests
+
+    port = free_port()
+    spec = SERVERS[mode]
+    url = f"http://127.0.0.1:{port}{spec['path']}"
+    server = subprocess.Popen(spec['command'](port, concurrency), cwd=PROJECT_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port, server)
+        process = psutil.Process(server.pid)
+        for index in range(warmup):
+            requests.post(url, json={'query': CHAT_QUESTIONS[index % len(CHAT_QUESTIONS)]}, timeout=120)
+        time.sleep(0.5)
+        baseline = rss(process)
+
+        peak = baseline
+        done = threading.Event()
+
+        def sample():
+            nonlocal peak
+            while not done.is_set():
+                peak = max(peak, rss(process))
+                time.sleep(0.05)
+
+        def ask(index):
+            started = time.perf_counter()
+            try:
+                ok = requests.post(url, json={'query': CHAT_QUESTIONS[index % len(CHAT_QUESTIONS)]},
+                                   timeout=120).ok
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(ask, range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        sampler.join()
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    return {
+        'server': mode,
+        'concurrency': concurrency,
+        'errors': sum(1 for _, ok in samples if not ok),
+        'elapsed_s': round(elapsed, 3),
+        'baseline_rss_mb': round(baseline / 2 ** 20, 1),
+        'peak_rss_mb': round(peak / 2 ** 20, 1),
+        'kb_per_request': round((peak - baseline) / concurrency / 1024, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'max': round(latencies[-1], 2),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory per concurrent model request, WSGI vs ASGI.")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument('--size', type=int, default=1000, help="Receipts in the dataset the chatbot reads from.")
+    parser.add_argument('--latency', type=float, default=2.0,
+                        help="Seconds per fake model call; long enough for every request to be in flight at once.")
+    parser.add_argument('--output', default='memory-results.json')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    os.environ['BENCHMARK_LLM_LATENCY'] = str(args.latency)
+    os.environ['BENCHMARK_LLM_JITTER'] = '0'
+    sys.path.insert(0, str(PROJECT_DIR))
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+
+    from .datasets import seed
+
+    call_command('migrate', verbosity=0)
+    seed(args.size, stdout=sys.stdout)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(PROJECT_DIR), os.getenv('PYTHONPATH')])))
+
+    results = []
+    for concurrency in args.concurrency:
+        for mode in args.servers:
+            row = measure(mode, concurrency, env)
+            results.append(row)
+            print(f"{mode:<5} {concurrency:>5} in flight  baseline {row['baseline_rss_mb']:>7.1f} MB  "
+                  f"peak {row['peak_rss_mb']:>7.1f} MB  {row['kb_per_request']:>8.1f} KB/request  "
+                  f"p95 {row['latency_ms']['p95']:>9.1f} ms  {row['errors']} errors")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'llm_latency_s': args.latency,
+            'dataset': args.size,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""
+Load-tests the API against a local Gemini stand-in and synthetic datasets.
+
+    python -m benchmarks.run --sizes 1000 10000 100000 --concurrency 8 --requests 200 \
+        --latency 0.5 --output bench.json --baseline previous.json
+
+For each dataset size the database is topped up with synthetic receipts, the app is served
+from an in-process threaded WSGI server, and every scenario is run with `--concurrency` clients.
+Results (latency percentiles in milliseconds, throughput, errors) are written as JSON; with
+`--baseline` the p95 latencies are compared against an earlier run and the exit status is 1
+if any scenario got slower than `--threshold` times its baseline.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_IMAGE = PROJECT_DIR / 'receipts' / 'g1.png'
+SCENARIOS = ['tracker', 'expense-report', 'chatbot', 'process']
+CHAT_QUESTIONS = [
+    "How much did I spend on groceries last month?",
+    "What was my most expensive purchase this year?",
+    "Did I spend more on dining or transport in the last week?",
+    "Which merchant do I visit the most?",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, math.ceil(pct / 100 * len(values)) - 1))
+    return values[rank]
+
+
+class Client:
+    """One requests.Session per thread, so connections are reused like a real browser's."""
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url
+        self._requests = requests
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = self._requests.Session()
+        return self._local.session
+
+    def get(self, path, **kwargs):
+        return self.session.get(self.base_url + path, timeout=120, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.session.post(self.base_url + path, timeout=120, **kwargs)
+
+
+def tracker(client, rng):
+    return client.get('/api/tracker/').ok
+
+
+def expense_report(client, rng):
+    response = client.get('/api/expense-report/', params={'top': 10})
+    return response.ok or response.status_code == 404
+
+
+def chatbot(client, rng):
+    return client.post('/api/chatbot/', json={'query': rng.choice(CHAT_QUESTIONS)}).ok
+
+
+def process(client, rng, image=SAMPLE_IMAGE.read_bytes() if SAMPLE_IMAGE.exists() else b''):
+    # Trailing random bytes make every upload unique, so the extraction cache never answers for the model
+    upload = image + rng.randbytes(16)
+    response = client.post('/api/process/', files={'image': (f"bench-{rng.getrandbits(32)}.png", upload, 'image/png')})
+    if response.status_code != 202:
+        return False
+    job = response.json()
+    status_path = f"/api/process/{job['id']}/"
+    while job['status'] in ('pending', 'running'):
+        time.sleep(0.05)
+        job = client.get(status_path).json()
+    return job['status'] == 'done'
+
+
+SCENARIO_FUNCTIONS = {
+    'tracker': tracker,
+    'expense-report': expense_report,
+    'chatbot': chatbot,
+    'process': process,
+}
+
+
+def run_scenario(name, client, requests, concurrency, warmup=3):
+    scenario = SCENARIO_FUNCTIONS[name]
+    for index in range(warmup):
+        scenario(client, random.Random(-index - 1))
+
+    def timed(index):
+        started = time.perf_counter()
+        try:
+            ok = scenario(client, random.Random(index))
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    return {
+        'scenario': name,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': sum(1 for _, ok in samples if not ok),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 2),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p90': round(percentile(latencies, 90), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(latencies[-1], 2),
+        },
+    }
+
+
+def start_server():
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Prints p95 changes against a previous run. Returns True if nothing regressed past the threshold.
+    """
+    with open(baseline_path) as f:
+        baseline = {(row['dataset'], row['scenario']): row for row in json.load(f)['results']}
+    passed = True
+    for row in results:
+        previous = baseline.get((row['dataset'], row['scenario']))
+        if not previous:
+            continue
+        ratio = row['latency_ms']['p95'] / max(previous['latency_ms']['p95'], 0.001)
+        regressed = ratio > threshold
+        passed = passed and not regressed
+        print(f"{row['dataset']:>7} {row['scenario']:<15} p95 {previous['latency_ms']['p95']:>9.1f} -> "
+              f"{row['latency_ms']['p95']:>9.1f} ms ({ratio:.2f}x){'  REGRESSION' if regressed else ''}")
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the receipt API against a local Gemini stand-in.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Dataset sizes to run, in receipts (the database is topped up in order).")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario.")
+    parser.add_argument('--process-requests', type=int, default=50,
+                        help="Requests for the process scenario, which waits for each extraction.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per fake model call.")
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help="A previous results file to compare p95 latencies against.")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="Allowed p95 slowdown against the baseline before the run fails.")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    os.environ['BENCHMARK_LLM_LATENCY'] = str(args.latency)
+    os.environ['BENCHMARK_LLM_JITTER'] = str(args.jitter)
+    sys.path.insert(0, str(PROJECT_DIR))
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    from .datasets import seed
+
+    call_command('migrate', verbosity=0)
+    server, base_url = start_server()
+    client = Client(base_url)
+
+    results = []
+    try:
+        for size in sorted(args.sizes):
+            print(f"Dataset: {size} receipts")
+            seed(size, stdout=sys.stdout)
+            for name in args.scenarios:
+                requests = args.process_requests if name == 'process' else args.requests
+                row = dict(run_scenario(name, client, requests, args.concurrency), dataset=size)
+                results.append(row)
+                latency = row['latency_ms']
+                print(f"  {name:<15} p50 {latency['p50']:>9.1f}  p95 {latency['p95']:>9.1f}  "
+                      f"p99 {latency['p99']:>9.1f} ms  {row['throughput_rps']:>8.1f} req/s  {row['errors']} errors")
+    finally:
+        server.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': connection.vendor,
+            'llm_latency_s': args.latency,
+            'llm_jitter_s': args.jitter,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline and not compare(results, args.baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
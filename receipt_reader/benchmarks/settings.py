@@ -0,0 +1,39 @@
+"""
+Benchmark settings: the project settings with the Gemini SDK swapped for the local stand-in and,
+unless BENCHMARK_USE_PROJECT_DB is set, a throwaway SQLite database instead of MySQL.
+"""
+import os
+import tempfile
+
+from receipt_reader.settings import *  # noqa: F401,F403
+
+BENCHMARK_DIR = os.getenv('BENCHMARK_DIR', os.path.join(tempfile.gettempdir(), 'smart-receipts-bench'))
+os.makedirs(BENCHMARK_DIR, exist_ok=True)
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+GENAI_MODULE = 'benchmarks.fake_genai'
+MEDIA_ROOT = os.path.join(BENCHMARK_DIR, 'media')
+# The stand-in has no quota; keep the shared limiter out of the way unless a run is about it
+GEMINI_RATE_LIMIT_PER_MINUTE = int(os.getenv('BENCHMARK_RATE_LIMIT_PER_MINUTE', '60000'))
+GEMINI_RATE_LIMIT_BURST = int(os.getenv('BENCHMARK_RATE_LIMIT_BURST', '1000'))
+
+if not os.getenv('BENCHMARK_USE_PROJECT_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BENCHMARK_DIR, 'bench.sqlite3'),
+            'OPTIONS': {
+                # Concurrent requests and the worker pool write at the same time
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 30,
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            },
+        }
+    }
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'root': {'level': 'WARNING'},
+}
@@ -1,21 +1,36 @@
-import google.generativeai as genai
+import hashlib
 import json
+import logging
 import os
-from dotenv import load_dotenv
+import time
 
-# It's good practice to configure dependencies within the module that uses them.
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics
+from .extraction import CascadeExtractor, default_backends
+from .extraction_cache import get_extraction_cache
+# The SDK is imported and configured lazily, on the first model call
+from .llm import get_model
+from .preprocessing import preprocess_image, preprocessing_options
+from .resilience import ModelUnavailable
+
+logger = logging.getLogger(__name__)
 
 class ReceiptScanningAgent:
     """
     An AI agent responsible for analyzing receipt images and extracting structured data.
     """
-    def __init__(self):
+    def __init__(self, cache=None, extractor=None):
         """
-        Initializes the agent by setting up the generative model and defining the core prompt.
+        Initializes the agent by setting up the model cascade and defining the core prompt.
+        Pass an extractor (anything with `name` and `extract`) to use other or fake backends.
         """
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+        self.extractor = extractor if extractor is not None else CascadeExtractor(
+            default_backends(), min_confidence=getattr(settings, 'RECEIPT_EXTRACTION_MIN_CONFIDENCE', 0.75)
+        )
+        self.model_name = self.extractor.name
+        self.cache = cache if cache is not None else get_extraction_cache()
         self.prompt = """
             Analyze the provided receipt or invoice image. Your task is to meticulously extract the information below and format it into a precise JSON object.
             Based on the merchant's name and the items purchased, determine the most logical spending category.
@@ -36,21 +51,96 @@ class ReceiptScanningAgent:
             3.  Your entire response must be **only the raw JSON object**. Do not wrap it in markdown fences like ```json or add any other explanatory text.
             """
 
-    def process_receipt(self, image_path: str) -> dict:
+    @property
+    def prompt_version(self) -> str:
+        """
+        A short fingerprint of the model, prompt and image preprocessing. Cached extractions are only reused while it is unchanged.
+        """
+        options = json.dumps(preprocessing_options(), sort_keys=True)
+        return hashlib.sha256(f"{self.model_name}\n{self.prompt}\n{options}".encode()).hexdigest()[:16]
+
+    def process_receipt(self, image_path: str, use_cache: bool = True, store: bool = True) -> dict:
         """
         Processes a single receipt image and returns the extracted data as a dictionary.
+        Images that were already extracted with the same prompt and model are served from the cache.
+        With store=False the result is not written to the cache.
         """
+        image_bytes = _read_file(image_path)
+
+        if use_cache:
+            cached = self.cache.lookup(image_bytes, self.prompt_version)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        prepared = self._prepare(image_bytes, image_path)
         try:
-            image_file = genai.upload_file(path=image_path)
-            response = self.model.generate_content([self.prompt, image_file])
+            result = self.extractor.extract(prepared, self.prompt)
+        except ModelUnavailable:
+            raise
+        except Exception as e:
+            raise ValueError(f"Agent failed to process receipt image: {str(e)}")
 
-            cleaned_response_text = response.text.strip().replace("```json", "").replace("```", "")
-            json_data = json.loads(cleaned_response_text)
-            return json_data
+        self._log_extraction(image_path, prepared, result, started)
+        if result.problems:
+            # Nothing better is available; keep the answer, but don't let the cache pin it
+            return result.data
+        if store:
+            self.cache.store(image_bytes, self.prompt_version, result.data)
+        return result.data
 
+    async def aprocess_receipt(self, image_path: str, use_cache: bool = True, store: bool = True) -> dict:
+        """
+        Async variant of process_receipt for the ASGI views. File reads, image preprocessing and
+        cache queries run in threads; the model calls are awaited, so no thread waits on them.
+        """
+        image_bytes = await sync_to_async(_read_file, thread_sensitive=False)(image_path)
+
+        if use_cache:
+            cached = await sync_to_async(self.cache.lookup)(image_bytes, self.prompt_version)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        prepared = await sync_to_async(self._prepare, thread_sensitive=False)(image_bytes, image_path)
+        try:
+            result = await self.extractor.aextract(prepared, self.prompt)
+        except ModelUnavailable:
+            raise
         except Exception as e:
             raise ValueError(f"Agent failed to process receipt image: {str(e)}")
 
+        self._log_extraction(image_path, prepared, result, started)
+        if result.problems:
+            return result.data
+        if store:
+            await sync_to_async(self.cache.store)(image_bytes, self.prompt_version, result.data)
+        return result.data
+
+    def _prepare(self, image_bytes, image_path):
+        prepared = preprocess_image(image_bytes, filename=os.path.basename(image_path), **preprocessing_options())
+        metrics.observe_image(prepared.original_size, prepared.size)
+        return prepared
+
+    def _log_extraction(self, image_path, prepared, result, started):
+        logger.info(
+            "Extracted %s on %s (%d escalations): sent %d of %d bytes in %.2fs",
+            os.path.basename(image_path), result.tier, len(result.escalations), prepared.size,
+            prepared.original_size, time.perf_counter() - started,
+        )
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _format_turns(messages):
+    return "".join(
+        f"{'User' if message.get('sender') == 'user' else 'Advisor'}: {message.get('text')}\n"
+        for message in messages
+    )
+
 
 # --- NEW, ADVANCED CHATBOT AGENT ---
 class ChatbotAgent:
@@ -58,8 +148,12 @@ class ChatbotAgent:
     An AI agent that acts as a personal financial advisor.
     It's designed for safe, accurate, and context-aware conversations.
     """
+    ERROR_MESSAGE = "I apologize, but I encountered a problem trying to process your request. Please try again."
+    BUSY_MESSAGE = "I'm sorry, I'm getting a lot of questions right now. Please try again in a minute."
+
     def __init__(self):
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+        self.model_name = "gemini-2.5-flash"
+        self.model = get_model(self.model_name)
         self.system_prompt = """
         You are 'SmartReceipts Advisor,' an expert AI personal financial assistant. Your mission is to provide safe, accurate, and helpful financial insights based primarily on the user's provided data. Keep it short, clear and crisp. Here you need to act as a financial advisor, answering questions about the user's spending, budgeting, and financial strategies.
         Always give short answers do not elaborate a lot. Use bullet points for lists to make them easy to digest. Content should be short but it should be clear and give great insights to the user.
@@ -86,36 +180,112 @@ class ChatbotAgent:
             -   All financial figures must be in Rupees (₹).
         """
 
-    def get_response(self, query: str, history: list, receipt_data: str) -> str:
+    def _build_prompt(self, query: str, history: list, receipt_data: str, summary: str = '') -> str:
+        """
+        Combines the system prompt, receipt context, conversation summary and recent turns, and the new question.
+        """
+        formatted_history = _format_turns(history)
+        parts = [
+            f"{self.system_prompt}\n\n",
+            f"--- CONTEXT FOR CURRENT QUERY ---\n",
+            f"[USER'S RECEIPT DATA]:\n{receipt_data}\n\n",
+        ]
+        if summary:
+            parts.append(f"[SUMMARY OF EARLIER CONVERSATION]:\n{summary}\n\n")
+        parts += [
+            f"[CONVERSATION HISTORY]:\n{formatted_history}\n",
+            f"[USER'S NEW QUESTION]:\n{query}\n",
+            f"Advisor Response:",
+        ]
+        return "".join(parts)
+
+    def summarize(self, summary: str, turns: list) -> str:
+        """
+        Folds turns into the running conversation summary. Only the previous summary and the new
+        turns are sent, so the cost of a refresh does not grow with the length of the chat.
+        """
+        formatted_turns = _format_turns(turns)
+        prompt = (
+            "You maintain a running summary of a conversation between a user and their financial advisor.\n"
+            "Update the summary with the new turns below. Keep facts the user shared, figures that were quoted, "
+            "questions still open and any advice already given. Write at most 150 words of plain text.\n\n"
+            f"[CURRENT SUMMARY]:\n{summary or '(none yet)'}\n\n"
+            f"[NEW TURNS]:\n{formatted_turns}\n"
+            "Updated summary:"
+        )
+        with metrics.llm_call(self.model_name, 'chat_summary') as call:
+            call.response = self.model.generate_content(prompt)
+        return call.response.text.strip()
+
+    def get_response(self, query: str, history: list, receipt_data: str, summary: str = '') -> str:
         """
         Generates a contextual and safe response from the financial advisor agent.
 
         Args:
             query: The user's latest message.
-            history: A list of previous messages in the conversation.
-            receipt_data: A JSON string of the user's receipt data.
+            history: The recent messages in the conversation.
+            receipt_data: The user's receipt data, as built by build_chat_context.
+            summary: The rolling summary of the turns before `history`.
 
         Returns:
             A string containing the AI's response.
         """
-        formatted_history = ""
-        for message in history:
-            role = "User" if message.get('sender') == 'user' else "Advisor"
-            formatted_history += f"{role}: {message.get('text')}\n"
-
-        # Combine the system prompt with the dynamic data
-        full_prompt = (
-            f"{self.system_prompt}\n\n"
-            f"--- CONTEXT FOR CURRENT QUERY ---\n"
-            f"[USER'S RECEIPT DATA]:\n{receipt_data}\n\n"
-            f"[CONVERSATION HISTORY]:\n{formatted_history}\n"
-            f"[USER'S NEW QUESTION]:\n{query}\n"
-            f"Advisor Response:"
-        )
+        full_prompt = self._build_prompt(query, history, receipt_data, summary)
 
         try:
-            response = self.model.generate_content(full_prompt)
-            return response.text
+            with metrics.llm_call(self.model_name, 'chat') as call:
+                call.response = self.model.generate_content(full_prompt)
+            return call.response.text
+        except ModelUnavailable:
+            # The view answers with a 503 and a Retry-After hint
+            raise
         except Exception as e:
             # Provide a safe, generic error message to the user
-            return "I apologize, but I encountered a problem trying to process your request. Please try again."
\ No newline at end of file
+            return self.ERROR_MESSAGE
+
+    async def aget_response(self, query: str, history: list, receipt_data: str, summary: str = '') -> str:
+        """
+        Async variant of get_response: awaits the model instead of blocking a worker thread.
+        """
+        full_prompt = self._build_prompt(query, history, receipt_data, summary)
+
+        try:
+            with metrics.llm_call(self.model_name, 'chat') as call:
+                call.response = await self.model.generate_content_async(full_prompt)
+            return call.response.text
+        except ModelUnavailable:
+            raise
+        except Exception as e:
+            return self.ERROR_MESSAGE
+
+    def stream_response(self, query: str, history: list, receipt_data: str, summary: str = ''):
+        """
+        Same as get_response, but yields the answer in chunks as the model produces them.
+        A failure before the first chunk yields the busy or error message as the answer; once
+        part of the answer is out, the exception propagates so the caller can report it.
+        """
+        full_prompt = self._build_prompt(query, history, receipt_data, summary)
+
+        started = False
+        try:
+            with metrics.llm_call(self.model_name, 'chat_stream') as call:
+                for chunk in self.model.generate_content(full_prompt, stream=True):
+                    # The last chunk carries the usage totals for the whole answer
+                    call.response = chunk
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # e.g. a final chunk that only carries the finish reason
+                        continue
+                    if text:
+                        started = True
+                        yield text
+        except ModelUnavailable:
+            if started:
+                raise
+            yield self.BUSY_MESSAGE
+        except Exception:
+            if started:
+                # Appending the error message would turn the partial answer into a plausible one
+                raise
+            yield self.ERROR_MESSAGE
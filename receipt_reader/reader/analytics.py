@@ -0,0 +1,191 @@
+"""
+Vectorized spend analytics over every extracted receipt.
+
+Receipts are loaded once into compact NumPy columns: the day as a proleptic ordinal, the total
+in paise as int64, so sums stay exact, and a small category code. The columns are reused until the
+dashboard version changes, i.e. until a receipt, budget or rollup is written. Series, moving
+averages, projections and outliers are then array operations, whatever the date range.
+"""
+import calendar
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+from .dashboard import dashboard_version
+from .models import Receipt
+
+# Modified z-score above which a transaction is reported as an outlier (Iglewicz and Hoaglin)
+OUTLIER_THRESHOLD = 3.5
+
+
+@dataclass
+class SpendColumns:
+    ids: np.ndarray
+    days: np.ndarray
+    amounts: np.ndarray
+    categories: np.ndarray
+    category_names: list
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, queryset=None, chunk_size=5000):
+        """
+        Reads (id, date, total, category) for every receipt with a date and a total.
+        """
+        queryset = queryset if queryset is not None else Receipt.objects.filter(json_data__isnull=False)
+        rows = (queryset
+                .filter(transaction_date__isnull=False, total_amount__isnull=False)
+                .order_by()
+                .values_list('id', 'transaction_date', 'total_amount', 'category'))
+        codes = {}
+        columns = np.fromiter(
+            ((receipt_id, day.toordinal(), int(total * 100), codes.setdefault(category or 'Other', len(codes)))
+             for receipt_id, day, total, category in rows.iterator(chunk_size=chunk_size)),
+            dtype=[('id', np.int64), ('day', np.int32), ('amount', np.int64), ('category', np.int16)],
+        )
+        return cls(columns['id'], columns['day'], columns['amount'], columns['category'], list(codes))
+
+    def window(self, start, end, category=None):
+        """
+        Boolean mask of the receipts dated in [start, end), optionally in one category.
+        """
+        mask = (self.days >= start.toordinal()) & (self.days < end.toordinal())
+        if category is not None:
+            code = self.category_names.index(category) if category in self.category_names else -1
+            mask &= self.categories == code
+        return mask
+
+
+_lock = threading.Lock()
+_loaded = {'version': None, 'columns': None}
+
+
+def get_columns() -> SpendColumns:
+    """
+    Returns this process's columns, reloading them only after the dashboard version moved.
+    """
+    version = dashboard_version()
+    with _lock:
+        if _loaded['version'] != version or _loaded['columns'] is None:
+            _loaded['columns'] = SpendColumns.load()
+            _loaded['version'] = version
+        return _loaded['columns']
+
+
+def _rupees(paise):
+    return np.round(np.asarray(paise, dtype=np.float64) / 100, 2).tolist()
+
+
+def daily_totals(columns, start, end, category=None) -> np.ndarray:
+    """
+    Paise spent on each day of [start, end), as an int64 array with one entry per day.
+    """
+    length = (end - start).days
+    mask = columns.window(start, end, category)
+    return np.bincount(columns.days[mask] - start.toordinal(), weights=columns.amounts[mask],
+                       minlength=length).astype(np.int64)
+
+
+def daily_series(columns, start, end, category=None) -> dict:
+    totals = daily_totals(columns, start, end, category)
+    labels = [(start + timedelta(days=offset)).isoformat() for offset in range(len(totals))]
+    return {'labels': labels, 'data': _rupees(totals)}
+
+
+def weekly_series(columns, start, end, category=None) -> dict:
+    """
+    Spending per calendar week (Monday to Sunday), labelled with each week's Monday.
+    The first and last weeks only count the days inside the range.
+    """
+    totals = daily_totals(columns, start, end, category)
+    offsets = np.arange(len(totals)) + start.weekday()
+    weeks = np.bincount(offsets // 7, weights=totals).astype(np.int64)
+    first_monday = start - timedelta(days=start.weekday())
+    labels = [(first_monday + timedelta(weeks=index)).isoformat() for index in range(len(weeks))]
+    return {'labels': labels, 'data': _rupees(weeks)}
+
+
+def moving_averages(columns, start, end, window=7) -> dict:
+    """
+    Trailing `window`-day moving average of daily spend per category over [start, end).
+    Days before `start` feed the first averages, so the series starts warm.
+    """
+    length = (end - start).days
+    history_start = start - timedelta(days=window - 1)
+    span = length + window - 1
+    mask = columns.window(history_start, end)
+    categories = len(columns.category_names)
+    # One row per category, one column per day
+    grid = np.bincount(
+        columns.categories[mask].astype(np.int64) * span + (columns.days[mask] - history_start.toordinal()),
+        weights=columns.amounts[mask], minlength=categories * span,
+    ).reshape(categories, span)
+    cumulative = np.concatenate([np.zeros((categories, 1)), np.cumsum(grid, axis=1)], axis=1)
+    averages = (cumulative[:, window:] - cumulative[:, :-window]) / window
+    return {
+        'window': window,
+        'labels': [(start + timedelta(days=offset)).isoformat() for offset in range(length)],
+        'series': {name: _rupees(averages[code]) for code, name in enumerate(columns.category_names)
+                   if grid[code].any()},
+    }
+
+
+def month_projection(columns, year, month, limit, today) -> dict:
+    """
+    Projects the month's total from the spend so far and the month's daily run rate, and
+    compares it with the budget. Past months report their actual total.
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    start = date(year, month, 1)
+    end = start + timedelta(days=days_in_month)
+    totals = daily_totals(columns, start, end)
+    elapsed = min(max((today - start).days + 1, 0), days_in_month)
+
+    spent = int(totals[:elapsed].sum())
+    run_rate = spent / elapsed if elapsed else 0.0
+    projected = spent + run_rate * (days_in_month - elapsed)
+    limit_paise = int(Decimal(limit) * 100) if limit is not None else None
+    remaining_days = days_in_month - elapsed
+    return {
+        'year': year,
+        'month': month,
+        'days_elapsed': elapsed,
+        'days_in_month': days_in_month,
+        'spent': round(spent / 100, 2),
+        'daily_run_rate': round(run_rate / 100, 2),
+        'projected_total': round(projected / 100, 2),
+        'budget': float(limit) if limit is not None else None,
+        'projected_over_budget': round((projected - limit_paise) / 100, 2) if limit_paise is not None else None,
+        'on_track': projected <= limit_paise if limit_paise is not None else None,
+        # What can still be spent per day without going over
+        'daily_allowance': (round(max(limit_paise - spent, 0) / remaining_days / 100, 2)
+                            if limit_paise is not None and remaining_days else None),
+    }
+
+
+def outliers(columns, start, end, threshold=OUTLIER_THRESHOLD, limit=20) -> list:
+    """
+    Receipts in [start, end) whose total is far above what is usual for their category,
+    by the modified z-score 0.6745 * (x - median) / MAD, largest first.
+    Returns (receipt id, category, day, amount in paise, score) tuples.
+    """
+    mask = columns.window(start, end)
+    ids, days, amounts, categories = (columns.ids[mask], columns.days[mask],
+                                      columns.amounts[mask], columns.categories[mask])
+    scores = np.zeros(len(amounts))
+    for code in np.unique(categories):
+        in_category = categories == code
+        values = amounts[in_category].astype(np.float64)
+        median = np.median(values)
+        mad = np.median(np.abs(values - median))
+        if mad:
+            scores[in_category] = 0.6745 * (values - median) / mad
+    flagged = np.flatnonzero(scores > threshold)
+    flagged = flagged[np.argsort(-scores[flagged], kind='stable')][:limit]
+    return [(int(ids[index]), columns.category_names[categories[index]], date.fromordinal(int(days[index])),
+             int(amounts[index]), round(float(scores[index]), 2)) for index in flagged]
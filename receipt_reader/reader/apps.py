@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class ReaderConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'reader'
+
+    def ready(self):
+        # Connects the model signal handlers
+        from . import metrics, signals  # noqa: F401
+
+        # Per-request query timing, on whichever thread a connection is opened
+        connection_created.connect(metrics.time_queries, dispatch_uid='reader.metrics.time_queries')
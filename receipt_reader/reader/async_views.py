@@ -0,0 +1,177 @@
+"""
+Async versions of the views that wait on the model: process, chatbot and tracker.
+
+Served under ASGI (receipt_reader.asgi), a request waiting on Gemini is a suspended coroutine
+rather than a blocked worker thread, so one process can keep hundreds of model calls in flight.
+Database work goes through the async ORM or, where it needs a transaction, a sync_to_async call.
+Under WSGI these views still work, but each request then runs on its own event loop.
+"""
+import json
+import math
+from datetime import datetime
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+from . import metrics
+from .agents import ChatbotAgent, ReceiptScanningAgent
+from .chat_context import build_chat_context
+from .conversations import InvalidSession, get_conversation, prompt_history, record_exchange
+from .events import aevent_stream, event_stream, latest_event_id
+from .intents import route as route_question
+from .jobs import enqueue_receipt
+from .llm import get_agent
+from .models import MonthlyBudget, MonthlySpendRollup, Receipt
+from .parsing import month_bounds
+from .resilience import ModelUnavailable
+from .serializers import ReceiptJobSerializer, ReceiptSerializer
+from .suggestions import aget_suggestion, overspend_item
+from .views import tracker_payload
+
+
+class AsyncAPIView(View):
+    """
+    A plain Django class-based view with async handlers; DRF's APIView cannot run them.
+    Like APIView, it is exempt from CSRF checks.
+    """
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+
+def _retry_after(error):
+    return str(max(1, math.ceil(error.retry_after or 1)))
+
+
+class AsyncReceiptProcessView(AsyncAPIView):
+    """
+    Extracts the uploaded receipt within the request and returns it (201). If the model is
+    rate limited or down, the receipt is queued for the worker pool instead, as
+    ReceiptProcessView does, and the job is returned (202).
+    """
+    async def post(self, request, *args, **kwargs):
+        serializer = ReceiptSerializer(data=request.FILES)
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=400)
+        receipt = await sync_to_async(serializer.save)()
+
+        agent = get_agent(ReceiptScanningAgent)
+        try:
+            json_data = await agent.aprocess_receipt(receipt.image.path)
+        except ModelUnavailable:
+            job = await sync_to_async(enqueue_receipt)(receipt)
+            data = ReceiptJobSerializer(job, context={'request': request}).data
+            data['status_url'] = reverse('receipt-job-status', kwargs={'job_id': job.id})
+            return JsonResponse(data, status=202)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+        await sync_to_async(receipt.apply_extraction)(json_data, agent.prompt_version)
+        return JsonResponse(ReceiptSerializer(receipt, context={'request': request}).data, status=201)
+
+
+class AsyncChatbotView(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': 'The request body must be JSON.'}, status=400)
+        query = data.get('query')
+
+        if not query:
+            return JsonResponse({'error': 'A query is required.'}, status=400)
+
+        try:
+            conversation = await sync_to_async(get_conversation)(data.get('session_id'))
+        except InvalidSession as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        with metrics.phase('fast_path'):
+            answer = await sync_to_async(route_question)(query)
+        if answer is not None:
+            await sync_to_async(record_exchange)(conversation, query, answer)
+            return JsonResponse({'response': answer, 'session_id': conversation.session_id})
+
+        try:
+            with metrics.phase('context'):
+                context = await sync_to_async(build_chat_context)(query)
+                summary, history = await sync_to_async(prompt_history)(conversation)
+            agent = get_agent(ChatbotAgent)
+            response_text = await agent.aget_response(query, history, context.text, summary)
+            if response_text != ChatbotAgent.ERROR_MESSAGE:
+                await sync_to_async(record_exchange)(conversation, query, response_text)
+            return JsonResponse({'response': response_text, 'session_id': conversation.session_id})
+
+        except ModelUnavailable as e:
+            response = JsonResponse({'error': str(e), 'response': ChatbotAgent.BUSY_MESSAGE,
+                                     'session_id': conversation.session_id}, status=503)
+            response['Retry-After'] = _retry_after(e)
+            return response
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class AsyncExpenseTrackerView(AsyncAPIView):
+    """
+    ExpenseTrackerView on the async ORM. A missing or stale price suggestion is computed
+    on the event loop rather than the suggestion thread pool.
+    """
+    async def get(self, request, *args, **kwargs):
+        today = datetime.now()
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+        recent = max(0, min(int(request.GET.get('recent', 10)), 100))
+
+        budget, _ = await MonthlyBudget.objects.aget_or_create(
+            year=year, month=month,
+            defaults={'limit': Decimal('10000.00')}
+        )
+
+        month_start, month_end = month_bounds(year, month)
+        recent_receipts = [receipt async for receipt in Receipt.objects.filter(
+            transaction_date__gte=month_start, transaction_date__lt=month_end
+        ).order_by('-uploaded_at', '-id')[:recent]]
+
+        rollups = [rollup async for rollup in MonthlySpendRollup.objects.filter(year=year, month=month)]
+
+        with metrics.phase('suggestion'):
+            suggestion, suggestion_status = None, None
+            item_name = overspend_item(year, month, budget=budget, rollups=rollups)
+            if item_name:
+                suggestion, suggestion_status = await aget_suggestion(year, month, item_name)
+
+        with metrics.phase('serialize'):
+            response_data = tracker_payload(budget, rollups, recent_receipts, suggestion, suggestion_status)
+        # DRF's encoder, so the totals render as numbers exactly as ExpenseTrackerView's do
+        return JsonResponse(response_data, encoder=DRFJSONEncoder)
+
+
+class DashboardEventsView(AsyncAPIView):
+    """
+    Streams dashboard change events as Server-Sent Events, starting after the Last-Event-ID
+    header (sent by EventSource when it reconnects) or the `last_event_id` parameter, and
+    otherwise from now. Under ASGI the stream waits on the event loop, not on a thread; under
+    WSGI it is a short poll that ends after a few seconds, and the browser reconnects.
+    """
+    async def get(self, request, *args, **kwargs):
+        value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        if value is None:
+            last_id = await sync_to_async(latest_event_id)()
+        else:
+            try:
+                last_id = int(value)
+            except ValueError:
+                return JsonResponse({'error': 'The last event id must be an integer.'}, status=400)
+
+        stream = aevent_stream(last_id) if isinstance(request, ASGIRequest) else event_stream(last_id)
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx-style proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,190 @@
+import logging
+import mimetypes
+import os
+import zipfile
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .agents import ReceiptScanningAgent
+from .events import publish_receipts
+from .llm import get_agent
+from .models import MonthlySpendRollup, Receipt, ReceiptItem
+from .preprocessing import make_thumbnail
+from .storage import receipt_storage
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.heic', '.heif'}
+
+
+class BatchError(ValueError):
+    """Raised when a batch upload as a whole cannot be accepted."""
+
+
+@dataclass
+class BatchItem:
+    filename: str
+    image_name: str = None
+    thumbnail_name: str = None
+    json_data: dict = None
+    prompt_version: str = None
+    error: str = None
+    receipt: Receipt = None
+
+
+def _is_image(filename):
+    return os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS
+
+
+def iter_archive_images(archive):
+    """
+    Yields (filename, file) for each image in a ZIP archive. Members are decompressed lazily,
+    one at a time, so the archive is never held in memory as a whole.
+    """
+    max_file_bytes = getattr(settings, 'RECEIPT_BATCH_MAX_FILE_BYTES', 20 * 1024 * 1024)
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                filename = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith('__MACOSX/') or not filename or not _is_image(filename):
+                    continue
+                if info.file_size > max_file_bytes:
+                    yield filename, None
+                    continue
+                with zf.open(info) as member:
+                    yield filename, member
+    except zipfile.BadZipFile:
+        raise BatchError("The uploaded archive is not a valid ZIP file.")
+
+
+def _discard_image(name):
+    # Storage is content-addressed, so another receipt may already use the same file
+    if name and not Receipt.objects.filter(Q(image=name) | Q(thumbnail=name)).exists():
+        receipt_storage.delete(name)
+
+
+def store_images(named_files):
+    """
+    Writes each upload into receipt storage, chunk by chunk, and returns one BatchItem per file.
+    Identical images, within the batch or already on disk, are stored once.
+    """
+    max_files = getattr(settings, 'RECEIPT_BATCH_MAX_FILES', 500)
+    upload_to = Receipt._meta.get_field('image').upload_to
+    items = []
+    try:
+        for filename, fileobj in named_files:
+            if len(items) >= max_files:
+                raise BatchError(f"A batch can contain at most {max_files} images.")
+            item = BatchItem(filename=filename)
+            if fileobj is None:
+                item.error = "File is too large."
+            elif not _is_image(filename):
+                item.error = "Unsupported file type."
+            else:
+                item.image_name = receipt_storage.save(os.path.join(upload_to, filename), File(fileobj, name=filename))
+            items.append(item)
+    except BatchError:
+        for item in items:
+            _discard_image(item.image_name)
+        raise
+    return items
+
+
+def _thumbnail(item):
+    upload_to = Receipt._meta.get_field('thumbnail').upload_to
+    with receipt_storage.open(item.image_name, 'rb') as image:
+        thumbnail = make_thumbnail(image)
+    if thumbnail:
+        name = os.path.splitext(os.path.basename(item.image_name))[0] + mimetypes.guess_extension(thumbnail.mime_type)
+        item.thumbnail_name = receipt_storage.save(os.path.join(upload_to, name), ContentFile(thumbnail.data))
+
+
+def _extract(item, agent):
+    try:
+        item.json_data = agent.process_receipt(receipt_storage.path(item.image_name))
+        item.prompt_version = agent.prompt_version
+        _thumbnail(item)
+    except Exception as e:
+        logger.warning("Batch extraction failed for %s: %s", item.filename, e)
+        item.error = str(e)
+    finally:
+        # Pool threads open their own DB connections (for the extraction cache); don't leak them
+        connections.close_all()
+    return item
+
+
+def extract_images(items, parallelism=None, agent=None):
+    """
+    Runs extraction for the stored items over a bounded thread pool.
+    """
+    parallelism = parallelism or getattr(settings, 'RECEIPT_BATCH_PARALLELISM', 4)
+    agent = agent or get_agent(ReceiptScanningAgent)
+    pending = [item for item in items if item.image_name and not item.error]
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='receipt-batch') as pool:
+        list(pool.map(lambda item: _extract(item, agent), pending))
+    return items
+
+
+def save_receipts(items):
+    """
+    Creates the receipts, their line items and rollup updates for every successful extraction
+    in a single transaction. Once it commits, images whose extraction failed are removed from
+    storage, unless a succeeded item of the batch uses the same file.
+    """
+    succeeded = [item for item in items if item.json_data is not None and not item.error]
+    kept = {name for item in succeeded for name in (item.image_name, item.thumbnail_name) if name}
+    discarded = {
+        name
+        for item in items if item.image_name and (item.json_data is None or item.error)
+        for name in (item.image_name, item.thumbnail_name) if name and name not in kept
+    }
+
+    def discard():
+        for name in discarded:
+            _discard_image(name)
+
+    receipts = []
+    for item in succeeded:
+        receipt = Receipt(image=item.image_name, thumbnail=item.thumbnail_name)
+        receipt.set_extraction(item.json_data, item.prompt_version)
+        receipts.append(receipt)
+
+    with transaction.atomic():
+        created = Receipt.objects.bulk_create(receipts)
+        if created and created[0].pk is None:
+            # MySQL does not return primary keys from bulk inserts. Identical images share a name,
+            # so the new rows are the last ones for each name, in insertion order
+            counts = Counter(item.image_name for item in succeeded)
+            by_image = defaultdict(list)
+            for receipt in Receipt.objects.filter(image__in=list(counts)).order_by('id'):
+                by_image[receipt.image.name].append(receipt)
+            new_rows = {name: by_image[name][-count:] for name, count in counts.items()}
+            created = [new_rows[item.image_name].pop(0) for item in succeeded]
+        receipts = created
+        line_items = ReceiptItem.objects.bulk_create(
+            [line_item for receipt in receipts for line_item in receipt.build_items()], batch_size=1000
+        )
+        MonthlySpendRollup.add_receipts(receipts, line_items)
+        publish_receipts(receipts)
+        # After the commit, so _discard_image sees every receipt that now references a file
+        transaction.on_commit(discard, robust=True)
+
+    for item, receipt in zip(succeeded, receipts):
+        item.receipt = receipt
+    return items
+
+
+def process_batch(named_files, parallelism=None, agent=None):
+    """
+    Stores, extracts and saves a batch of receipt images. Returns one BatchItem per file.
+    """
+    items = store_images(named_files)
+    extract_images(items, parallelism=parallelism, agent=agent)
+    return save_receipts(items)
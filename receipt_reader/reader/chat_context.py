@@ -0,0 +1,311 @@
+import calendar
+import logging
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from . import metrics
+from .models import MonthlyBudget, MonthlySpendRollup, Receipt, ReceiptItem
+from .parsing import CATEGORIES, CATEGORY_ALIASES, month_bounds, month_span
+
+logger = logging.getLogger(__name__)
+
+context_tokens = metrics.registry.histogram(
+    'receipts_chat_context_tokens', "Estimated tokens in the chat context per question.", buckets=metrics.TOKEN_BUCKETS)
+context_receipts = metrics.registry.histogram(
+    'receipts_chat_context_receipts', "Receipts included in the chat context per question.",
+    buckets=(0,) + metrics.COUNT_BUCKETS)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})(?:-(\d{2}))?\b")
+_YEAR = re.compile(r"\b(20\d{2})\b")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'any', 'are', 'at', 'did', 'do', 'for', 'from', 'how', 'i', 'in', 'is', 'it',
+    'last', 'me', 'month', 'much', 'my', 'of', 'on', 'spend', 'spent', 'the', 'this', 'to', 'was',
+    'what', 'when', 'where', 'which', 'year', 'you', 'your',
+}
+MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): index for index, name in enumerate(calendar.month_abbr) if name})
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for budgeting, at about four characters per token.
+    """
+    return len(text) // 4 + 1
+
+
+def tokenize(text) -> set:
+    return {word for word in _WORD.findall(str(text or '').lower()) if word not in STOPWORDS and len(word) > 1}
+
+
+@dataclass
+class QueryFilters:
+    start: date = None
+    end: date = None
+    categories: set = field(default_factory=set)
+    terms: set = field(default_factory=set)
+
+
+def parse_query(query: str, today: date = None) -> QueryFilters:
+    """
+    Pulls a date range, categories and search terms out of a free-text question.
+    """
+    today = today or timezone.localdate()
+    text = query.lower()
+    filters = QueryFilters(terms=tokenize(text))
+
+    if 'last month' in text:
+        first_of_month = today.replace(day=1)
+        filters.start, filters.end = month_bounds(*((first_of_month - timedelta(days=1)).timetuple()[:2]))
+    elif 'this month' in text:
+        filters.start, filters.end = month_bounds(today.year, today.month)
+    elif 'last week' in text:
+        filters.start, filters.end = today - timedelta(days=today.weekday() + 7), today - timedelta(days=today.weekday())
+    elif 'this week' in text:
+        filters.start, filters.end = today - timedelta(days=today.weekday()), today + timedelta(days=1)
+    elif 'yesterday' in text:
+        filters.start, filters.end = today - timedelta(days=1), today
+    elif 'today' in text:
+        filters.start, filters.end = today, today + timedelta(days=1)
+    elif 'last year' in text:
+        filters.start, filters.end = date(today.year - 1, 1, 1), date(today.year, 1, 1)
+    elif 'this year' in text:
+        filters.start, filters.end = date(today.year, 1, 1), date(today.year + 1, 1, 1)
+    else:
+        iso = _ISO_DATE.search(text)
+        year_match = _YEAR.search(text)
+        month = next((MONTHS[word] for word in _WORD.findall(text) if word in MONTHS and word != 'may'), None)
+        if month is None and re.search(r"\bin may\b", text):
+            month = 5
+        if iso:
+            year, month_number, day = int(iso.group(1)), int(iso.group(2)), iso.group(3)
+            try:
+                if day:
+                    filters.start = date(year, month_number, int(day))
+                    filters.end = filters.start + timedelta(days=1)
+                else:
+                    filters.start, filters.end = month_bounds(year, month_number)
+            except ValueError:
+                # Not a real date, e.g. 2024-02-30 or 2024-13; search without a date filter
+                filters.start = filters.end = None
+        elif month:
+            year = int(year_match.group(1)) if year_match else today.year
+            # "in November" asked in March means last November
+            if not year_match and month > today.month:
+                year -= 1
+            filters.start, filters.end = month_bounds(year, month)
+        elif year_match:
+            year = int(year_match.group(1))
+            filters.start, filters.end = date(year, 1, 1), date(year + 1, 1, 1)
+
+    for category in CATEGORIES:
+        if category.lower() in text:
+            filters.categories.add(category)
+    for alias, category in CATEGORY_ALIASES.items():
+        if re.search(rf"\b{re.escape(alias)}\b", text):
+            filters.categories.add(category)
+
+    filters.terms -= set(MONTHS) | {word for category in filters.categories for word in tokenize(category)}
+    filters.terms = {term for term in filters.terms if not term.isdigit()}
+    return filters
+
+
+@dataclass
+class IndexedReceipt:
+    id: int
+    transaction_date: date
+    merchant: str
+    category: str
+    total: Decimal
+    items: list
+
+
+class ReceiptIndex:
+    """
+    An in-memory lexical index over the materialized receipt columns and item names.
+
+    The index refreshes itself from rows whose updated_at moved since the last refresh and
+    only rebuilds from scratch when receipts were deleted.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.receipts = {}
+        self.terms = {}
+        self.postings = defaultdict(set)
+        self.last_modified = None
+
+    def _reset(self):
+        self.receipts = {}
+        self.terms = {}
+        self.postings = defaultdict(set)
+
+    def refresh(self):
+        with self._lock:
+            extracted = Receipt.objects.filter(json_data__isnull=False)
+            stats = extracted.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+            if stats['last_modified'] == self.last_modified and stats['count'] == len(self.receipts):
+                return
+            if self.last_modified is not None and stats['count'] >= len(self.receipts):
+                self._load(extracted.filter(updated_at__gt=self.last_modified))
+            if len(self.receipts) != stats['count']:
+                # First load, or rows were deleted; start over
+                self._reset()
+                self._load(extracted, full=True)
+            self.last_modified = stats['last_modified']
+
+    def _load(self, queryset, full=False):
+        rows = list(queryset.values_list('id', 'transaction_date', 'merchant_name', 'category', 'total_amount'))
+        item_rows = ReceiptItem.objects.order_by('receipt_id', 'position')
+        if not full:
+            item_rows = item_rows.filter(receipt_id__in=[row[0] for row in rows])
+        items = defaultdict(list)
+        for receipt_id, name, price in item_rows.values_list('receipt_id', 'name', 'price').iterator(chunk_size=2000):
+            items[receipt_id].append((name, price))
+
+        for receipt_id, transaction_date, merchant, category, total in rows:
+            self._discard(receipt_id)
+            receipt = IndexedReceipt(receipt_id, transaction_date, merchant or 'N/A', category or 'Other',
+                                     total, items.get(receipt_id, []))
+            terms = tokenize(receipt.merchant) | tokenize(receipt.category)
+            for name, _ in receipt.items:
+                terms |= tokenize(name)
+            self.receipts[receipt_id] = receipt
+            self.terms[receipt_id] = terms
+            for term in terms:
+                self.postings[term].add(receipt_id)
+
+    def _discard(self, receipt_id):
+        for term in self.terms.pop(receipt_id, ()):
+            self.postings[term].discard(receipt_id)
+        self.receipts.pop(receipt_id, None)
+
+    def search(self, filters: QueryFilters) -> list:
+        """
+        Returns receipts matching the query's date range and categories, best lexical matches
+        first and then newest first.
+        """
+        scores = defaultdict(int)
+        for term in filters.terms:
+            for receipt_id in self.postings.get(term, ()):
+                scores[receipt_id] += 1
+
+        def matches(receipt):
+            if filters.start and (receipt.transaction_date is None or receipt.transaction_date < filters.start):
+                return False
+            if filters.end and (receipt.transaction_date is None or receipt.transaction_date >= filters.end):
+                return False
+            return not filters.categories or receipt.category in filters.categories
+
+        with self._lock:
+            candidates = [receipt for receipt in self.receipts.values() if matches(receipt)]
+        candidates.sort(key=lambda receipt: (receipt.transaction_date or date.min, receipt.id), reverse=True)
+        candidates.sort(key=lambda receipt: scores.get(receipt.id, 0), reverse=True)
+        return candidates
+
+
+_index = ReceiptIndex()
+
+
+@dataclass
+class ChatContext:
+    text: str
+    receipts_total: int
+    receipts_matched: int
+    receipts_included: int
+    estimated_tokens: int
+    token_budget: int
+
+
+def _aggregate_lines(filters: QueryFilters, today: date) -> list:
+    lines = ["[SPENDING SUMMARY] (covers every receipt)"]
+    rollups = MonthlySpendRollup.objects.order_by('-year', '-month', 'category')
+    months = defaultdict(lambda: [Decimal('0.00'), 0])
+    for rollup in rollups.filter(year__gte=today.year - 1):
+        months[(rollup.year, rollup.month)][0] += rollup.total
+        months[(rollup.year, rollup.month)][1] += rollup.receipt_count
+    if months:
+        lines.append("month|total|receipts")
+        lines.extend(f"{year}-{month:02d}|{total}|{count}" for (year, month), (total, count) in months.items())
+
+    if filters.start:
+        categories = defaultdict(Decimal)
+        months = month_span(filters.start, filters.end)
+        if months:
+            for rollup in rollups.filter(year__gte=months[0][0], year__lte=months[-1][0]):
+                if (rollup.year, rollup.month) in months:
+                    categories[rollup.category] += rollup.total
+        else:
+            # Rollups are monthly; any other range is summed from the receipts themselves
+            rows = (Receipt.objects.filter(transaction_date__gte=filters.start, transaction_date__lt=filters.end)
+                    .values('category').annotate(total=Sum('total_amount')).order_by())
+            for row in rows:
+                categories[row['category'] or 'Other'] += (row['total'] or Decimal('0')).quantize(Decimal('0.01'))
+        if categories:
+            lines.append(f"category totals {filters.start}..{filters.end - timedelta(days=1)}:")
+            lines.extend(f"{category}|{total}" for category, total in sorted(categories.items()))
+
+    budget = MonthlyBudget.objects.filter(year=today.year, month=today.month).first()
+    if budget:
+        lines.append(f"budget {today.year}-{today.month:02d}|{budget.limit}")
+    return lines
+
+
+def build_chat_context(query: str, token_budget: int = None, today: date = None) -> ChatContext:
+    """
+    Builds a compact, token-budgeted description of the user's receipts for a chatbot question:
+    pre-computed monthly and category aggregates, followed by the most relevant receipts as a table.
+    """
+    token_budget = token_budget or getattr(settings, 'CHATBOT_CONTEXT_TOKEN_BUDGET', 4000)
+    items_per_receipt = getattr(settings, 'CHATBOT_CONTEXT_ITEMS_PER_RECEIPT', 5)
+    today = today or timezone.localdate()
+
+    _index.refresh()
+    filters = parse_query(query, today)
+    matched = _index.search(filters)
+
+    lines = _aggregate_lines(filters, today)
+    lines.append("[RECEIPTS] (most relevant first; may be a subset)")
+    lines.append("date|merchant|category|total|items")
+    used = estimate_tokens("\n".join(lines))
+
+    included = 0
+    for receipt in matched:
+        items = ";".join(f"{name}:{price}" for name, price in receipt.items[:items_per_receipt])
+        if len(receipt.items) > items_per_receipt:
+            items += f";+{len(receipt.items) - items_per_receipt} more"
+        row = f"{receipt.transaction_date or 'N/A'}|{receipt.merchant}|{receipt.category}|{receipt.total}|{items}"
+        cost = estimate_tokens(row)
+        if used + cost > token_budget:
+            break
+        lines.append(row)
+        used += cost
+        included += 1
+
+    if included < len(matched):
+        lines.append(f"... {len(matched) - included} more matching receipts omitted")
+
+    context = ChatContext(
+        text="\n".join(lines),
+        receipts_total=len(_index.receipts),
+        receipts_matched=len(matched),
+        receipts_included=included,
+        estimated_tokens=used,
+        token_budget=token_budget,
+    )
+    context_tokens.observe(context.estimated_tokens)
+    context_receipts.observe(context.receipts_included)
+    logger.info(
+        "Chat context: %d/%d matching receipts included (%d total), ~%d of %d tokens",
+        context.receipts_included, context.receipts_matched, context.receipts_total,
+        context.estimated_tokens, context.token_budget,
+    )
+    return context
@@ -0,0 +1,135 @@
+import logging
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .agents import ChatbotAgent
+from .chat_context import estimate_tokens
+from .llm import get_agent
+from .models import Conversation, ConversationTurn
+
+logger = logging.getLogger(__name__)
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Idle conversations are pruned every this many new conversations
+PRUNE_EVERY = 100
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class InvalidSession(ValueError):
+    pass
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CHATBOT_SUMMARY_WORKERS', 1),
+                thread_name_prefix='chat-summary',
+            )
+        return _executor
+
+
+def get_conversation(session_id=None):
+    """
+    Returns the conversation for a session id. A new or missing id gets an unsaved conversation;
+    it is only stored by record_exchange, once there is an answer to keep.
+    """
+    if not session_id:
+        return Conversation(session_id=uuid.uuid4().hex)
+    if not _SESSION_ID.match(str(session_id)):
+        raise InvalidSession("session_id must be 1-64 letters, digits, '-' or '_'.")
+    return Conversation.objects.filter(session_id=session_id).first() or Conversation(session_id=session_id)
+
+
+def prune_conversations():
+    """
+    Deletes conversations idle for longer than CHATBOT_CONVERSATION_RETENTION seconds, with their
+    turns. Returns the number of conversations deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'CHATBOT_CONVERSATION_RETENTION', 30 * 86400))
+    _, deleted = Conversation.objects.filter(updated_at__lt=cutoff).delete()
+    return deleted.get(Conversation._meta.label, 0)
+
+
+def _as_messages(turns):
+    return [{'sender': turn.role, 'text': turn.text} for turn in turns]
+
+
+def prompt_history(conversation):
+    """
+    Returns (summary, recent messages) for the next prompt: the rolling summary plus the turns it
+    does not cover yet. The window is capped at CHATBOT_HISTORY_MAX_TURNS even if summarizing
+    has fallen behind, so the prompt stays bounded.
+    """
+    if conversation.pk is None:
+        return conversation.summary, []
+    max_turns = getattr(settings, 'CHATBOT_HISTORY_MAX_TURNS', 12)
+    turns = list(conversation.turns
+                 .filter(sequence__gt=conversation.summarized_through)
+                 .order_by('-sequence')[:max_turns])
+    return conversation.summary, _as_messages(reversed(turns))
+
+
+def record_exchange(conversation, query, answer):
+    """
+    Appends the question and answer to the conversation, storing it first if it is new, and,
+    once the unsummarized turns pass the turn or token limit, queues a summary refresh for after
+    the transaction commits.
+    """
+    with transaction.atomic():
+        stored, created = Conversation.objects.get_or_create(session_id=conversation.session_id)
+        conversation = Conversation.objects.select_for_update().get(pk=stored.pk)
+        if created and conversation.pk % PRUNE_EVERY == 0:
+            transaction.on_commit(prune_conversations, robust=True)
+        last = conversation.turns.aggregate(last=Max('sequence'))['last'] or 0
+        ConversationTurn.objects.bulk_create([
+            ConversationTurn(conversation=conversation, sequence=last + 1, role=ConversationTurn.USER, text=query),
+            ConversationTurn(conversation=conversation, sequence=last + 2, role=ConversationTurn.ADVISOR, text=answer),
+        ])
+        conversation.save(update_fields=['updated_at'])
+
+        pending = list(conversation.turns.filter(sequence__gt=conversation.summarized_through)
+                       .values_list('text', flat=True))
+        if (len(pending) > getattr(settings, 'CHATBOT_HISTORY_MAX_TURNS', 12)
+                or sum(estimate_tokens(text) for text in pending) > getattr(settings, 'CHATBOT_HISTORY_MAX_TOKENS', 1500)):
+            transaction.on_commit(lambda: _get_executor().submit(summarize, conversation.pk))
+
+
+def summarize(conversation_id, agent=None):
+    """
+    Folds every turn except the most recent CHATBOT_HISTORY_RECENT_TURNS into the summary.
+    The model only sees the previous summary and the turns being folded in. If another refresh
+    finished first, this one's result is dropped rather than overwriting it.
+    """
+    close_old_connections()
+    try:
+        conversation = Conversation.objects.get(pk=conversation_id)
+        keep = getattr(settings, 'CHATBOT_HISTORY_RECENT_TURNS', 4)
+        unsummarized = list(conversation.turns.filter(sequence__gt=conversation.summarized_through))
+        fold = unsummarized[:max(0, len(unsummarized) - keep)]
+        if not fold:
+            return
+
+        agent = agent or get_agent(ChatbotAgent)
+        summary = agent.summarize(conversation.summary, _as_messages(fold))
+        updated = Conversation.objects.filter(
+            pk=conversation.pk, summarized_through=conversation.summarized_through
+        ).update(summary=summary, summarized_through=fold[-1].sequence)
+        if updated:
+            logger.info("Summarized %d turns of conversation %s", len(fold), conversation.session_id)
+    except Exception as e:
+        # The turns stay unsummarized and the next exchange tries again
+        logger.warning("Could not summarize conversation %s: %s", conversation_id, e)
+    finally:
+        close_old_connections()
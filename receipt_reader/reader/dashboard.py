@@ -0,0 +1,102 @@
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .events import latest_event_id
+from .models import MonthlyBudget, MonthlySpendRollup, Receipt
+from .parsing import month_bounds
+from .serializers import MonthlyBudgetSerializer, ReceiptSerializer
+from .suggestions import get_suggestion, overspend_item
+
+VERSION_KEY = 'dashboard:version'
+
+
+def dashboard_version() -> int:
+    """
+    Returns the current dashboard cache version. Every cached payload is stored under it,
+    so bumping the version invalidates all of them at once, on every worker sharing the cache.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_dashboard_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # The version key was evicted; anything cached under an older version is unreachable anyway
+        cache.add(VERSION_KEY, 2, timeout=None)
+
+
+def weekly_series(year, month) -> dict:
+    """
+    Spending per week of the month (days 1-7, 8-14, ...) for the home page sparkline.
+    """
+    start, end = month_bounds(year, month)
+    weeks = [Decimal('0.00')] * math.ceil((end - start).days / 7)
+    days = (Receipt.objects
+            .filter(transaction_date__gte=start, transaction_date__lt=end)
+            .values('transaction_date')
+            .annotate(total=Sum('total_amount'))
+            .order_by())
+    for row in days:
+        weeks[(row['transaction_date'].day - 1) // 7] += row['total'] or Decimal('0.00')
+    return {'labels': [f"W{index + 1}" for index in range(len(weeks))], 'data': weeks}
+
+
+def build_dashboard(year, month, recent) -> dict:
+    """
+    Everything the home and tracker pages show for a month, in one payload. `last_event_id`
+    is read first, so a page streaming events after it misses no change made while building.
+    """
+    last_event_id = latest_event_id()
+    budget, _ = MonthlyBudget.objects.get_or_create(
+        year=year, month=month,
+        defaults={'limit': Decimal('10000.00')}
+    )
+    month_start, month_end = month_bounds(year, month)
+    recent_receipts = Receipt.objects.filter(
+        transaction_date__gte=month_start, transaction_date__lt=month_end
+    ).order_by('-uploaded_at', '-id')[:recent]
+
+    rollups = list(MonthlySpendRollup.objects.filter(year=year, month=month))
+    suggestion, suggestion_status = None, None
+    item_name = overspend_item(year, month, budget=budget, rollups=rollups)
+    if item_name:
+        suggestion, suggestion_status = get_suggestion(year, month, item_name)
+
+    return {
+        'year': year,
+        'month': month,
+        'budget': MonthlyBudgetSerializer(budget).data,
+        'total_spent': sum((rollup.total for rollup in rollups), Decimal('0.00')),
+        'transactions': ReceiptSerializer(recent_receipts, many=True, include_items=False).data,
+        'transaction_count': sum(rollup.receipt_count for rollup in rollups),
+        'category_summary': {rollup.category: rollup.total for rollup in rollups},
+        'sparkline': weekly_series(year, month),
+        'suggestion': suggestion,
+        'suggestion_status': suggestion_status,
+        'last_event_id': last_event_id,
+    }
+
+
+def get_dashboard(year, month, recent=None) -> dict:
+    """
+    Returns the month's dashboard payload from the cache, building and storing it on a miss.
+    """
+    recent = getattr(settings, 'DASHBOARD_RECENT_TRANSACTIONS', 3) if recent is None else recent
+    # Read the version before building: a write that lands meanwhile bumps it and orphans this entry
+    version = dashboard_version()
+    key = f"dashboard:{year}-{month}:{recent}"
+    data = cache.get(key, version=version)
+    if data is None:
+        data = build_dashboard(year, month, recent)
+        cache.set(key, data, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300), version=version)
+    return data
+
@@ -0,0 +1,206 @@
+"""
+Change events for live dashboards.
+
+Writes that change what the home and tracker pages show publish a DashboardEvent once their
+transaction commits: the receipt's summary, the new total of a month/category bucket, or a
+budget. /api/events/ streams them as Server-Sent Events and the page patches its state, so a
+new scan costs one small event instead of a refetch of the whole month.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .models import DashboardEvent, Receipt
+from .parsing import month_bounds
+from .serializers import ReceiptSerializer
+
+# Old events are pruned every this many events
+PRUNE_EVERY = 100
+
+
+def publish(kind, data):
+    event = DashboardEvent.objects.create(kind=kind, data=data)
+    if event.id % PRUNE_EVERY == 0:
+        cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'DASHBOARD_EVENTS_RETENTION', 3600))
+        DashboardEvent.objects.filter(created_at__lt=cutoff).delete()
+    return event
+
+
+def _week_total(day):
+    """
+    Spending in the sparkline week (days 1-7, 8-14, ... of the month) that contains `day`.
+    """
+    start = day.replace(day=(day.day - 1) // 7 * 7 + 1)
+    end = min(start + timedelta(days=7), month_bounds(day.year, day.month)[1])
+    total = (Receipt.objects.filter(transaction_date__gte=start, transaction_date__lt=end)
+             .aggregate(total=Sum('total_amount'))['total'])
+    return (total or Decimal('0')).quantize(Decimal('0.01'))
+
+
+def receipt_event(receipt):
+    """
+    The receipt as the dashboard lists it, plus the total of its sparkline week.
+    """
+    day = receipt.transaction_date
+    return {
+        'receipt': ReceiptSerializer(receipt, include_items=False).data,
+        'extracted': receipt.json_data is not None,
+        'year': day.year if day else None,
+        'month': day.month if day else None,
+        'week': (day.day - 1) // 7 if day else None,
+        'week_total': _week_total(day) if day else None,
+    }
+
+
+def publish_receipts(receipts):
+    """
+    Publishes a receipt event for each receipt once the current transaction commits.
+    """
+    def send():
+        for receipt in receipts:
+            publish(DashboardEvent.RECEIPT, receipt_event(receipt))
+    transaction.on_commit(send, robust=True)
+
+
+def publish_receipt_deleted(receipt):
+    day = receipt.transaction_date
+
+    def send():
+        publish(DashboardEvent.RECEIPT_DELETED, {
+            'id': receipt.id,
+            'year': day.year if day else None,
+            'month': day.month if day else None,
+            'week': (day.day - 1) // 7 if day else None,
+            'week_total': _week_total(day) if day else None,
+        })
+    transaction.on_commit(send, robust=True)
+
+
+def publish_category_total(rollup, deleted=False):
+    data = {
+        'year': rollup.year,
+        'month': rollup.month,
+        'category': rollup.category,
+        'total': 0 if deleted else rollup.total,
+        'receipt_count': 0 if deleted else rollup.receipt_count,
+    }
+    transaction.on_commit(lambda: publish(DashboardEvent.CATEGORY_TOTAL, data), robust=True)
+
+
+def publish_budget(budget):
+    data = {'year': budget.year, 'month': budget.month, 'limit': budget.limit}
+    transaction.on_commit(lambda: publish(DashboardEvent.BUDGET, data), robust=True)
+
+
+def latest_event_id() -> int:
+    return DashboardEvent.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def _format(event):
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {json.dumps(event.data)}\n\n"
+
+
+def _missed_events(last_id):
+    """
+    True if events after `last_id` may already have been pruned; the client must reload.
+    """
+    oldest = DashboardEvent.objects.aggregate(first=Min('id'))['first']
+    return oldest is not None and oldest > last_id + 1 and last_id < latest_event_id()
+
+
+def _stream_options(duration_setting='DASHBOARD_EVENTS_STREAM_SECONDS', default_duration=300):
+    return (getattr(settings, 'DASHBOARD_EVENTS_POLL_INTERVAL', 1.0),
+            getattr(settings, 'DASHBOARD_EVENTS_HEARTBEAT', 15),
+            getattr(settings, duration_setting, default_duration))
+
+
+def _sendable(events, last_id, gap):
+    """
+    Returns (events to send now, gap). Ids are auto-increment, and two concurrent publishes can
+    commit out of id order; a stream that sent N+1 before N committed would skip N for good. So
+    events after a missing id are held back until the id shows up or `gap` (the missing id and
+    when it was first seen) is older than DASHBOARD_EVENTS_GAP_GRACE, e.g. after a rollback.
+    """
+    grace = getattr(settings, 'DASHBOARD_EVENTS_GAP_GRACE', 2.0)
+    now = time.monotonic()
+    sendable = []
+    for event in events:
+        if event.id != last_id + 1:
+            if gap is None or gap[0] != last_id + 1:
+                gap = (last_id + 1, now)
+            if now - gap[1] < grace:
+                break
+        sendable.append(event)
+        last_id = event.id
+    return sendable, gap
+
+
+def _open_stream(poll_interval, last_id):
+    # The bare id sets the browser's Last-Event-ID, so a reconnect resumes here even if no event was sent
+    return f"retry: {int(poll_interval * 1000) + 1000}\nid: {last_id}\n\n"
+
+
+def event_stream(last_id, batch_size=100):
+    """
+    Yields SSE messages for events after `last_id`, polling the table, until the stream's
+    time is up. The browser then reconnects with Last-Event-ID and picks up where it left off.
+
+    This is the WSGI stream, which holds a worker thread while it runs, so it is a short poll
+    of DASHBOARD_EVENTS_WSGI_STREAM_SECONDS rather than a long-lived connection.
+    """
+    poll_interval, heartbeat, duration = _stream_options('DASHBOARD_EVENTS_WSGI_STREAM_SECONDS', 5)
+    yield _open_stream(poll_interval, last_id)
+    if _missed_events(last_id):
+        last_id = latest_event_id()
+        yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+
+    started = last_sent = time.monotonic()
+    gap = None
+    while time.monotonic() - started < duration:
+        events = list(DashboardEvent.objects.filter(id__gt=last_id).order_by('id')[:batch_size])
+        events, gap = _sendable(events, last_id, gap)
+        for event in events:
+            yield _format(event)
+            last_id = event.id
+        if events:
+            last_sent = time.monotonic()
+            continue
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(poll_interval)
+
+
+async def aevent_stream(last_id, batch_size=100):
+    """
+    event_stream for ASGI: the waits between polls do not hold a thread.
+    """
+    poll_interval, heartbeat, duration = _stream_options()
+    yield _open_stream(poll_interval, last_id)
+    if await sync_to_async(_missed_events)(last_id):
+        last_id = await sync_to_async(latest_event_id)()
+        yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+
+    started = last_sent = time.monotonic()
+    gap = None
+    while time.monotonic() - started < duration:
+        events = [event async for event in DashboardEvent.objects.filter(id__gt=last_id).order_by('id')[:batch_size]]
+        events, gap = _sendable(events, last_id, gap)
+        for event in events:
+            yield _format(event)
+            last_id = event.id
+        if events:
+            last_sent = time.monotonic()
+            continue
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,87 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Receipt, ReceiptItem
+
+EXPORT_FIELDS = {
+    'receipts': {
+        'queryset': lambda: Receipt.objects.filter(json_data__isnull=False),
+        'columns': ['id', 'uploaded_at', 'transaction_date', 'merchant_name', 'category', 'total_amount'],
+        # JSON Lines also carries the full extraction; CSV sticks to flat columns
+        'json_columns': ['json_data'],
+        'date_field': 'transaction_date',
+        'category_field': 'category',
+    },
+    'items': {
+        'queryset': lambda: ReceiptItem.objects.all(),
+        'columns': ['id', 'receipt_id', 'transaction_date', 'merchant_name', 'receipt__category', 'position',
+                    'name', 'price'],
+        'json_columns': [],
+        'date_field': 'transaction_date',
+        'category_field': 'receipt__category',
+    },
+}
+HEADERS = {'receipt__category': 'category'}
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+
+class _Echo:
+    """A file-like object whose write() hands back the line, so csv.writer can feed a generator."""
+    def write(self, value):
+        return value
+
+
+def filtered_queryset(kind, start=None, end=None, categories=None):
+    spec = EXPORT_FIELDS[kind]
+    queryset = spec['queryset']()
+    if start:
+        queryset = queryset.filter(**{f"{spec['date_field']}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{spec['date_field']}__lte": end})
+    if categories:
+        queryset = queryset.filter(**{f"{spec['category_field']}__in": categories})
+    return queryset
+
+
+def iter_rows(queryset, fields, chunk_size=2000):
+    """
+    Yields value tuples in primary key order, one keyset page at a time. Unlike a plain
+    iterator(), this stays in constant memory on MySQL, whose driver buffers whole result sets.
+    """
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*fields)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1][0]
+
+
+def stream_export(kind, file_format, queryset, chunk_size=2000, lines_per_write=500):
+    """
+    Generates the export as text, header first, a few hundred lines per piece.
+    """
+    spec = EXPORT_FIELDS[kind]
+    columns = spec['columns'] + (spec['json_columns'] if file_format == 'jsonl' else [])
+    names = [HEADERS.get(column, column) for column in columns]
+    writer = csv.writer(_Echo())
+    encoder = DjangoJSONEncoder()
+
+    if file_format == 'csv':
+        yield writer.writerow(names)
+
+        def line(row):
+            return writer.writerow(['' if value is None else value for value in row])
+    else:
+        def line(row):
+            return encoder.encode(dict(zip(names, row))) + '\n'
+
+    lines = []
+    for row in iter_rows(queryset, columns, chunk_size):
+        lines.append(line(row))
+        if len(lines) >= lines_per_write:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
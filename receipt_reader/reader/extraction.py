@@ -0,0 +1,261 @@
+import io
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import metrics, resilience
+from .llm import get_genai, get_model
+from .parsing import parse_amount, parse_date
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+AMOUNT_FIELDS = ('Subtotal', 'Tax', 'Total Amount')
+# Fields that make a receipt useful; confidence is the share of them the model filled in
+KEY_FIELDS = ('Merchant Name', 'Transaction Date', 'Total Amount', 'Items')
+
+extraction_tiers = metrics.registry.counter(
+    'receipts_extraction_tier_total', "Extraction attempts per cascade tier and outcome.", ('tier', 'outcome'))
+extraction_tier_seconds = metrics.registry.histogram(
+    'receipts_extraction_tier_seconds', "Time spent per cascade tier, including validation.", ('tier',))
+
+
+class ExtractionError(ValueError):
+    """Raised when no tier produced a usable extraction."""
+
+
+def parse_response(text) -> dict:
+    """
+    Turns the model's reply into a dict, tolerating markdown fences and text around the object.
+    """
+    cleaned = _FENCE.sub('', str(text or '').strip())
+    try:
+        data = json.loads(cleaned)
+    except json.JSONDecodeError:
+        start, end = cleaned.find('{'), cleaned.rfind('}')
+        if start == -1 or end <= start:
+            raise ExtractionError("The model did not return a JSON object.")
+        try:
+            data = json.loads(cleaned[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise ExtractionError(f"The model returned malformed JSON: {e}")
+    if not isinstance(data, dict):
+        raise ExtractionError("The model did not return a JSON object.")
+    return data
+
+
+def validate_receipt(data: dict) -> list:
+    """
+    Checks an extraction against the schema the prompt asks for and returns a list of problems.
+    An empty list means the extraction can be trusted as is.
+    """
+    problems = []
+    for key in ('Merchant Name', 'Category', 'Transaction Time'):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            problems.append(f"{key} must be a string or null.")
+
+    transaction_date = data.get('Transaction Date')
+    if transaction_date is not None and (not isinstance(transaction_date, str) or not _DATE.match(transaction_date)
+                                         or parse_date(transaction_date) is None):
+        problems.append("Transaction Date must be a valid YYYY-MM-DD date or null.")
+
+    amounts = {}
+    for key in AMOUNT_FIELDS:
+        value = data.get(key)
+        if value is None:
+            continue
+        amounts[key] = parse_amount(value)
+        if amounts[key] is None:
+            problems.append(f"{key} must be a number or null.")
+        elif amounts[key] < 0:
+            problems.append(f"{key} must not be negative.")
+
+    items = data.get('Items')
+    item_total = Decimal('0.00')
+    if not isinstance(items, list):
+        problems.append("Items must be an array.")
+        items = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            problems.append(f"Items[{index}] must be an object.")
+            continue
+        if not isinstance(item.get('Item'), str) or not item['Item'].strip():
+            problems.append(f"Items[{index}].Item must be a non-empty string.")
+        price = parse_amount(item.get('Price'))
+        if price is None:
+            problems.append(f"Items[{index}].Price must be a number.")
+        else:
+            item_total += price
+
+    total = amounts.get('Total Amount')
+    if items and total is not None and not problems:
+        tolerance = max(Decimal('1.00'), total * Decimal('0.01'))
+        subtotal = amounts.get('Subtotal')
+        tax = amounts.get('Tax') or Decimal('0.00')
+        if subtotal is not None and abs(subtotal - item_total) > tolerance:
+            problems.append(f"Items add up to {item_total}, not the Subtotal {subtotal}.")
+        elif abs((subtotal if subtotal is not None else item_total) + tax - total) > tolerance:
+            problems.append(f"Items and tax add up to {item_total + tax}, not the Total Amount {total}.")
+    return problems
+
+
+def confidence(data: dict) -> float:
+    filled = sum(1 for key in KEY_FIELDS if data.get(key) not in (None, '', []))
+    return filled / len(KEY_FIELDS)
+
+
+class ExtractionBackend:
+    """
+    Turns a prepared receipt image into the model's raw text reply. Subclass it to plug in
+    another model or provider. Any object with a `name` and `extract` works, so fakes can stand in.
+    """
+    name = 'backend'
+
+    def extract(self, prepared, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def aextract(self, prepared, prompt: str) -> str:
+        """
+        Async variant for the ASGI views. By default the sync extract runs in a worker thread.
+        """
+        return await sync_to_async(self.extract, thread_sensitive=False)(prepared, prompt)
+
+
+class GeminiBackend(ExtractionBackend):
+    def __init__(self, model_name):
+        self.name = model_name
+        self.model = get_model(model_name)
+
+    def _image_part(self, prepared):
+        """
+        Sends small images inline with the request; only large ones take the separate upload round trip.
+        """
+        if prepared.size <= getattr(settings, 'RECEIPT_INLINE_IMAGE_MAX_BYTES', 4 * 1024 * 1024):
+            return {'mime_type': prepared.mime_type, 'data': prepared.data}
+        # A fresh buffer per attempt, since a failed upload may have consumed the last one
+        return resilience.call(self.name, lambda: get_genai().upload_file(path=io.BytesIO(prepared.data),
+                                                                           mime_type=prepared.mime_type))
+
+    def extract(self, prepared, prompt):
+        with metrics.llm_call(self.name, 'extract') as call:
+            call.response = self.model.generate_content([prompt, self._image_part(prepared)])
+        return call.response.text
+
+    async def aextract(self, prepared, prompt):
+        if prepared.size <= getattr(settings, 'RECEIPT_INLINE_IMAGE_MAX_BYTES', 4 * 1024 * 1024):
+            image_part = self._image_part(prepared)
+        else:
+            # The SDK has no async upload; only oversized images pay for a thread
+            image_part = await sync_to_async(self._image_part)(prepared)
+        with metrics.llm_call(self.name, 'extract') as call:
+            call.response = await self.model.generate_content_async([prompt, image_part])
+        return call.response.text
+
+
+@dataclass
+class ExtractionResult:
+    data: dict
+    tier: str
+    confidence: float
+    problems: list = field(default_factory=list)
+    escalations: list = field(default_factory=list)
+
+
+class CascadeExtractor:
+    """
+    Tries the backends in order, cheapest first. A tier's answer is accepted when it parses,
+    passes validate_receipt and fills enough key fields; otherwise the next tier is asked.
+    If every tier falls short, the last parseable answer is returned with its problems attached.
+    """
+    def __init__(self, backends, min_confidence=0.75, validator=validate_receipt):
+        if not backends:
+            raise ValueError("A cascade needs at least one backend.")
+        self.backends = list(backends)
+        self.min_confidence = min_confidence
+        self.validator = validator
+
+    @property
+    def name(self):
+        return '>'.join(backend.name for backend in self.backends)
+
+    def _failed(self, backend, error, started, attempt):
+        extraction_tier_seconds.observe(time.perf_counter() - started, tier=backend.name)
+        extraction_tiers.inc(tier=backend.name, outcome='error')
+        attempt['escalations'].append(f"{backend.name}: {error}")
+        if isinstance(error, resilience.ModelUnavailable):
+            attempt['unavailable'] = error
+
+    def _judge(self, backend, data, started, attempt):
+        """
+        Returns the result if the tier's answer is good enough, otherwise records why not and returns None.
+        """
+        problems = self.validator(data)
+        score = confidence(data)
+        extraction_tier_seconds.observe(time.perf_counter() - started, tier=backend.name)
+        result = ExtractionResult(data, backend.name, score, problems, attempt['escalations'])
+        if not problems and score >= self.min_confidence:
+            extraction_tiers.inc(tier=backend.name, outcome='accepted')
+            return result
+
+        extraction_tiers.inc(tier=backend.name, outcome='escalated')
+        reason = '; '.join(problems) or f"low confidence ({score:.2f})"
+        attempt['escalations'].append(f"{backend.name}: {reason}")
+        attempt['best'] = result
+        return None
+
+    def _fallback(self, attempt):
+        best, escalations = attempt['best'], attempt['escalations']
+        if best is None and attempt['unavailable'] is not None:
+            # Worth retrying later rather than failing the receipt outright
+            raise attempt['unavailable']
+        if best is None:
+            raise ExtractionError("Extraction failed on every model: " + " | ".join(escalations))
+        logger.warning("No tier produced a clean extraction; keeping %s's answer: %s",
+                       best.tier, " | ".join(escalations))
+        best.escalations = escalations
+        return best
+
+    def extract(self, prepared, prompt) -> ExtractionResult:
+        attempt = {'best': None, 'unavailable': None, 'escalations': []}
+        for backend in self.backends:
+            started = time.perf_counter()
+            try:
+                data = parse_response(backend.extract(prepared, prompt))
+            except Exception as e:
+                self._failed(backend, e, started, attempt)
+                continue
+            result = self._judge(backend, data, started, attempt)
+            if result is not None:
+                return result
+        return self._fallback(attempt)
+
+    async def aextract(self, prepared, prompt) -> ExtractionResult:
+        attempt = {'best': None, 'unavailable': None, 'escalations': []}
+        for backend in self.backends:
+            started = time.perf_counter()
+            try:
+                # Backends are duck-typed; one without aextract runs its sync extract in a thread
+                aextract = getattr(backend, 'aextract', None) or sync_to_async(backend.extract, thread_sensitive=False)
+                data = parse_response(await aextract(prepared, prompt))
+            except Exception as e:
+                self._failed(backend, e, started, attempt)
+                continue
+            result = self._judge(backend, data, started, attempt)
+            if result is not None:
+                return result
+        return self._fallback(attempt)
+
+
+def default_backends():
+    """
+    One GeminiBackend per model in RECEIPT_EXTRACTION_TIERS, cheapest first.
+    """
+    tiers = getattr(settings, 'RECEIPT_EXTRACTION_TIERS', ['gemini-2.5-flash-lite', 'gemini-2.5-flash'])
+    return [GeminiBackend(model_name) for model_name in tiers]
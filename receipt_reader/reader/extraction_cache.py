@@ -0,0 +1,150 @@
+import hashlib
+import io
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ExtractionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(image_bytes: bytes) -> str:
+    """
+    Returns the SHA-256 hex digest of the raw image bytes.
+    """
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes: bytes):
+    """
+    Computes a 64-bit difference hash (dHash) of the image, or None if Pillow is unavailable
+    or the bytes cannot be decoded. Re-encoded copies of a receipt usually hash the same.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            grayscale = ImageOps.autocontrast(image.convert('L'))
+            pixels = list(grayscale.resize((9, 8), Image.Resampling.BOX).getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def _scoped_key(namespace: str, digest: str) -> str:
+    return hashlib.sha256(f"{namespace}:{digest}".encode()).hexdigest()
+
+
+class ExtractionCache:
+    """
+    A persistent, size-bounded cache of extraction results stored in ExtractionCacheEntry.
+
+    Every key is scoped by a namespace (the model name and prompt), so editing the prompt or
+    switching models makes old entries unreachable; they are then aged out by LRU eviction.
+    """
+    def __init__(self, max_entries=5000, use_perceptual_hash=False):
+        self.max_entries = max_entries
+        self.use_perceptual_hash = use_perceptual_hash
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'perceptual_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self) -> dict:
+        """
+        Returns this process's hit/miss counters along with the current number of stored entries.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['entries'] = ExtractionCacheEntry.objects.count()
+        return stats
+
+    def lookup(self, image_bytes: bytes, namespace: str):
+        """
+        Returns the cached json_data for the image, or None on a miss.
+        """
+        entry = ExtractionCacheEntry.objects.filter(key=_scoped_key(namespace, content_hash(image_bytes))).first()
+        if entry is None and self.use_perceptual_hash:
+            phash = perceptual_hash(image_bytes)
+            if phash is not None:
+                entry = (ExtractionCacheEntry.objects
+                         .filter(perceptual_key=_scoped_key(namespace, phash))
+                         .order_by('-last_used_at')
+                         .first())
+                if entry is not None:
+                    self._count('perceptual_hits')
+
+        if entry is None:
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        ExtractionCacheEntry.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+        return entry.json_data
+
+    def store(self, image_bytes: bytes, namespace: str, json_data: dict):
+        """
+        Saves an extraction result and evicts the least recently used entries beyond max_entries.
+        """
+        phash = perceptual_hash(image_bytes) if self.use_perceptual_hash else None
+        try:
+            ExtractionCacheEntry.objects.update_or_create(
+                key=_scoped_key(namespace, content_hash(image_bytes)),
+                defaults={
+                    'perceptual_key': _scoped_key(namespace, phash) if phash else None,
+                    'json_data': json_data,
+                    'last_used_at': timezone.now(),
+                },
+            )
+        except IntegrityError:
+            # Another worker stored the same image first; its result is just as good
+            return
+        self._count('stores')
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries so that at most max_entries remain.
+        """
+        stale_ids = list(
+            ExtractionCacheEntry.objects.order_by('-last_used_at').values_list('id', flat=True)[self.max_entries:]
+        )
+        if stale_ids:
+            ExtractionCacheEntry.objects.filter(id__in=stale_ids).delete()
+            self._count('evictions', len(stale_ids))
+            logger.info("Evicted %d extraction cache entries", len(stale_ids))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """
+    Returns the process-wide extraction cache, creating it on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(
+                max_entries=getattr(settings, 'RECEIPT_EXTRACTION_CACHE_MAX_ENTRIES', 5000),
+                use_perceptual_hash=getattr(settings, 'RECEIPT_EXTRACTION_CACHE_PERCEPTUAL_HASH', False),
+            )
+        return _cache
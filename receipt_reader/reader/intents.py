@@ -0,0 +1,205 @@
+"""
+A deterministic fast path for the chatbot. Common aggregate questions ("how much did I spend on
+Groceries in August?", "how many receipts from City Mart this month?", "what was my biggest
+purchase last month?") are recognized with local patterns and answered from the database with
+exact figures. Anything the router is not sure about falls through to the model.
+"""
+import calendar
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from . import metrics
+from .chat_context import QueryFilters, parse_query, tokenize
+from .models import MonthlySpendRollup, Receipt, ReceiptItem
+from .parsing import CATEGORY_ALIASES, month_bounds, month_span
+
+logger = logging.getLogger(__name__)
+
+SUM = 'sum'
+COUNT = 'count'
+MAX_PURCHASE = 'max_purchase'
+MAX_ITEM = 'max_item'
+
+_SUM = re.compile(r"\bhow much\b.*\b(spend|spent|spending|pay|paid)\b"
+                  r"|\b(total|sum of)\b.*\b(spend|spent|spending|expenses?)\b"
+                  r"|\bwhat did i spend\b")
+_COUNT = re.compile(r"\bhow many\b.*\b(receipts?|purchases?|transactions?|times|orders?|visits?)\b"
+                    r"|\bnumber of (receipts|purchases|transactions|orders|visits)\b")
+_MAX = re.compile(r"\b(biggest|largest|most expensive|highest|priciest|costliest)\b(?:\s+\w+){0,2}?"
+                  r"\s+(purchase|expense|receipt|transaction|bill|item|thing|product)s?\b")
+_MERCHANT = re.compile(r"\b(?:at|from)\s+(.+?)(?=\s+(?:in|on|during|this|last|for|over|today|yesterday)\b|[?.!,]|$)")
+# Advice, comparisons, follow-ups and date phrases parse_query does not understand need the model
+_DECLINE = re.compile(r"\b(why|should|could|would|how can|how do|advice|advise|tips?|save|saving|reduce|cut|"
+                      r"compare|compared|versus|vs|or|average|per|budget|more|less|trend|predict|forecast|"
+                      r"there|that|those|them|it|same|since|between|before|after|until|till|past|previous|"
+                      r"quarter|q[1-4]|weekend|except|excluding|without|not)\b")
+_PERIOD_WORDS = re.compile(r"\b(days?|weeks?|months?|years?)\b")
+# Words the patterns above account for; any other word might change the question's meaning
+_INTENT_WORDS = {
+    'total', 'sum', 'spending', 'pay', 'paid', 'many', 'receipt', 'receipts', 'purchase', 'purchases',
+    'transaction', 'transactions', 'times', 'order', 'orders', 'visit', 'visits', 'number', 'biggest',
+    'largest', 'most', 'expensive', 'highest', 'priciest', 'costliest', 'item', 'items', 'thing',
+    'product', 'expense', 'expenses', 'bill', 'have', 'has', 'had', 'made', 'make', 'buy', 'bought',
+    'all', 'overall', 'single', 'ever', 'week', 'today', 'yesterday', 'so', 'far', 'up', 'now',
+}
+
+intent_requests = metrics.registry.counter(
+    'receipts_chat_fast_path_total', "Chat questions by fast-path intent; intent 'none' went to the model.",
+    ('intent',))
+
+
+@dataclass
+class Intent:
+    kind: str
+    filters: QueryFilters
+    merchant: str = None
+
+
+def match_intent(query: str, today: date = None):
+    """
+    Returns the Intent a question asks for, or None if it should go to the model.
+    """
+    text = ' '.join(str(query or '').lower().split())
+    if not text or _DECLINE.search(text):
+        return None
+
+    max_match = _MAX.search(text)
+    if max_match:
+        kind = MAX_ITEM if max_match.group(2) in ('item', 'thing', 'product') else MAX_PURCHASE
+    elif _COUNT.search(text):
+        kind = COUNT
+    elif _SUM.search(text):
+        kind = SUM
+    else:
+        return None
+
+    filters = parse_query(text, today)
+    if len(filters.categories) > 1 or (filters.start is None and _PERIOD_WORDS.search(text)):
+        return None
+
+    merchant = None
+    explained = set(_INTENT_WORDS)
+    merchant_match = _MERCHANT.search(text)
+    if merchant_match:
+        merchant = (Receipt.objects.filter(merchant_name__iexact=merchant_match.group(1).strip())
+                    .values_list('merchant_name', flat=True).first())
+        if merchant is None:
+            return None
+        explained |= tokenize(merchant)
+    for alias in CATEGORY_ALIASES:
+        if re.search(rf"\b{re.escape(alias)}\b", text):
+            explained |= tokenize(alias)
+
+    if filters.terms - explained:
+        return None
+    return Intent(kind, filters, merchant)
+
+
+def _receipts(intent):
+    receipts = Receipt.objects.filter(json_data__isnull=False)
+    if intent.filters.start:
+        receipts = receipts.filter(transaction_date__gte=intent.filters.start,
+                                   transaction_date__lt=intent.filters.end)
+    if intent.filters.categories:
+        receipts = receipts.filter(category__in=intent.filters.categories)
+    if intent.merchant:
+        receipts = receipts.filter(merchant_name=intent.merchant)
+    return receipts
+
+
+def _totals(intent):
+    """
+    Returns (total, receipt count). Whole months without a merchant filter come from the rollups.
+    """
+    months = month_span(intent.filters.start, intent.filters.end)
+    if intent.merchant is None and (intent.filters.start is None or months):
+        rollups = MonthlySpendRollup.objects.all()
+        if months:
+            rollups = rollups.filter(year__gte=months[0][0], year__lte=months[-1][0])
+        if intent.filters.categories:
+            rollups = rollups.filter(category__in=intent.filters.categories)
+        total, count = Decimal('0.00'), 0
+        for year, month, rollup_total, receipt_count in rollups.values_list('year', 'month', 'total', 'receipt_count'):
+            if months is None or (year, month) in months:
+                total += rollup_total
+                count += receipt_count
+        return total, count
+    stats = _receipts(intent).aggregate(total=Sum('total_amount'), count=Count('id'))
+    return stats['total'] or Decimal('0.00'), stats['count']
+
+
+def _money(amount):
+    return f"₹{amount:,.2f}"
+
+
+def describe_period(start, end):
+    if start is None:
+        return ""
+    last_day = end - timedelta(days=1)
+    if start == last_day:
+        return f"on {start:%d %B %Y}"
+    if start.day == 1 and end.day == 1:
+        if start.month == 1 and end == date(start.year + 1, 1, 1):
+            return f"in {start.year}"
+        if end == month_bounds(start.year, start.month)[1]:
+            return f"in {calendar.month_name[start.month]} {start.year}"
+    return f"between {start:%d %B %Y} and {last_day:%d %B %Y}"
+
+
+def answer_intent(intent) -> str:
+    where = ''.join([
+        f" on {next(iter(intent.filters.categories))}" if intent.filters.categories else '',
+        f" at {intent.merchant}" if intent.merchant else '',
+    ])
+    period = describe_period(intent.filters.start, intent.filters.end)
+    if intent.kind in (SUM, COUNT):
+        period = period or "in total"
+    where = f"{where} {period}" if period else where
+
+    if intent.kind in (SUM, COUNT):
+        total, count = _totals(intent)
+        if not count:
+            return f"I couldn't find any receipts{where}."
+        receipts = f"{count} receipt{'s' if count != 1 else ''}"
+        if intent.kind == COUNT:
+            return f"You have {receipts}{where}, adding up to {_money(total)}."
+        return f"You spent {_money(total)}{where}, across {receipts}."
+
+    if intent.kind == MAX_PURCHASE:
+        receipt = _receipts(intent).exclude(total_amount__isnull=True).order_by('-total_amount', '-id').first()
+        if receipt is None:
+            return f"I couldn't find any receipts{where}."
+        return (f"Your biggest purchase{where} was {_money(receipt.total_amount)} at "
+                f"{receipt.merchant_name or 'an unknown merchant'} on {receipt.transaction_date or 'an unknown date'}.")
+
+    items = ReceiptItem.objects.filter(receipt__in=_receipts(intent))
+    item = items.order_by('-price', '-id').first()
+    if item is None:
+        return f"I couldn't find any items{where}."
+    return (f"Your most expensive item{where} was {item.name} for {_money(item.price)}, bought at "
+            f"{item.merchant_name or 'an unknown merchant'} on {item.transaction_date or 'an unknown date'}.")
+
+
+def route(query: str, today: date = None):
+    """
+    Answers the question from the database if it is a recognized aggregate question.
+    Returns None when it should go to the model instead.
+    """
+    if not getattr(settings, 'CHATBOT_FAST_PATH', True):
+        return None
+    today = today or timezone.localdate()
+    try:
+        intent = match_intent(query, today)
+        answer = answer_intent(intent) if intent else None
+    except Exception:
+        logger.exception("Fast path failed for %r; falling back to the model", query)
+        intent = answer = None
+    intent_requests.inc(intent=intent.kind if answer else 'none')
+    return answer
@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .agents import ReceiptScanningAgent
+from .llm import get_agent
+from .models import ReceiptJob
+from .resilience import ModelUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_receipt(receipt):
+    """
+    Queues a saved receipt for extraction and wakes the worker pool.
+    """
+    job = ReceiptJob.objects.create(receipt=receipt)
+    if getattr(settings, 'RECEIPT_WORKER_AUTOSTART', True):
+        transaction.on_commit(get_worker_pool().notify)
+    return job
+
+
+def claim_next_job():
+    """
+    Atomically moves the oldest pending job to 'running' and returns it, or None if the queue is empty.
+    Rows locked by another worker are skipped so several processes can share the same queue.
+    """
+    with transaction.atomic():
+        job = (ReceiptJob.objects
+               .select_for_update(skip_locked=True)
+               .filter(status=ReceiptJob.PENDING)
+               .filter(Q(run_after__isnull=True) | Q(run_after__lte=timezone.now()))
+               .order_by('created_at', 'id')
+               .first())
+        if job is None:
+            return None
+        job.status = ReceiptJob.RUNNING
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'attempts'])
+    return job
+
+
+def run_job(job, agent=None):
+    """
+    Runs extraction for a claimed job and records the outcome on it.
+    """
+    receipt = job.receipt
+    try:
+        agent = agent or get_agent(ReceiptScanningAgent)
+        json_data = agent.process_receipt(receipt.image.path)
+        receipt.apply_extraction(json_data, agent.prompt_version)
+    except ModelUnavailable as e:
+        # The model is rate limited or down; put the job back and try again once it should have recovered
+        if job.attempts < getattr(settings, 'RECEIPT_JOB_MAX_ATTEMPTS', 5):
+            logger.info("Model unavailable for receipt %s; retrying in %.0fs", receipt.id, e.retry_after or 0)
+            job.status = ReceiptJob.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=max(1.0, e.retry_after or 0))
+        else:
+            job.status = ReceiptJob.FAILED
+        job.error = str(e)
+    except Exception as e:
+        logger.exception("Extraction failed for receipt %s", receipt.id)
+        job.status = ReceiptJob.FAILED
+        job.error = str(e)
+    else:
+        job.status = ReceiptJob.DONE
+        job.error = None
+    if job.status != ReceiptJob.PENDING:
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'run_after'])
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Puts jobs left 'running' by a worker that died back on the queue. A job that has used up
+    its attempts is marked failed instead, so one that keeps killing its worker is not retried forever.
+    Returns the number of jobs put back.
+    """
+    timeout = getattr(settings, 'RECEIPT_JOB_TIMEOUT', 600)
+    max_attempts = getattr(settings, 'RECEIPT_JOB_MAX_ATTEMPTS', 5)
+    now = timezone.now()
+    stale = ReceiptJob.objects.filter(status=ReceiptJob.RUNNING, started_at__lt=now - timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=ReceiptJob.FAILED, finished_at=now,
+        error=f"The worker stopped while running the job on each of its {max_attempts} attempts.",
+    )
+    if failed:
+        logger.warning("Marked %d stale receipt jobs as failed after %d attempts", failed, max_attempts)
+    return stale.update(status=ReceiptJob.PENDING, started_at=None)
+
+
+class ReceiptWorkerPool:
+    """
+    A bounded pool of threads that drain the database-backed ReceiptJob queue.
+    Workers sleep between polls and are woken early whenever a job is enqueued in this process.
+    Every `requeue_interval` seconds one of them also requeues jobs orphaned by a dead worker,
+    in this or any other process.
+    """
+    def __init__(self, size, poll_interval=2.0, requeue_interval=60.0):
+        self.size = size
+        self.poll_interval = poll_interval
+        self.requeue_interval = requeue_interval
+        self._next_requeue = 0.0
+        self._requeue_lock = threading.Lock()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._requeue_if_due()
+            for index in range(self.size):
+                thread = threading.Thread(target=self._run, name=f"receipt-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        with self._lock:
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def join(self):
+        for thread in list(self._threads):
+            thread.join()
+
+    def _requeue_if_due(self):
+        with self._requeue_lock:
+            if time.monotonic() < self._next_requeue:
+                return
+            self._next_requeue = time.monotonic() + self.requeue_interval
+        try:
+            requeue_stale_jobs()
+        except Exception:
+            logger.exception("Could not requeue stale receipt jobs")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            close_old_connections()
+            self._requeue_if_due()
+            try:
+                job = claim_next_job()
+            except Exception:
+                logger.exception("Could not claim a receipt job")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                run_job(job)
+            finally:
+                close_old_connections()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """
+    Returns the process-wide worker pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ReceiptWorkerPool(
+                size=getattr(settings, 'RECEIPT_WORKER_THREADS', 4),
+                poll_interval=getattr(settings, 'RECEIPT_WORKER_POLL_INTERVAL', 2.0),
+                requeue_interval=getattr(settings, 'RECEIPT_JOB_REQUEUE_INTERVAL', 60.0),
+            )
+        return _pool
@@ -0,0 +1,102 @@
+import importlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .resilience import ResilientModel
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_genai = None
+_models = {}
+_agents = {}
+_stats = {
+    'sdk_load_seconds': None,
+    'model_clients_created': 0,
+    'model_clients_reused': 0,
+    'agents_created': 0,
+    'agents_reused': 0,
+    'agent_setup_seconds': 0.0,
+}
+
+
+def get_genai():
+    """
+    Imports and configures the Gemini SDK on first use and returns the module.
+
+    Nothing imports the SDK at module load, so management commands such as migrate
+    start without paying for it. GENAI_MODULE can point at a stand-in with the same API.
+    """
+    global _genai
+    if _genai is not None:
+        return _genai
+    with _lock:
+        if _genai is None:
+            started = time.perf_counter()
+            from dotenv import load_dotenv
+            load_dotenv()
+            module = importlib.import_module(getattr(settings, 'GENAI_MODULE', 'google.generativeai'))
+            module.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _stats['sdk_load_seconds'] = time.perf_counter() - started
+            logger.info("Loaded %s in %.3fs", module.__name__, _stats['sdk_load_seconds'])
+            _genai = module
+    return _genai
+
+
+def get_model(model_name: str):
+    """
+    Returns the shared GenerativeModel for a model name. Model clients are safe to use from
+    several threads and reusing them keeps their HTTP/gRPC connections warm.
+
+    The client is wrapped so that generate_content goes through the shared rate limit,
+    retries and circuit breaker in reader.resilience.
+    """
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = ResilientModel(model_name, get_genai().GenerativeModel(model_name))
+            _models[model_name] = model
+            _stats['model_clients_created'] += 1
+        else:
+            _stats['model_clients_reused'] += 1
+        return model
+
+
+def get_agent(agent_class):
+    """
+    Returns the process-wide instance of an agent class, constructing it on first use.
+    """
+    with _lock:
+        agent = _agents.get(agent_class)
+        if agent is None:
+            started = time.perf_counter()
+            agent = agent_class()
+            _stats['agent_setup_seconds'] += time.perf_counter() - started
+            _agents[agent_class] = agent
+            _stats['agents_created'] += 1
+        else:
+            _stats['agents_reused'] += 1
+        return agent
+
+
+def stats() -> dict:
+    """
+    Returns SDK load time and client/agent reuse counters for this process.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def reset():
+    """
+    Drops the cached SDK module, model clients and agents, e.g. after changing GENAI_MODULE.
+    """
+    global _genai
+    with _lock:
+        _genai = None
+        _models.clear()
+        _agents.clear()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reader.models import Receipt, ReceiptItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the ReceiptItem rows of every receipt from the line items in its json_data, e.g. after "
+        "the item parsing changed. Existing receipts' items are created by migration 0007 on deploy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Receipts written per transaction.")
+        parser.add_argument('--rebuild', action='store_true', help="Replace the items of every receipt.")
+
+    def handle(self, *args, **options):
+        if not options['rebuild']:
+            raise CommandError("Items are backfilled by migrations; pass --rebuild to replace every receipt's items.")
+        batch_size = options['batch_size']
+        receipts = Receipt.objects.filter(json_data__isnull=False).order_by('id')
+
+        batch = []
+        receipt_count = item_count = 0
+        for receipt in receipts.only('id', 'json_data', 'transaction_date', 'merchant_name').iterator(chunk_size=batch_size):
+            batch.append(receipt)
+            if len(batch) >= batch_size:
+                item_count += self._write(batch)
+                receipt_count += len(batch)
+                batch = []
+        if batch:
+            item_count += self._write(batch)
+            receipt_count += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {item_count} items for {receipt_count} receipts."))
+
+    def _write(self, receipts):
+        items = [item for receipt in receipts for item in receipt.build_items()]
+        with transaction.atomic():
+            ReceiptItem.objects.filter(receipt__in=receipts).delete()
+            ReceiptItem.objects.bulk_create(items, batch_size=1000)
+        return len(items)
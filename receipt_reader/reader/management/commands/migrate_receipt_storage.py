@@ -0,0 +1,62 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from reader.models import Receipt
+from reader.storage import receipt_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves receipt images saved before content-addressed storage into the hashed layout, "
+        "deduplicating identical files, and creates missing thumbnails."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help="Delete each old file once no receipt points at it any more.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        upload_to = Receipt._meta.get_field('image').upload_to
+        moved = thumbnails = missing = freed = 0
+        names = set()
+
+        receipts = Receipt.objects.exclude(image='').filter(Q(thumbnail__isnull=True) | Q(thumbnail='')
+                                                           | ~Q(image__regex=r'/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}'))
+        for receipt in receipts.order_by('id').iterator(chunk_size=200):
+            old_name = receipt.image.name
+            if not receipt_storage.exists(old_name):
+                missing += 1
+                continue
+
+            changes = {}
+            if not receipt_storage.is_content_addressed(old_name):
+                if options['dry_run']:
+                    with receipt_storage.open(old_name, 'rb') as f:
+                        names.add(receipt_storage.content_name(os.path.join(upload_to, os.path.basename(old_name)), f))
+                    moved += 1
+                    continue
+                with receipt_storage.open(old_name, 'rb') as f:
+                    changes['image'] = receipt_storage.save(os.path.join(upload_to, os.path.basename(old_name)), f)
+                names.add(changes['image'])
+                receipt.image.name = changes['image']
+                moved += 1
+
+            if not receipt.thumbnail and not options['dry_run'] and receipt.create_thumbnail():
+                changes['thumbnail'] = receipt.thumbnail.name
+                thumbnails += 1
+
+            if changes:
+                Receipt.objects.filter(pk=receipt.pk).update(updated_at=timezone.now(), **changes)
+            if 'image' in changes and options['delete_originals'] and not Receipt.objects.filter(image=old_name).exists():
+                freed += receipt_storage.size(old_name)
+                receipt_storage.delete(old_name)
+
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {moved} images into {len(names)} content-addressed files; "
+            f"created {thumbnails} thumbnails; {missing} images missing on disk; freed {freed} bytes."
+        ))
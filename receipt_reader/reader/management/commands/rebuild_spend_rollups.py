@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from reader.models import MonthlySpendRollup
+
+
+class Command(BaseCommand):
+    help = "Recomputes the monthly/category spend rollups from the receipts table to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help="Only rebuild this year.")
+        parser.add_argument('--month', type=int, help="Only rebuild this month (use with --year).")
+
+    def handle(self, *args, **options):
+        count = MonthlySpendRollup.rebuild(year=options['year'], month=options['month'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} spend rollup buckets."))
@@ -0,0 +1,184 @@
+import difflib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+
+from reader.agents import ReceiptScanningAgent
+from reader.llm import get_agent
+from reader.models import Receipt
+from reader.resilience import ModelUnavailable
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-runs extraction over stored receipt images, e.g. after the scanning prompt changed. "
+        "Progress is checkpointed after every batch, so an interrupted run resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="Earliest transaction date (YYYY-MM-DD).")
+        parser.add_argument('--end', type=date.fromisoformat, help="Latest transaction date (YYYY-MM-DD), inclusive.")
+        parser.add_argument('--category', nargs='+', help="Only receipts in these categories.")
+        parser.add_argument('--prompt-version', nargs='+', help="Only receipts extracted with these prompt versions.")
+        parser.add_argument('--stale', action='store_true',
+                            help="Only receipts not extracted with the current prompt, including unversioned ones.")
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'RECEIPT_BATCH_PARALLELISM', 4),
+                            help="Concurrent extractions.")
+        parser.add_argument('--batch-size', type=int, default=50, help="Receipts written per transaction.")
+        parser.add_argument('--checkpoint', default='reextract-checkpoint.json',
+                            help="File recording progress; the run resumes from it if it exists.")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Extract and print a diff of old and new json_data without writing anything.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--workers and --batch-size must be at least 1.")
+        self.agent = get_agent(ReceiptScanningAgent)
+        selection = {
+            'start': options['start'] and options['start'].isoformat(),
+            'end': options['end'] and options['end'].isoformat(),
+            'category': options['category'],
+            'prompt_version': options['prompt_version'],
+            'stale': self.agent.prompt_version if options['stale'] else None,
+        }
+        receipts = self._select(selection)
+
+        dry_run = self.dry_run = options['dry_run']
+        path = options['checkpoint']
+        state = {'selection': selection, 'last_id': 0, 'failed': [], 'done': 0, 'changed': 0}
+        if not dry_run and not options['restart'] and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state['selection'] != selection:
+                raise CommandError(f"{path} was written for a different selection; use --restart to discard it.")
+            self.stdout.write(f"Resuming after receipt {state['last_id']} with {len(state['failed'])} failed receipts to retry.")
+
+        retry = state['failed']
+        state['failed'] = []
+        total = receipts.filter(Q(id__gt=state['last_id']) | Q(id__in=retry)).count()
+        self.stdout.write(f"Re-extracting {total} receipts with prompt version {self.agent.prompt_version} "
+                          f"on {options['workers']} workers{' (dry run)' if dry_run else ''}.")
+
+        started = time.monotonic()
+        processed = 0
+        pool = ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='reextract')
+        try:
+            for batch, advance in self._batches(receipts, retry, state, options['batch_size']):
+                results = list(pool.map(self._extract, batch))
+                failures = [receipt for receipt, outcome in results if isinstance(outcome, Exception)]
+                if failures and all(isinstance(outcome, ModelUnavailable) for _, outcome in results):
+                    raise CommandError(f"The model is unavailable ({results[0][1]}); rerun later to resume.")
+
+                changed = self._apply(results, dry_run)
+                state['failed'].extend(receipt.id for receipt in failures)
+                state['done'] += len(batch) - len(failures)
+                state['changed'] += changed
+                if advance:
+                    state['last_id'] = batch[-1].id
+                if not dry_run:
+                    self._save(path, state)
+
+                processed += len(batch)
+                elapsed = time.monotonic() - started
+                rate = processed / elapsed if elapsed else 0.0
+                eta = timedelta(seconds=round((total - processed) / rate)) if rate else '?'
+                self.stdout.write(f"  {processed}/{total} receipts, {changed} changed, {len(failures)} failed "
+                                  f"in this batch; {rate:.1f} receipts/s, ETA {eta}")
+        except KeyboardInterrupt:
+            raise CommandError(f"Interrupted after receipt {state['last_id']}; rerun to resume.")
+        finally:
+            # The unwritten batch is dropped; it is extracted again on the next run
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        failed = len(state['failed'])
+        if not dry_run and not failed and os.path.exists(path):
+            os.remove(path)
+        verb = "would change" if dry_run else "changed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-extracted {state['done']} receipts (this run took {time.monotonic() - started:.1f}s); "
+            f"{verb} {state['changed']}; {failed} failed."
+            + (f" Their ids are in {path}; rerun to retry them." if failed and not dry_run else "")
+        ))
+
+    def _select(self, selection):
+        receipts = Receipt.objects.exclude(image='')
+        if selection['start']:
+            receipts = receipts.filter(transaction_date__gte=selection['start'])
+        if selection['end']:
+            receipts = receipts.filter(transaction_date__lte=selection['end'])
+        if selection['category']:
+            receipts = receipts.filter(category__in=selection['category'])
+        if selection['prompt_version']:
+            receipts = receipts.filter(prompt_version__in=selection['prompt_version'])
+        if selection['stale']:
+            receipts = receipts.exclude(prompt_version=selection['stale'])
+        return receipts.order_by('id')
+
+    def _batches(self, receipts, retry, state, batch_size):
+        """
+        Yields (receipts, advance): first the failures of an earlier run, then the rest of the
+        selection by ascending id. `advance` says whether the batch moves the checkpoint forward.
+        """
+        for index in range(0, len(retry), batch_size):
+            batch = list(receipts.filter(id__in=retry[index:index + batch_size]))
+            if batch:
+                yield batch, False
+        while True:
+            # Keyset pagination: rewriting receipts can move them out of the selection
+            batch = list(receipts.filter(id__gt=state['last_id'])[:batch_size])
+            if not batch:
+                return
+            yield batch, True
+
+    def _extract(self, receipt):
+        try:
+            # A dry run leaves the extraction cache as it was, too
+            return receipt, self.agent.process_receipt(receipt.image.path, use_cache=False, store=not self.dry_run)
+        except Exception as e:
+            self.stderr.write(f"Receipt {receipt.id}: {e}")
+            return receipt, e
+        finally:
+            # Pool threads open their own DB connections (for the extraction cache); don't leak them
+            connections.close_all()
+
+    def _apply(self, results, dry_run):
+        """
+        Writes the successful extractions in one transaction, or prints their diffs on a dry run.
+        Returns how many receipts' json_data changed.
+        """
+        changed = 0
+        with transaction.atomic():
+            for receipt, json_data in results:
+                if isinstance(json_data, Exception):
+                    continue
+                if json_data != receipt.json_data:
+                    changed += 1
+                    if dry_run:
+                        self._diff(receipt, json_data)
+                if not dry_run:
+                    receipt.apply_extraction(json_data, self.agent.prompt_version)
+        return changed
+
+    def _diff(self, receipt, json_data):
+        def lines(data):
+            return json.dumps(data, indent=2, sort_keys=True, ensure_ascii=False).splitlines()
+
+        self.stdout.write('\n'.join(difflib.unified_diff(
+            lines(receipt.json_data), lines(json_data), lineterm='',
+            fromfile=f"receipt {receipt.id} ({receipt.prompt_version or 'unversioned'})",
+            tofile=f"receipt {receipt.id} ({self.agent.prompt_version})",
+        )))
+
+    def _save(self, path, state):
+        # Write then rename, so an interruption never leaves a truncated checkpoint
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
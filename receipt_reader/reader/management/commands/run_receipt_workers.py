@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reader.jobs import ReceiptWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Runs a pool of receipt extraction workers in the foreground until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int,
+            default=getattr(settings, 'RECEIPT_WORKER_THREADS', 4),
+            help="Number of concurrent extraction workers.",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=getattr(settings, 'RECEIPT_WORKER_POLL_INTERVAL', 2.0),
+            help="Seconds an idle worker waits before checking the queue again.",
+        )
+
+    def handle(self, *args, **options):
+        pool = ReceiptWorkerPool(size=options['threads'], poll_interval=options['poll_interval'],
+                                 requeue_interval=getattr(settings, 'RECEIPT_JOB_REQUEUE_INTERVAL', 60.0))
+        pool.start()
+        self.stdout.write(f"Started {options['threads']} receipt workers. Press Ctrl+C to stop.")
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping receipt workers...")
+            pool.stop(timeout=30)
@@ -0,0 +1,282 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BYTES_BUCKETS = (16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(tuple(labels.get(name, '') for name in self.labelnames), ((), 0))
+        return sum(counts)
+
+    def sum(self, **labels):
+        _, total = self._values.get(tuple(labels.get(name, '') for name in self.labelnames), ((), 0))
+        return total
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    labels = _label_text(self.labelnames + ('le',), key + (le,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _label_text(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    The process's metrics. Each process keeps its own; Prometheus scrapes and sums them per instance.
+    """
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'receipts_http_requests_total', "HTTP requests by view, method and status.", ('view', 'method', 'status'))
+http_duration = registry.histogram(
+    'receipts_http_request_duration_seconds', "Time to build the response, per view.", ('view',))
+db_queries = registry.histogram(
+    'receipts_db_queries_per_request', "Database queries per request.", ('view',), buckets=COUNT_BUCKETS)
+db_duration = registry.histogram(
+    'receipts_db_query_seconds_per_request', "Total database time per request.", ('view',))
+slow_requests = registry.counter(
+    'receipts_slow_requests_total', "Requests slower than SLOW_REQUEST_THRESHOLD.", ('view',))
+llm_duration = registry.histogram(
+    'receipts_llm_request_duration_seconds', "Model call latency.", ('model', 'operation'))
+llm_errors = registry.counter(
+    'receipts_llm_errors_total', "Model calls that raised.", ('model', 'operation'))
+llm_prompt_tokens = registry.counter(
+    'receipts_llm_prompt_tokens_total', "Prompt tokens reported by the model.", ('model', 'operation'))
+llm_response_tokens = registry.counter(
+    'receipts_llm_response_tokens_total', "Response tokens reported by the model.", ('model', 'operation'))
+llm_prompt_tokens_per_call = registry.histogram(
+    'receipts_llm_prompt_tokens', "Prompt tokens per model call.", ('model', 'operation'), buckets=TOKEN_BUCKETS)
+image_bytes = registry.counter(
+    'receipts_image_bytes_total', "Receipt image bytes read from storage and sent to the model.", ('stage',))
+image_upload_bytes = registry.histogram(
+    'receipts_image_upload_bytes', "Image bytes sent to the model per extraction.", buckets=BYTES_BUCKETS)
+
+
+class RequestTimer:
+    """
+    Collects the timing breakdown of one request: named phases, database queries and model calls.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        # Under ASGI the request's queries run on several threads
+        self._lock = threading.Lock()
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute_wrapper hook, installed on every connection by time_queries
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self._lock:
+                self.db_queries += 1
+                self.db_seconds += time.perf_counter() - started
+
+    def breakdown(self, total):
+        parts = [f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()]
+        parts.append(f"db {self.db_seconds:.3f}s ({self.db_queries} queries)")
+        if self.llm_calls:
+            parts.append(f"llm {self.llm_seconds:.3f}s ({self.llm_calls} calls)")
+        accounted = sum(self.phases.values()) + self.db_seconds + self.llm_seconds
+        parts.append(f"other {max(0.0, total - accounted):.3f}s")
+        return ', '.join(parts)
+
+
+_current = contextvars.ContextVar('receipts_request_timer', default=None)
+
+
+def current_timer():
+    return _current.get()
+
+
+@contextmanager
+def phase(name):
+    """
+    Times a named part of the current request for the slow-request log. Database and model time
+    spent inside a phase is reported separately, so phases wrap the Python work around them.
+    """
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    db_before, llm_before = timer.db_seconds, timer.llm_seconds
+    try:
+        yield
+    finally:
+        spent = time.perf_counter() - started
+        timer.add_phase(name, spent - (timer.db_seconds - db_before) - (timer.llm_seconds - llm_before))
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def time_queries(sender, connection, **kwargs):
+    """
+    connection_created handler. Connections are per thread, and under ASGI a request's queries
+    run in sync_to_async threads, so every connection times its queries into the timer of the
+    request whose context (copied into those threads) made them.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@contextmanager
+def track_request():
+    token = _current.set(RequestTimer())
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def _usage(response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None, None
+    return getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None)
+
+
+def observe_llm(model, operation, seconds, response=None, error=False):
+    """
+    Records one model call: latency, token usage when the response reports it, and errors.
+    """
+    llm_duration.observe(seconds, model=model, operation=operation)
+    if error:
+        llm_errors.inc(model=model, operation=operation)
+    prompt_tokens, response_tokens = _usage(response)
+    if prompt_tokens:
+        llm_prompt_tokens.inc(prompt_tokens, model=model, operation=operation)
+        llm_prompt_tokens_per_call.observe(prompt_tokens, model=model, operation=operation)
+    if response_tokens:
+        llm_response_tokens.inc(response_tokens, model=model, operation=operation)
+
+    timer = _current.get()
+    if timer is not None:
+        timer.llm_calls += 1
+        timer.llm_seconds += seconds
+
+
+@contextmanager
+def llm_call(model, operation):
+    """
+    Times a model call. Set `call.response` inside the block so token usage is recorded too.
+    """
+    class Call:
+        response = None
+
+    call = Call()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        observe_llm(model, operation, time.perf_counter() - started, call.response, error=True)
+        raise
+    observe_llm(model, operation, time.perf_counter() - started, call.response)
+
+
+def observe_image(original_bytes, sent_bytes):
+    image_bytes.inc(original_bytes, stage='original')
+    image_bytes.inc(sent_bytes, stage='sent')
+    image_upload_bytes.observe(sent_bytes)
@@ -0,0 +1,55 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records request latency, database queries and model time per view, and logs a per-phase
+    breakdown for requests slower than SLOW_REQUEST_THRESHOLD seconds.
+
+    Streaming responses are measured up to the point the response object is returned.
+    Works in both modes, so async views stay on the event loop under ASGI. Queries are timed
+    by a wrapper on every connection (metrics.time_queries), whichever thread runs them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with metrics.track_request() as timer:
+            response = self.get_response(request)
+        return self.record(request, response, timer)
+
+    async def __acall__(self, request):
+        with metrics.track_request() as timer:
+            response = await self.get_response(request)
+        return self.record(request, response, timer)
+
+    def record(self, request, response, timer):
+        elapsed = timer.elapsed()
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        metrics.http_requests.inc(view=view, method=request.method, status=response.status_code)
+        metrics.http_duration.observe(elapsed, view=view)
+        metrics.db_queries.observe(timer.db_queries, view=view)
+        metrics.db_duration.observe(timer.db_seconds, view=view)
+
+        if elapsed >= getattr(settings, 'SLOW_REQUEST_THRESHOLD', 1.0):
+            metrics.slow_requests.inc(view=view)
+            logger.warning("Slow request %s %s (%s) %.3fs: %s",
+                           request.method, request.path, view, elapsed, timer.breakdown(elapsed))
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:14
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Receipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('image', models.ImageField(upload_to='receipts/')),
+                ('json_data', models.JSONField(blank=True, null=True)),
+                ('category', models.CharField(blank=True, default='Other', max_length=50, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyBudget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('limit', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))])),
+            ],
+            options={
+                'unique_together': {('year', 'month')},
+            },
+        ),
+    ]
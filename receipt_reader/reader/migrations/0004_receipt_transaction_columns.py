@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0003_extractioncacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='merchant_name',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='total_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='transaction_date',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='receipt',
+            name='category',
+            field=models.CharField(blank=True, db_index=True, default='Other', max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['transaction_date', 'category'], name='reader_rece_transac_05b767_idx'),
+        ),
+    ]
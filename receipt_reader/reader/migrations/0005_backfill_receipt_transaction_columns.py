@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from reader.parsing import receipt_columns
+
+BATCH_SIZE = 500
+
+
+def backfill_transaction_columns(apps, schema_editor):
+    Receipt = apps.get_model('reader', 'Receipt')
+    fields = ['transaction_date', 'total_amount', 'merchant_name', 'category']
+    batch = []
+    for receipt in Receipt.objects.filter(json_data__isnull=False).only('id', 'json_data').iterator(chunk_size=BATCH_SIZE):
+        for field, value in receipt_columns(receipt.json_data).items():
+            setattr(receipt, field, value)
+        batch.append(receipt)
+        if len(batch) >= BATCH_SIZE:
+            Receipt.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Receipt.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0004_receipt_transaction_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transaction_columns, migrations.RunPython.noop),
+    ]
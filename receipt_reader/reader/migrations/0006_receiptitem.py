@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0005_backfill_receipt_transaction_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('transaction_date', models.DateField(blank=True, null=True)),
+                ('merchant_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='reader.receipt')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['transaction_date', 'price'], name='reader_rece_transac_621b67_idx'), models.Index(fields=['price'], name='reader_rece_price_54afa6_idx')],
+            },
+        ),
+    ]
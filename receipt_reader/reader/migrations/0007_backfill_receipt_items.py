@@ -0,0 +1,46 @@
+from django.db import migrations
+
+from reader.parsing import receipt_items
+
+BATCH_SIZE = 500
+
+
+def backfill_receipt_items(apps, schema_editor):
+    Receipt = apps.get_model('reader', 'Receipt')
+    ReceiptItem = apps.get_model('reader', 'ReceiptItem')
+    batch = []
+    receipts = Receipt.objects.filter(json_data__isnull=False).only(
+        'id', 'json_data', 'transaction_date', 'merchant_name'
+    )
+    for receipt in receipts.iterator(chunk_size=BATCH_SIZE):
+        batch.extend(
+            ReceiptItem(
+                receipt_id=receipt.id,
+                name=name,
+                price=price,
+                transaction_date=receipt.transaction_date,
+                merchant_name=receipt.merchant_name,
+                position=position,
+            )
+            for position, (name, price) in enumerate(receipt_items(receipt.json_data))
+        )
+        if len(batch) >= BATCH_SIZE:
+            ReceiptItem.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ReceiptItem.objects.bulk_create(batch)
+
+
+def clear_receipt_items(apps, schema_editor):
+    apps.get_model('reader', 'ReceiptItem').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0006_receiptitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_receipt_items, clear_receipt_items),
+    ]
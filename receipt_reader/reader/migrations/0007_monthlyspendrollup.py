@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:19
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0006_receiptitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('category', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('receipt_count', models.PositiveIntegerField(default=0)),
+                ('max_item_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('max_item_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('year', 'month', 'category')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Q
+
+from reader.parsing import month_bounds
+
+
+def populate_rollups(apps, schema_editor):
+    Receipt = apps.get_model('reader', 'Receipt')
+    ReceiptItem = apps.get_model('reader', 'ReceiptItem')
+    MonthlySpendRollup = apps.get_model('reader', 'MonthlySpendRollup')
+
+    buckets = {}
+    receipts = Receipt.objects.filter(transaction_date__isnull=False).values_list(
+        'transaction_date', 'category', 'total_amount'
+    )
+    for transaction_date, category, total_amount in receipts.iterator(chunk_size=2000):
+        key = (transaction_date.year, transaction_date.month, category or 'Other')
+        bucket = buckets.setdefault(key, MonthlySpendRollup(year=key[0], month=key[1], category=key[2]))
+        bucket.total += total_amount or Decimal('0.00')
+        bucket.receipt_count += 1
+
+    for bucket in buckets.values():
+        start, end = month_bounds(bucket.year, bucket.month)
+        in_bucket = Q(receipt__category=bucket.category)
+        if bucket.category == 'Other':
+            # Receipts without a category are counted in 'Other' above
+            in_bucket |= Q(receipt__category__isnull=True) | Q(receipt__category='')
+        top_item = ReceiptItem.objects.filter(
+            in_bucket, transaction_date__gte=start, transaction_date__lt=end
+        ).order_by('-price').first()
+        if top_item:
+            bucket.max_item_name = top_item.name
+            bucket.max_item_price = top_item.price
+
+    MonthlySpendRollup.objects.bulk_create(buckets.values())
+
+
+def clear_rollups(apps, schema_editor):
+    apps.get_model('reader', 'MonthlySpendRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0007_monthlyspendrollup'),
+        # The buckets' top items are looked up in the backfilled items
+        ('reader', '0007_backfill_receipt_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, clear_rollups),
+    ]
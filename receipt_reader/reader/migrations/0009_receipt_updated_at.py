@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0008_populate_monthlyspendrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['uploaded_at', 'id'], name='reader_rece_uploade_45a644_idx'),
+        ),
+    ]
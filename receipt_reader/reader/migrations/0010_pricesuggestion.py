@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0009_receipt_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('item_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('text', models.TextField(blank=True, null=True)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('year', 'month', 'item_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:35
+
+import reader.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0011_modelquota_receiptjob_run_after'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, storage=reader.storage.get_receipt_storage, upload_to='thumbnails/'),
+        ),
+        migrations.AlterField(
+            model_name='receipt',
+            name='image',
+            field=models.ImageField(storage=reader.storage.get_receipt_storage, upload_to='receipts/'),
+        ),
+    ]
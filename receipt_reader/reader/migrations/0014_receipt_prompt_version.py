@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0013_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='prompt_version',
+            field=models.CharField(blank=True, db_index=True, max_length=16, null=True),
+        ),
+    ]
@@ -1,18 +1,292 @@
-from django.db import models
+import mimetypes
+import os
+
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
+from .parsing import month_bounds, receipt_columns, receipt_items
+from .preprocessing import make_thumbnail
+from .storage import get_receipt_storage
+
 class Receipt(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    image = models.ImageField(upload_to='receipts/')
+    # Drives ETag/Last-Modified on the receipt list
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Content-addressed: identical uploads share one file, so don't delete it with the row
+    image = models.ImageField(upload_to='receipts/', storage=get_receipt_storage)
+    thumbnail = models.ImageField(upload_to='thumbnails/', storage=get_receipt_storage, null=True, blank=True)
     json_data = models.JSONField(null=True, blank=True)
     # --- NEW FIELD ---
-    category = models.CharField(max_length=50, null=True, blank=True, default='Other')
+    category = models.CharField(max_length=50, null=True, blank=True, default='Other', db_index=True)
+    # Materialized from json_data at extraction time so reports can filter and aggregate in SQL
+    transaction_date = models.DateField(null=True, blank=True, db_index=True)
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    merchant_name = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    # ReceiptScanningAgent.prompt_version of the extraction; null for receipts extracted before it was recorded
+    prompt_version = models.CharField(max_length=16, null=True, blank=True, db_index=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_date', 'category']),
+            # Keyset pagination of the receipt list walks (uploaded_at, id)
+            models.Index(fields=['uploaded_at', 'id']),
+        ]
 
     def __str__(self):
         return f"Receipt {self.id} - {self.uploaded_at}"
 
+    def save(self, *args, **kwargs):
+        # Thumbnails are made once, at ingestion; `manage.py migrate_receipt_storage` fills in older receipts
+        if self._state.adding and self.image and not self.thumbnail:
+            self.create_thumbnail()
+        super().save(*args, **kwargs)
+
+    def create_thumbnail(self):
+        """Renders and stores a thumbnail of the image, without saving the receipt."""
+        self.image.open('rb')
+        thumbnail = make_thumbnail(self.image)
+        if thumbnail is None:
+            return False
+        name = os.path.splitext(os.path.basename(self.image.name))[0] + mimetypes.guess_extension(thumbnail.mime_type)
+        self.thumbnail.save(name, ContentFile(thumbnail.data), save=False)
+        return True
+
+    def apply_extraction(self, json_data, prompt_version=None):
+        """
+        Stores the agent's extracted data on the receipt and saves it along with its line items,
+        moving the receipt's contribution in the monthly spend rollups in the same transaction.
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # Locks the row, so concurrent re-extractions don't both take the old values out
+                previous = Receipt.objects.select_for_update().filter(pk=self.pk).values(
+                    'transaction_date', 'category', 'total_amount'
+                ).first()
+
+            self.set_extraction(json_data, prompt_version)
+            self.save()
+            self.items.all().delete()
+            items = ReceiptItem.objects.bulk_create(self.build_items())
+
+            if previous:
+                MonthlySpendRollup.remove_receipt(**previous)
+            MonthlySpendRollup.add_receipts([self], items)
+
+    def set_extraction(self, json_data, prompt_version=None):
+        """Sets json_data, the columns materialized from it and the prompt version, without saving."""
+        self.json_data = json_data
+        self.prompt_version = prompt_version
+        for field, value in receipt_columns(json_data).items():
+            setattr(self, field, value)
+
+    def build_items(self):
+        """Returns unsaved ReceiptItem rows for the line items in json_data."""
+        return [
+            ReceiptItem(
+                receipt=self,
+                name=name,
+                price=price,
+                transaction_date=self.transaction_date,
+                merchant_name=self.merchant_name,
+                position=position,
+            )
+            for position, (name, price) in enumerate(receipt_items(self.json_data))
+        ]
+
+
+class ReceiptItem(models.Model):
+    """
+    A single extracted line item. The receipt's date and merchant are copied onto each row
+    so item-level reports for a date range are answered from this table's indexes alone.
+    """
+    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='items')
+    name = models.CharField(max_length=255)
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    transaction_date = models.DateField(null=True, blank=True)
+    merchant_name = models.CharField(max_length=255, null=True, blank=True)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['transaction_date', 'price']),
+            models.Index(fields=['price']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.price}"
+
+
+class MonthlySpendRollup(models.Model):
+    """
+    Running spend totals per (year, month, category), kept in step with Receipt writes so the
+    tracker reads a handful of rows instead of aggregating every receipt in the month.
+    """
+    year = models.IntegerField()
+    month = models.IntegerField()
+    category = models.CharField(max_length=50)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    receipt_count = models.PositiveIntegerField(default=0)
+    max_item_name = models.CharField(max_length=255, null=True, blank=True)
+    max_item_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('year', 'month', 'category')
+
+    def __str__(self):
+        return f"{self.year}-{self.month} {self.category}: {self.total}"
+
+    @classmethod
+    def _locked_bucket(cls, year, month, category):
+        try:
+            with transaction.atomic():
+                bucket, _ = cls.objects.select_for_update().get_or_create(year=year, month=month, category=category)
+        except IntegrityError:
+            # Another transaction created the bucket first
+            bucket = cls.objects.select_for_update().get(year=year, month=month, category=category)
+        return bucket
+
+    @classmethod
+    def add_receipts(cls, receipts, items):
+        """
+        Adds saved receipts and their saved items to their month/category buckets,
+        touching each bucket once however many receipts fall into it.
+        """
+        top_items = {}
+        for item in items:
+            current = top_items.get(item.receipt_id)
+            if current is None or item.price > current.price:
+                top_items[item.receipt_id] = item
+
+        changes = {}
+        for receipt in receipts:
+            if receipt.transaction_date is None:
+                continue
+            key = (receipt.transaction_date.year, receipt.transaction_date.month, receipt.category or 'Other')
+            total, count, top_item = changes.get(key, (Decimal('0.00'), 0, None))
+            candidate = top_items.get(receipt.pk)
+            if candidate and (top_item is None or candidate.price > top_item.price):
+                top_item = candidate
+            changes[key] = (total + (receipt.total_amount or Decimal('0.00')), count + 1, top_item)
+
+        for (year, month, category), (total, count, top_item) in changes.items():
+            bucket = cls._locked_bucket(year, month, category)
+            bucket.total += total
+            bucket.receipt_count += count
+            if top_item and (bucket.max_item_price is None or top_item.price > bucket.max_item_price):
+                bucket.max_item_name = top_item.name
+                bucket.max_item_price = top_item.price
+            bucket.save()
+
+    @classmethod
+    def remove_receipt(cls, transaction_date, category, total_amount):
+        """
+        Takes a receipt's previous values back out of its bucket. Call it after the receipt's old
+        items are gone so the bucket's most expensive item can be recomputed without them.
+        """
+        if transaction_date is None:
+            return
+        with transaction.atomic():
+            # The most expensive item is recomputed while the bucket is locked, so a concurrent
+            # add_receipts cannot slip a new top item in between the read and the save
+            bucket = cls.objects.select_for_update().filter(
+                year=transaction_date.year, month=transaction_date.month, category=category or 'Other'
+            ).first()
+            if bucket is None:
+                return
+            bucket.receipt_count -= 1
+            if bucket.receipt_count <= 0:
+                bucket.delete()
+                return
+            bucket.total -= total_amount or Decimal('0.00')
+            bucket.refresh_max_item()
+            bucket.save()
+
+    def refresh_max_item(self):
+        start, end = month_bounds(self.year, self.month)
+        in_bucket = Q(receipt__category=self.category)
+        if self.category == 'Other':
+            # add_receipts and rebuild put receipts without a category in 'Other'
+            in_bucket |= Q(receipt__category__isnull=True) | Q(receipt__category='')
+        top_item = ReceiptItem.objects.filter(
+            in_bucket, transaction_date__gte=start, transaction_date__lt=end
+        ).order_by('-price').first()
+        self.max_item_name = top_item.name if top_item else None
+        self.max_item_price = top_item.price if top_item else None
+
+    @classmethod
+    def rebuild(cls, year=None, month=None):
+        """
+        Recomputes the buckets from the Receipt table, for one month, one year or everything.
+        Returns the number of buckets written.
+        """
+        receipts = Receipt.objects.filter(transaction_date__isnull=False)
+        buckets = cls.objects.all()
+        if year is not None:
+            receipts = receipts.filter(transaction_date__year=year)
+            buckets = buckets.filter(year=year)
+        if month is not None:
+            receipts = receipts.filter(transaction_date__month=month)
+            buckets = buckets.filter(month=month)
+
+        totals = {}
+        rows = (receipts
+                .annotate(rollup_year=ExtractYear('transaction_date'), rollup_month=ExtractMonth('transaction_date'))
+                .values('rollup_year', 'rollup_month', 'category')
+                .annotate(total=Sum('total_amount'), receipt_count=Count('id'))
+                .order_by())
+        for row in rows:
+            key = (row['rollup_year'], row['rollup_month'], row['category'] or 'Other')
+            bucket = totals.setdefault(key, cls(year=key[0], month=key[1], category=key[2]))
+            bucket.total += row['total'] or Decimal('0.00')
+            bucket.receipt_count += row['receipt_count']
+
+        for bucket in totals.values():
+            bucket.refresh_max_item()
+
+        with transaction.atomic():
+            buckets.delete()
+            cls.objects.bulk_create(totals.values())
+        return len(totals)
+
+
+class ReceiptJob(models.Model):
+    """A queued extraction run for an uploaded receipt image."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    receipt = models.ForeignKey(Receipt, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Set when the model was unavailable; the job is not claimed again before this time
+    run_after = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Workers claim the oldest pending job first
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Job {self.id} for receipt {self.receipt_id}: {self.status}"
+
 # --- NEW MODEL ---
 class MonthlyBudget(models.Model):
     """Stores the user's spending limit for a specific month and year."""
@@ -29,4 +303,132 @@ class MonthlyBudget(models.Model):
         unique_together = ('year', 'month')
 
     def __str__(self):
-        return f"Budget for {self.year}-{self.month}: {self.limit}"
\ No newline at end of file
+        return f"Budget for {self.year}-{self.month}: {self.limit}"
+
+
+class ExtractionCacheEntry(models.Model):
+    """
+    A stored extraction result, keyed by the image content together with the prompt and model that produced it.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    # Same namespace as `key` but built from a perceptual hash, so re-encoded or resized copies still match
+    perceptual_key = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    json_data = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Extraction cache entry {self.key[:12]} ({self.hits} hits)"
+
+
+class PriceSuggestion(models.Model):
+    """
+    A "better price" suggestion for a month's most expensive item, computed in the background
+    while the month is over budget and served from here until it expires.
+    """
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    year = models.IntegerField()
+    month = models.IntegerField()
+    item_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    text = models.TextField(null=True, blank=True)
+    requested_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('year', 'month', 'item_name')
+
+    def __str__(self):
+        return f"Suggestion for {self.item_name} ({self.year}-{self.month}): {self.status}"
+
+    @property
+    def is_fresh(self):
+        return self.expires_at is not None and self.expires_at > timezone.now()
+
+
+class ModelQuota(models.Model):
+    """
+    Shared state for calls to one model, so every worker process draws from the same
+    token bucket and sees the same circuit breaker.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    tokens = models.FloatField()
+    # Unix timestamps, compared against time.time() in every process
+    refilled_at = models.FloatField()
+    failures = models.PositiveIntegerField(default=0)
+    opened_until = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Quota for {self.name}: {self.tokens:.1f} tokens"
+
+
+class Conversation(models.Model):
+    """
+    A chatbot session. Turns up to `summarized_through` have been folded into `summary`;
+    only the later ones are sent to the model verbatim.
+    """
+    session_id = models.CharField(max_length=64, unique=True)
+    summary = models.TextField(blank=True, default='')
+    summarized_through = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Conversation {self.session_id}"
+
+
+class ConversationTurn(models.Model):
+    USER = 'user'
+    ADVISOR = 'advisor'
+    ROLE_CHOICES = [
+        (USER, 'User'),
+        (ADVISOR, 'Advisor'),
+    ]
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='turns')
+    # 1-based position in the conversation
+    sequence = models.PositiveIntegerField()
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['conversation', 'sequence']
+        unique_together = ('conversation', 'sequence')
+
+    def __str__(self):
+        return f"{self.role} turn {self.sequence} of {self.conversation_id}"
+
+
+class DashboardEvent(models.Model):
+    """
+    A small change notification for open dashboards, streamed from /api/events/. The id is
+    the SSE event id; clients resume after the last one they saw. Payloads carry absolute
+    values, so replaying an event is harmless.
+    """
+    RECEIPT = 'receipt'
+    RECEIPT_DELETED = 'receipt_deleted'
+    CATEGORY_TOTAL = 'category_total'
+    BUDGET = 'budget'
+    KIND_CHOICES = [
+        (RECEIPT, 'Receipt'),
+        (RECEIPT_DELETED, 'Receipt deleted'),
+        (CATEGORY_TOTAL, 'Category total'),
+        (BUDGET, 'Budget'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} event {self.id}"
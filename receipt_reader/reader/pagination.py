@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ReceiptCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (uploaded_at, id), newest first. Each page is an index range scan,
+    so fetching page 500 costs the same as fetching page 1.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-uploaded_at', '-id')
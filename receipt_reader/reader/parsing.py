@@ -0,0 +1,131 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+# The categories the scanning agent is asked to choose from
+CATEGORIES = [
+    "Food & Dining",
+    "Transportation",
+    "Groceries",
+    "Shopping",
+    "Utilities",
+    "Health",
+    "Entertainment",
+    "Other",
+]
+
+# Common variations the model returns instead of the exact category name
+CATEGORY_ALIASES = {
+    "food": "Food & Dining",
+    "dining": "Food & Dining",
+    "food and dining": "Food & Dining",
+    "restaurant": "Food & Dining",
+    "transport": "Transportation",
+    "travel": "Transportation",
+    "fuel": "Transportation",
+    "grocery": "Groceries",
+    "health & wellness": "Health",
+    "healthcare": "Health",
+    "pharmacy": "Health",
+    "utility": "Utilities",
+}
+
+_AMOUNT_NOISE = re.compile(r"[^\d.\-]")
+
+
+def parse_date(value):
+    """
+    Parses a 'YYYY-MM-DD' transaction date. Returns None for missing or malformed values.
+    """
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_amount(value):
+    """
+    Parses a price or total into a two-place Decimal, ignoring currency symbols and thousands separators.
+    Returns None for missing or malformed values.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = _AMOUNT_NOISE.sub('', value).strip('.')
+        if not value:
+            return None
+    try:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def normalize_category(value) -> str:
+    """
+    Maps the model's category onto one of CATEGORIES, falling back to 'Other'.
+    """
+    if not value:
+        return 'Other'
+    cleaned = str(value).strip().lower()
+    for category in CATEGORIES:
+        if category.lower() == cleaned:
+            return category
+    return CATEGORY_ALIASES.get(cleaned, 'Other')
+
+
+def receipt_columns(json_data) -> dict:
+    """
+    Returns the materialized Receipt columns derived from the agent's extracted JSON.
+    """
+    json_data = json_data if isinstance(json_data, dict) else {}
+    merchant = json_data.get('Merchant Name')
+    return {
+        'transaction_date': parse_date(json_data.get('Transaction Date')),
+        'total_amount': parse_amount(json_data.get('Total Amount')),
+        'merchant_name': str(merchant).strip()[:255] if merchant else None,
+        'category': normalize_category(json_data.get('Category')),
+    }
+
+
+def receipt_items(json_data) -> list:
+    """
+    Returns (name, price) pairs for the extracted line items that have a usable price.
+    """
+    items = json_data.get('Items') if isinstance(json_data, dict) else None
+    if not isinstance(items, list):
+        return []
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        price = parse_amount(item.get('Price'))
+        if price is None:
+            continue
+        name = str(item.get('Item') or 'N/A').strip()[:255]
+        parsed.append((name, price))
+    return parsed
+
+
+def month_bounds(year: int, month: int):
+    """
+    Returns the first day of the month and the first day of the following month.
+    """
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def month_span(start, end):
+    """
+    The (year, month) pairs covering [start, end) if it is made of whole months, otherwise None.
+    """
+    if start is None or start.day != 1 or end.day != 1:
+        return None
+    months = []
+    year, month = start.year, start.month
+    while date(year, month, 1) < end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
@@ -0,0 +1,147 @@
+import io
+import logging
+import mimetypes
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'PNG': 'image/png'}
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    original_size: int
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+def preprocessing_options() -> dict:
+    """
+    Reads the preprocessing settings. The result also feeds the extraction cache key,
+    since changing how images are prepared can change what the model reads from them.
+    """
+    return {
+        'enabled': getattr(settings, 'RECEIPT_IMAGE_PREPROCESSING', True),
+        'max_dimension': getattr(settings, 'RECEIPT_IMAGE_MAX_DIMENSION', 1600),
+        'grayscale': getattr(settings, 'RECEIPT_IMAGE_GRAYSCALE', True),
+        'crop': getattr(settings, 'RECEIPT_IMAGE_CROP', True),
+        'image_format': getattr(settings, 'RECEIPT_IMAGE_FORMAT', 'JPEG'),
+        'quality': getattr(settings, 'RECEIPT_IMAGE_QUALITY', 80),
+    }
+
+
+def _document_box(image, threshold=None, min_coverage=0.1, margin=0.02):
+    """
+    Finds the bright paper region on a darker background. Works on a small copy for speed and
+    returns a box in full-size coordinates, or None when no clear document region stands out.
+    """
+    from PIL import ImageOps
+
+    probe = image.convert('L')
+    probe.thumbnail((256, 256))
+    probe = ImageOps.autocontrast(probe)
+    if threshold is None:
+        histogram = probe.histogram()
+        pixels = sum(histogram)
+        threshold = sum(level * count for level, count in enumerate(histogram)) / pixels
+    box = probe.point(lambda level: 255 if level > threshold else 0).getbbox()
+    if box is None:
+        return None
+
+    left, top, right, bottom = box
+    if (right - left) * (bottom - top) < min_coverage * probe.width * probe.height:
+        return None
+
+    scale_x = image.width / probe.width
+    scale_y = image.height / probe.height
+    pad_x = margin * image.width
+    pad_y = margin * image.height
+    return (
+        max(0, int(left * scale_x - pad_x)),
+        max(0, int(top * scale_y - pad_y)),
+        min(image.width, int(right * scale_x + pad_x)),
+        min(image.height, int(bottom * scale_y + pad_y)),
+    )
+
+
+def preprocess_image(image_bytes: bytes, filename: str = '', enabled=True, max_dimension=1600,
+                     grayscale=True, crop=True, image_format='JPEG', quality=80) -> PreparedImage:
+    """
+    Prepares a receipt photo for the model: applies the EXIF rotation, crops to the document,
+    downscales to max_dimension, optionally converts to grayscale and re-encodes it compactly.
+
+    The stored original is never touched. If Pillow is missing or the image cannot be decoded,
+    or re-encoding would not make it smaller, the original bytes are returned unchanged.
+    """
+    original = PreparedImage(
+        data=image_bytes,
+        mime_type=mimetypes.guess_type(filename)[0] or 'image/jpeg',
+        original_size=len(image_bytes),
+    )
+    if not enabled:
+        return original
+
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return original
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as source:
+            image = ImageOps.exif_transpose(source)
+            image = image.convert('L' if grayscale else 'RGB')
+            if crop:
+                box = _document_box(image)
+                if box:
+                    image = image.crop(box)
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+            buffer = io.BytesIO()
+            image.save(buffer, format=image_format, quality=quality, optimize=True)
+    except Exception:
+        logger.warning("Could not preprocess %s; sending the original image", filename or 'image', exc_info=True)
+        return original
+
+    if buffer.tell() >= len(image_bytes):
+        return original
+    return PreparedImage(data=buffer.getvalue(), mime_type=MIME_TYPES[image_format.upper()],
+                         original_size=len(image_bytes))
+
+
+def make_thumbnail(fileobj, size=None, image_format=None, quality=None):
+    """
+    Returns a small re-encoded copy of an image for list views as a PreparedImage, or None
+    if the image cannot be read. The EXIF rotation is applied so thumbnails are upright.
+    """
+    size = size or getattr(settings, 'RECEIPT_THUMBNAIL_SIZE', 320)
+    image_format = image_format or getattr(settings, 'RECEIPT_THUMBNAIL_FORMAT', 'JPEG')
+    quality = quality or getattr(settings, 'RECEIPT_THUMBNAIL_QUALITY', 70)
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    try:
+        fileobj.seek(0, io.SEEK_END)
+        original_size = fileobj.tell()
+        fileobj.seek(0)
+        with Image.open(fileobj) as source:
+            # Let the decoder skip straight to a reduced resolution where the format supports it
+            source.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(source).convert('RGB')
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format=image_format, quality=quality, optimize=True)
+    except Exception as e:
+        logger.warning("Could not create a thumbnail: %s", e)
+        return None
+    finally:
+        fileobj.seek(0)
+    return PreparedImage(data=buffer.getvalue(), mime_type=MIME_TYPES[image_format.upper()],
+                         original_size=original_size)
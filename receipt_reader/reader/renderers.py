@@ -0,0 +1,32 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets streaming views pass content negotiation for `Accept: text/event-stream`.
+    Streams bypass renderers entirely; this only renders error responses, as JSON.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
+
+
+class CSVRenderer(EventStreamRenderer):
+    """
+    Negotiation stand-in for the streaming CSV export (`.csv` suffix or `Accept: text/csv`).
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class JSONLinesRenderer(EventStreamRenderer):
+    """
+    Negotiation stand-in for the streaming JSON Lines export (`.jsonl` suffix or `Accept: application/x-ndjson`).
+    """
+    media_type = 'application/x-ndjson'
+    format = 'jsonl'
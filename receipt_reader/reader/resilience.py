@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import metrics
+from .models import ModelQuota
+
+logger = logging.getLogger(__name__)
+
+# Google API errors worth retrying, matched by name so the SDK is not imported here
+RETRYABLE_ERRORS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'GatewayTimeout', 'BadGateway', 'Aborted',
+}
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+retries = metrics.registry.counter(
+    'receipts_llm_retries_total', "Model calls retried after a retryable error.", ('model',))
+rate_limit_waits = metrics.registry.histogram(
+    'receipts_llm_rate_limit_wait_seconds', "Time spent waiting for a rate limit token.", ('model',))
+rejections = metrics.registry.counter(
+    'receipts_llm_rejected_total', "Model calls refused without reaching the API.", ('model', 'reason'))
+
+
+class ModelUnavailable(Exception):
+    """The model cannot be called right now. retry_after is a hint in seconds."""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(ModelUnavailable):
+    pass
+
+
+class CircuitOpen(ModelUnavailable):
+    pass
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    code = getattr(error, 'code', None)
+    code = getattr(code, 'value', code)
+    return isinstance(code, int) and code in RETRYABLE_CODES
+
+
+def _option(name, default):
+    return getattr(settings, name, default)
+
+
+# Circuit state seen by this process, so an open circuit fails fast without a database round trip
+_open_until = {}
+_open_lock = threading.Lock()
+
+
+def _locked_quota(name, burst):
+    try:
+        with transaction.atomic():
+            quota, _ = ModelQuota.objects.select_for_update().get_or_create(
+                name=name, defaults={'tokens': burst, 'refilled_at': time.time()}
+            )
+    except IntegrityError:
+        # Another process created the row first
+        quota = ModelQuota.objects.select_for_update().get(name=name)
+    return quota
+
+
+def _take_token(name, rate, burst):
+    """
+    Tries once to take a token. Returns (failures, None) on success or (None, seconds) until
+    the next token is due. Raises CircuitOpen while the breaker is open.
+    """
+    with transaction.atomic():
+        quota = _locked_quota(name, burst)
+        now = time.time()
+        if quota.opened_until and quota.opened_until > now:
+            with _open_lock:
+                _open_until[name] = quota.opened_until
+            rejections.inc(model=name, reason='circuit_open')
+            raise CircuitOpen(f"{name} is temporarily unavailable.", retry_after=quota.opened_until - now)
+        quota.tokens = min(float(burst), quota.tokens + max(0.0, now - quota.refilled_at) * rate)
+        quota.refilled_at = now
+        if quota.tokens >= 1:
+            quota.tokens -= 1
+            quota.save(update_fields=['tokens', 'refilled_at'])
+            return quota.failures, None
+        quota.save(update_fields=['tokens', 'refilled_at'])
+        return None, (1 - quota.tokens) / rate
+
+
+def _check_open(name):
+    with _open_lock:
+        open_until = _open_until.get(name, 0)
+    if open_until > time.time():
+        rejections.inc(model=name, reason='circuit_open')
+        raise CircuitOpen(f"{name} is temporarily unavailable.", retry_after=open_until - time.time())
+
+
+def _next_wait(name, wait, deadline):
+    if time.monotonic() + wait > deadline:
+        rejections.inc(model=name, reason='rate_limited')
+        raise RateLimited(f"Too many requests to {name}; try again shortly.", retry_after=wait)
+    # Spread the wake-ups so waiting workers don't all reach for the same token at once
+    return wait * random.uniform(1.0, 1.2)
+
+
+def acquire(name):
+    """
+    Takes one token from the model's shared bucket, waiting up to GEMINI_RATE_LIMIT_MAX_WAIT
+    seconds for one to refill. Returns the number of recent failures recorded for the model.
+    Raises CircuitOpen while the breaker is open and RateLimited if no token comes in time.
+    """
+    rate = _option('GEMINI_RATE_LIMIT_PER_MINUTE', 60) / 60.0
+    burst = _option('GEMINI_RATE_LIMIT_BURST', 10)
+    deadline = time.monotonic() + _option('GEMINI_RATE_LIMIT_MAX_WAIT', 30)
+    waited = 0.0
+
+    _check_open(name)
+    while True:
+        failures, wait = _take_token(name, rate, burst)
+        if wait is None:
+            rate_limit_waits.observe(waited, model=name)
+            return failures
+        wait = _next_wait(name, wait, deadline)
+        time.sleep(wait)
+        waited += wait
+
+
+async def aacquire(name):
+    """
+    acquire() for async callers: the bucket is read in a thread and the wait is an asyncio sleep,
+    so a request waiting for a token holds no thread.
+    """
+    rate = _option('GEMINI_RATE_LIMIT_PER_MINUTE', 60) / 60.0
+    burst = _option('GEMINI_RATE_LIMIT_BURST', 10)
+    deadline = time.monotonic() + _option('GEMINI_RATE_LIMIT_MAX_WAIT', 30)
+    waited = 0.0
+
+    _check_open(name)
+    while True:
+        failures, wait = await sync_to_async(_take_token)(name, rate, burst)
+        if wait is None:
+            rate_limit_waits.observe(waited, model=name)
+            return failures
+        wait = _next_wait(name, wait, deadline)
+        await asyncio.sleep(wait)
+        waited += wait
+
+
+def record_failure(name):
+    """
+    Counts a failed attempt and opens the circuit once GEMINI_CIRCUIT_FAILURE_THRESHOLD
+    consecutive attempts have failed.
+    """
+    threshold = _option('GEMINI_CIRCUIT_FAILURE_THRESHOLD', 5)
+    cooldown = _option('GEMINI_CIRCUIT_COOLDOWN', 30)
+    with transaction.atomic():
+        quota = _locked_quota(name, _option('GEMINI_RATE_LIMIT_BURST', 10))
+        quota.failures += 1
+        if quota.failures >= threshold:
+            quota.opened_until = time.time() + cooldown
+            with _open_lock:
+                _open_until[name] = quota.opened_until
+            logger.warning("Opening the circuit for %s for %ss after %d failures", name, cooldown, quota.failures)
+        quota.save(update_fields=['failures', 'opened_until'])
+
+
+def record_success(name):
+    ModelQuota.objects.filter(name=name, failures__gt=0).update(failures=0, opened_until=None)
+    with _open_lock:
+        _open_until.pop(name, None)
+
+
+def _backoff(attempt):
+    base = _option('GEMINI_BACKOFF_BASE', 0.5)
+    return random.uniform(0, min(_option('GEMINI_BACKOFF_MAX', 20), base * 2 ** attempt))
+
+
+def _exhausted(name, error, attempt):
+    retry_after = _option('GEMINI_BACKOFF_BASE', 0.5) * 2 ** attempt
+    return ModelUnavailable(f"{name} is unavailable: {error}", retry_after=retry_after)
+
+
+def call(name, fn, *args, **kwargs):
+    """
+    Calls fn under the model's shared rate limit, retrying retryable errors with full-jitter
+    exponential backoff. Raises ModelUnavailable once retries are exhausted or while the circuit
+    is open; other errors are raised unchanged.
+    """
+    max_retries = _option('GEMINI_MAX_RETRIES', 4)
+
+    for attempt in range(max_retries + 1):
+        # A half-open circuit lets calls through again once the cooldown has passed
+        failures = acquire(name)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            record_failure(name)
+            if attempt == max_retries:
+                raise _exhausted(name, e, attempt) from e
+            retries.inc(model=name)
+            delay = _backoff(attempt)
+            logger.info("Retrying %s in %.2fs after %s", name, delay, e)
+            time.sleep(delay)
+        else:
+            if failures:
+                record_success(name)
+            return result
+
+
+async def acall(name, fn, *args, **kwargs):
+    """
+    call() for coroutine functions, such as the SDK's generate_content_async.
+    """
+    max_retries = _option('GEMINI_MAX_RETRIES', 4)
+
+    for attempt in range(max_retries + 1):
+        failures = await aacquire(name)
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            await sync_to_async(record_failure)(name)
+            if attempt == max_retries:
+                raise _exhausted(name, e, attempt) from e
+            retries.inc(model=name)
+            delay = _backoff(attempt)
+            logger.info("Retrying %s in %.2fs after %s", name, delay, e)
+            await asyncio.sleep(delay)
+        else:
+            if failures:
+                await sync_to_async(record_success)(name)
+            return result
+
+
+class ResilientModel:
+    """
+    Wraps a GenerativeModel so generate_content goes through call() and generate_content_async
+    through acall(). Everything else is passed through.
+    """
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+
+    def generate_content(self, *args, **kwargs):
+        return call(self.name, self.model.generate_content, *args, **kwargs)
+
+    async def generate_content_async(self, *args, **kwargs):
+        return await acall(self.name, self.model.generate_content_async, *args, **kwargs)
+
+    def __getattr__(self, attribute):
+        return getattr(self.model, attribute)
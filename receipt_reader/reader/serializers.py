@@ -1,15 +1,49 @@
 from rest_framework import serializers
-from .models import Receipt, MonthlyBudget # <-- Import new model
+from .models import Receipt, MonthlyBudget, ReceiptJob
 
 class ReceiptSerializer(serializers.ModelSerializer):
+    """
+    Accepts an optional `fields` argument to project the output onto a subset of fields,
+    and `include_items=False` to drop the line item array from json_data.
+    """
+    def __init__(self, *args, fields=None, include_items=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.include_items = include_items
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not self.include_items and isinstance(data.get('json_data'), dict):
+            data['json_data'] = {key: value for key, value in data['json_data'].items() if key != 'Items'}
+        return data
+
     class Meta:
         model = Receipt
         # --- ADD 'category' TO FIELDS ---
-        fields = ['id', 'uploaded_at', 'image', 'json_data', 'category']
+        fields = ['id', 'uploaded_at', 'image', 'thumbnail', 'json_data', 'category',
+                  'transaction_date', 'total_amount', 'merchant_name']
+        # Lists should show the thumbnail and only fetch the full image on demand
+        read_only_fields = ['thumbnail', 'transaction_date', 'total_amount', 'merchant_name']
 
 
 # --- NEW SERIALIZER ---
 class MonthlyBudgetSerializer(serializers.ModelSerializer):
     class Meta:
         model = MonthlyBudget
-        fields = ['year', 'month', 'limit']
\ No newline at end of file
+        fields = ['year', 'month', 'limit']
+
+
+class ReceiptJobSerializer(serializers.ModelSerializer):
+    receipt = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReceiptJob
+        fields = ['id', 'status', 'error', 'created_at', 'started_at', 'finished_at', 'receipt']
+
+    def get_receipt(self, job):
+        # The extracted receipt is only meaningful once the job has finished
+        if job.status != ReceiptJob.DONE:
+            return None
+        return ReceiptSerializer(job.receipt, context=self.context).data
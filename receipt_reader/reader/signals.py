@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import events
+from .dashboard import bump_dashboard_version
+from .models import MonthlyBudget, MonthlySpendRollup, PriceSuggestion, Receipt
+from .suggestions import refresh_month
+
+
+@receiver(post_delete, sender=Receipt)
+def remove_deleted_receipt_from_rollups(sender, instance, **kwargs):
+    # Items are deleted before the receipt, so the bucket's top item is recomputed without them
+    MonthlySpendRollup.remove_receipt(instance.transaction_date, instance.category, instance.total_amount)
+
+
+@receiver(post_save, sender=MonthlySpendRollup)
+@receiver(post_delete, sender=MonthlySpendRollup)
+@receiver(post_save, sender=MonthlyBudget)
+def refresh_price_suggestion(sender, instance, **kwargs):
+    # The month's totals, top item or limit moved; precompute its suggestion once the change is committed
+    transaction.on_commit(lambda: refresh_month(instance.year, instance.month), robust=True)
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_delete, sender=Receipt)
+@receiver(post_save, sender=MonthlyBudget)
+@receiver(post_delete, sender=MonthlyBudget)
+@receiver(post_save, sender=MonthlySpendRollup)
+@receiver(post_delete, sender=MonthlySpendRollup)
+@receiver(post_save, sender=PriceSuggestion)
+def invalidate_dashboard(sender, instance, **kwargs):
+    # Rollups are covered too because batch uploads bulk-create receipts without post_save.
+    # Bump after commit so a concurrent reader cannot re-cache the pre-write state under the new version
+    transaction.on_commit(bump_dashboard_version, robust=True)
+
+
+@receiver(post_save, sender=Receipt)
+def publish_receipt(sender, instance, **kwargs):
+    # Batch uploads bulk-create receipts and publish their events themselves
+    events.publish_receipts([instance])
+
+
+@receiver(post_delete, sender=Receipt)
+def publish_receipt_deleted(sender, instance, **kwargs):
+    events.publish_receipt_deleted(instance)
+
+
+@receiver(post_save, sender=MonthlySpendRollup)
+@receiver(post_delete, sender=MonthlySpendRollup)
+def publish_category_total(sender, instance, signal, **kwargs):
+    events.publish_category_total(instance, deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=MonthlyBudget)
+def publish_budget(sender, instance, **kwargs):
+    events.publish_budget(instance)
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each file under the SHA-256 of its content, sharded by the first two byte pairs:
+    'receipts/photo.png' is saved as 'receipts/3f/a2/3fa2....png'. Uploading the same image
+    twice writes it once and returns the same name both times.
+
+    Files are hashed and written chunk by chunk, so large uploads are never held in memory;
+    uploads Django already spooled to a temporary file are moved into place rather than copied.
+    Several rows can point at one file, so callers must check for other references before deleting.
+    """
+    chunk_size = 64 * 1024
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory = posixpath.dirname(name.replace('\\', '/'))
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, hexdigest[:2], hexdigest[2:4], hexdigest + extension)
+
+    def is_content_addressed(self, name):
+        stem, _ = os.path.splitext(posixpath.basename(name))
+        parts = name.split('/')
+        return len(stem) == 64 and len(parts) >= 3 and parts[-3] == stem[:2] and parts[-2] == stem[2:4]
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save; an existing file there is the same file
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        # Write under a unique temporary name, then rename: a concurrent save of the same content
+        # just replaces the file with identical bytes
+        temporary = super()._save(f"{name}.{uuid.uuid4().hex}.part", content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+receipt_storage = ContentAddressedStorage()
+
+
+def get_receipt_storage():
+    return receipt_storage
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from . import metrics
+from .llm import get_model
+from .models import MonthlyBudget, MonthlySpendRollup, PriceSuggestion
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_MODEL = "gemini-1.5-flash"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PRICE_SUGGESTION_WORKERS', 1),
+                thread_name_prefix='price-suggestion',
+            )
+        return _executor
+
+
+def overspend_item(year, month, budget=None, rollups=None):
+    """
+    Returns the month's most expensive item name if the month is over budget, otherwise None.
+    Pass the budget and rollups when the caller already has them loaded.
+    """
+    if budget is None:
+        budget = MonthlyBudget.objects.filter(year=year, month=month).first()
+    if budget is None:
+        return None
+    if rollups is None:
+        rollups = list(MonthlySpendRollup.objects.filter(year=year, month=month))
+
+    total_spent = sum((rollup.total for rollup in rollups), Decimal('0.00'))
+    top_rollup = max(
+        (rollup for rollup in rollups if rollup.max_item_price is not None and rollup.max_item_price > 0),
+        key=lambda rollup: rollup.max_item_price,
+        default=None
+    )
+    if total_spent <= budget.limit or top_rollup is None:
+        return None
+    return top_rollup.max_item_name
+
+
+def _needs_refresh(suggestion):
+    if suggestion.status == PriceSuggestion.PENDING:
+        # Already queued, unless the process that queued it died before finishing
+        timeout = getattr(settings, 'PRICE_SUGGESTION_PENDING_TIMEOUT', 300)
+        return suggestion.requested_at < timezone.now() - timedelta(seconds=timeout)
+    return not suggestion.is_fresh
+
+
+def request_suggestion(year, month, item_name, schedule=True):
+    """
+    Makes sure a suggestion for the item is stored or on its way and returns its row.
+    The model call is queued for after the current transaction commits. With schedule=False
+    the row is only marked pending and `row.queued` tells the caller to compute it itself.
+    """
+    try:
+        with transaction.atomic():
+            suggestion, created = PriceSuggestion.objects.select_for_update().get_or_create(
+                year=year, month=month, item_name=item_name
+            )
+            suggestion.queued = created or _needs_refresh(suggestion)
+            if not suggestion.queued:
+                return suggestion
+            suggestion.status = PriceSuggestion.PENDING
+            suggestion.requested_at = timezone.now()
+            suggestion.save(update_fields=['status', 'requested_at'])
+    except IntegrityError:
+        # Another request created the row first and has queued the work
+        suggestion = PriceSuggestion.objects.get(year=year, month=month, item_name=item_name)
+        suggestion.queued = False
+        return suggestion
+
+    if schedule:
+        transaction.on_commit(lambda: _get_executor().submit(compute_suggestion, suggestion.pk))
+    return suggestion
+
+
+def refresh_month(year, month):
+    """
+    Queues a suggestion if the month is now over budget. Called whenever the month's
+    rollups or budget change, so the tracker rarely finds one missing.
+    """
+    item_name = overspend_item(year, month)
+    if item_name:
+        request_suggestion(year, month, item_name)
+
+
+def _prompt(item_name):
+    return f"""
+            A user has overspent their budget. Their most expensive purchase was "{item_name}".
+            Perform a quick web search to find a better price or deal for this item.
+            Summarize your findings in a short, helpful suggestion. For example: "You could save money on this. I found it for a lower price at [Store/Website]."
+            Provide a single, concise paragraph.
+            """
+
+
+def _store_answer(suggestion, text=None, error=None):
+    if error is None:
+        suggestion.text = text.strip()
+        suggestion.status = PriceSuggestion.READY
+        ttl = getattr(settings, 'PRICE_SUGGESTION_TTL', 24 * 60 * 60)
+    else:
+        logger.warning("Price suggestion failed for %s: %s", suggestion.item_name, error)
+        suggestion.text = f"Could not fetch suggestions at this time. Error: {str(error)}"
+        suggestion.status = PriceSuggestion.FAILED
+        ttl = getattr(settings, 'PRICE_SUGGESTION_RETRY_AFTER', 5 * 60)
+    suggestion.expires_at = timezone.now() + timedelta(seconds=ttl)
+    suggestion.save(update_fields=['text', 'status', 'expires_at'])
+    return suggestion
+
+
+def compute_suggestion(suggestion_id):
+    """
+    Asks the model for a better price on the suggestion's item and stores the answer.
+    Runs on the suggestion executor, off the request path.
+    """
+    close_old_connections()
+    try:
+        suggestion = PriceSuggestion.objects.get(pk=suggestion_id)
+        try:
+            with metrics.llm_call(SUGGESTION_MODEL, 'suggestion') as call:
+                call.response = get_model(SUGGESTION_MODEL).generate_content(_prompt(suggestion.item_name))
+        except Exception as e:
+            return _store_answer(suggestion, error=e)
+        return _store_answer(suggestion, call.response.text)
+    except Exception:
+        logger.exception("Could not store price suggestion %s", suggestion_id)
+    finally:
+        close_old_connections()
+
+
+async def acompute_suggestion(suggestion_id):
+    """
+    compute_suggestion for the event loop: the model call is awaited rather than run on the executor.
+    """
+    try:
+        suggestion = await PriceSuggestion.objects.aget(pk=suggestion_id)
+        try:
+            with metrics.llm_call(SUGGESTION_MODEL, 'suggestion') as call:
+                call.response = await get_model(SUGGESTION_MODEL).generate_content_async(_prompt(suggestion.item_name))
+        except Exception as e:
+            return await sync_to_async(_store_answer)(suggestion, error=e)
+        return await sync_to_async(_store_answer)(suggestion, call.response.text)
+    except Exception:
+        logger.exception("Could not store price suggestion %s", suggestion_id)
+
+
+def get_suggestion(year, month, item_name):
+    """
+    Returns (text, status) for the tracker without calling the model. A missing or expired
+    suggestion is queued, and the previous text, if any, is served until the new one is ready.
+    """
+    suggestion = PriceSuggestion.objects.filter(year=year, month=month, item_name=item_name).first()
+    if suggestion is None or _needs_refresh(suggestion):
+        suggestion = request_suggestion(year, month, item_name)
+    return suggestion.text, suggestion.status
+
+
+# Suggestions being computed on the event loop; holding the tasks keeps them from being collected mid-call
+_tasks = set()
+
+
+async def aget_suggestion(year, month, item_name):
+    """
+    get_suggestion for async views. A missing or expired suggestion is computed in a task
+    on the running event loop instead of the thread pool.
+    """
+    suggestion = await PriceSuggestion.objects.filter(year=year, month=month, item_name=item_name).afirst()
+    if suggestion is None or _needs_refresh(suggestion):
+        suggestion = await sync_to_async(request_suggestion)(year, month, item_name, schedule=False)
+        if suggestion.queued:
+            task = asyncio.get_running_loop().create_task(acompute_suggestion(suggestion.pk))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+    return suggestion.text, suggestion.status
@@ -0,0 +1,46 @@
+import asyncio
+
+from django.core.handlers.asgi import ASGIHandler
+
+
+async def asgi_request(method, path, body=b'', headers=(), query_string=b'', on_body=None):
+    """
+    Sends one request through Django's ASGI handler, as uvicorn would. `on_body` is called
+    with each body chunk as it is sent. Returns (status, body).
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string,
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-length', str(len(body)).encode())]
+                   + [(name.lower(), value) for name, value in headers],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    received = []
+    response = {'status': None, 'body': b''}
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # The client stays connected until the response is complete
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            chunk = message.get('body', b'')
+            response['body'] += chunk
+            if on_body and chunk:
+                on_body(chunk)
+
+    await ASGIHandler()(scope, receive, send)
+    return response['status'], response['body']
@@ -0,0 +1,157 @@
+import statistics
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from reader import analytics
+from reader.analytics import SpendColumns
+
+# (receipt id, day, paise, category)
+ROWS = [
+    (1, date(2024, 3, 1), 1000, 'Groceries'),  # before the range; only feeds the moving averages
+    (2, date(2024, 3, 6), 2000, 'Groceries'),
+    (3, date(2024, 3, 10), 1500, 'Food & Dining'),
+    (4, date(2024, 3, 11), 500, 'Groceries'),
+    (7, date(2024, 3, 12), 1500, 'Food & Dining'),
+    (8, date(2024, 3, 13), 1500, 'Food & Dining'),
+    (9, date(2024, 3, 14), 9000, 'Food & Dining'),  # far off, but the category's MAD is 0
+    (10, date(2024, 3, 15), 2100, 'Groceries'),
+    (11, date(2024, 3, 16), 1900, 'Groceries'),
+    (5, date(2024, 3, 19), 12345, 'Groceries'),  # the last day in the range, and an outlier
+    (6, date(2024, 3, 20), 700, 'Groceries'),  # the day after the range
+]
+# Wednesday to Tuesday, so the first and last weeks are partial
+START, END = date(2024, 3, 6), date(2024, 3, 20)
+
+
+def columns_for(rows):
+    names = list(dict.fromkeys(category for *_, category in rows))
+    return SpendColumns(
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1].toordinal() for row in rows], dtype=np.int32),
+        np.array([row[2] for row in rows], dtype=np.int64),
+        np.array([names.index(row[3]) for row in rows], dtype=np.int16),
+        names,
+    )
+
+
+def days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+
+def reference_daily(rows, start, end, category=None):
+    totals = defaultdict(int)
+    for _, day, paise, row_category in rows:
+        if start <= day < end and category in (None, row_category):
+            totals[day] += paise
+    return totals
+
+
+class AnalyticsTests(SimpleTestCase):
+    def setUp(self):
+        self.columns = columns_for(ROWS)
+
+    def test_daily_series(self):
+        daily = reference_daily(ROWS, START, END)
+        self.assertEqual(analytics.daily_series(self.columns, START, END), {
+            'labels': [day.isoformat() for day in days(START, END)],
+            'data': [daily[day] / 100 for day in days(START, END)],
+        })
+
+    def test_weekly_series_counts_only_days_inside_partial_weeks(self):
+        daily = reference_daily(ROWS, START, END)
+        weeks = defaultdict(int)
+        for day in days(START, END):
+            weeks[day - timedelta(days=day.weekday())] += daily[day]
+
+        weekly = analytics.weekly_series(self.columns, START, END)
+        self.assertEqual(weekly['labels'], [monday.isoformat() for monday in sorted(weeks)])
+        self.assertEqual(weekly['labels'][0], '2024-03-04')
+        self.assertEqual(weekly['data'], [weeks[monday] / 100 for monday in sorted(weeks)])
+        # Mar 6-10 excludes Mar 1; Mar 18-19 excludes Mar 20
+        self.assertEqual(weekly['data'][0], 35.0)
+        self.assertEqual(weekly['data'][-1], 123.45)
+
+    def test_moving_averages_start_warm(self):
+        window = 7
+        averages = analytics.moving_averages(self.columns, START, END, window)
+
+        for category in ('Groceries', 'Food & Dining'):
+            daily = reference_daily(ROWS, START - timedelta(days=window - 1), END, category)
+            expected = [round(sum(daily[day - timedelta(days=back)] for back in range(window)) / window / 100, 2)
+                        for day in days(START, END)]
+            self.assertEqual(averages['series'][category], expected)
+        # Mar 1 is in the first day's window
+        self.assertEqual(averages['series']['Groceries'][0], round((1000 + 2000) / 7 / 100, 2))
+
+    def test_projection_for_a_past_month_is_its_actual_total(self):
+        projection = analytics.month_projection(self.columns, 2024, 3, None, date(2024, 4, 10))
+        spent = sum(paise for _, day, paise, _ in ROWS) / 100
+        self.assertEqual((projection['days_elapsed'], projection['spent'], projection['projected_total']),
+                         (31, spent, spent))
+        self.assertEqual((projection['budget'], projection['projected_over_budget'],
+                          projection['on_track'], projection['daily_allowance']), (None, None, None, None))
+
+    def test_projection_for_the_current_month_uses_the_run_rate(self):
+        today = date(2024, 3, 10)
+        projection = analytics.month_projection(self.columns, 2024, 3, Decimal('500.00'), today)
+        spent = sum(paise for _, day, paise, _ in ROWS if day <= today)
+        self.assertEqual(projection['days_elapsed'], 10)
+        self.assertEqual(projection['spent'], spent / 100)
+        self.assertEqual(projection['projected_total'], round(spent / 10 * 31 / 100, 2))
+        self.assertEqual(projection['daily_allowance'], round((50000 - spent) / 21 / 100, 2))
+        self.assertTrue(projection['on_track'])
+
+    def test_projection_for_a_future_month_is_empty(self):
+        projection = analytics.month_projection(self.columns, 2024, 4, None, date(2024, 3, 10))
+        self.assertEqual((projection['days_elapsed'], projection['spent'], projection['daily_run_rate'],
+                          projection['projected_total'], projection['budget']), (0, 0.0, 0.0, 0.0, None))
+
+    def test_outliers_match_the_modified_z_score(self):
+        in_range = [row for row in ROWS if START <= row[1] < END]
+        expected = []
+        for category in {row[3] for row in in_range}:
+            values = [row[2] for row in in_range if row[3] == category]
+            median = statistics.median(values)
+            mad = statistics.median(abs(value - median) for value in values)
+            expected.extend((row[0], category, row[1], row[2], round(0.6745 * (row[2] - median) / mad, 2))
+                            for row in in_range if row[3] == category and mad
+                            and 0.6745 * (row[2] - median) / mad > analytics.OUTLIER_THRESHOLD)
+
+        flagged = analytics.outliers(self.columns, START, END)
+        self.assertEqual(flagged, expected)
+        self.assertEqual([row[0] for row in flagged], [5])
+
+    def test_category_with_zero_mad_has_no_outliers(self):
+        columns = columns_for([row for row in ROWS if row[3] == 'Food & Dining'])
+        with np.errstate(all='raise'):
+            self.assertEqual(analytics.outliers(columns, START, END), [])
+
+
+class EmptyTableTests(TestCase):
+    def test_no_receipts(self):
+        columns = SpendColumns.load()
+        self.assertEqual(len(columns), 0)
+        self.assertEqual(analytics.daily_series(columns, START, END)['data'], [0.0] * 14)
+        self.assertEqual(analytics.weekly_series(columns, START, END)['data'], [0.0, 0.0, 0.0])
+        self.assertEqual(analytics.moving_averages(columns, START, END)['series'], {})
+        self.assertEqual(analytics.month_projection(columns, 2024, 3, None, date(2024, 3, 10))['spent'], 0.0)
+        self.assertEqual(analytics.outliers(columns, START, END), [])
+
+
+class AnalyticsViewTests(TestCase):
+    def test_out_of_range_year_is_rejected(self):
+        for year in ('0', '10000', '-5'):
+            with self.subTest(year):
+                response = self.client.get('/api/analytics/', {'year': year, 'month': 3})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('year', response.json()['error'])
+
+    def test_valid_request(self):
+        response = self.client.get('/api/analytics/', {'start_date': '2024-03-06', 'end_date': '2024-03-19',
+                                                       'year': 2024, 'month': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['daily']['data']), 14)
@@ -0,0 +1,68 @@
+import io
+import shutil
+import tempfile
+
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+
+from reader.batch import process_batch
+from reader.models import Receipt
+from reader.storage import receipt_storage
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 60), 'white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class FailFirstAgent:
+    """
+    Fails the first extraction and succeeds afterwards; identical images share one path,
+    so the outcome cannot depend on it.
+    """
+    prompt_version = 'test'
+
+    def __init__(self):
+        self.calls = 0
+
+    def process_receipt(self, image_path):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("extraction failed")
+        return {
+            'Merchant Name': 'Corner Shop',
+            'Transaction Date': '2024-03-05',
+            'Total Amount': '12.50',
+            'Category': 'Groceries',
+            'Items': [{'Item Name': 'Bread', 'Item Price': '12.50'}],
+        }
+
+
+class SaveReceiptsTests(TransactionTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_failed_duplicate_keeps_the_shared_image(self):
+        data = png_bytes()
+        items = process_batch([('first.png', io.BytesIO(data)), ('second.png', io.BytesIO(data))],
+                              parallelism=1, agent=FailFirstAgent())
+
+        self.assertEqual(items[0].image_name, items[1].image_name)
+        self.assertEqual([bool(item.error) for item in items], [True, False])
+        receipt = Receipt.objects.get()
+        self.assertEqual(receipt, items[1].receipt)
+        self.assertTrue(receipt_storage.exists(receipt.image.name))
+        if receipt.thumbnail:
+            self.assertTrue(receipt_storage.exists(receipt.thumbnail.name))
+
+    def test_failed_image_is_removed(self):
+        items = process_batch([('only.png', io.BytesIO(png_bytes()))], parallelism=1, agent=FailFirstAgent())
+
+        self.assertTrue(items[0].error)
+        self.assertFalse(Receipt.objects.exists())
+        self.assertFalse(receipt_storage.exists(items[0].image_name))
@@ -0,0 +1,75 @@
+from datetime import date
+
+from django.test import SimpleTestCase, TestCase
+
+from reader import chat_context
+from reader.chat_context import build_chat_context, parse_query
+from reader.models import MonthlySpendRollup, Receipt, ReceiptItem
+
+TODAY = date(2026, 10, 17)
+
+
+class ParseQueryDateTests(SimpleTestCase):
+    def test_iso_day(self):
+        filters = parse_query("what did I buy on 2024-02-29?", TODAY)
+        self.assertEqual((filters.start, filters.end), (date(2024, 2, 29), date(2024, 3, 1)))
+
+    def test_iso_month(self):
+        filters = parse_query("groceries in 2024-02", TODAY)
+        self.assertEqual((filters.start, filters.end), (date(2024, 2, 1), date(2024, 3, 1)))
+        self.assertEqual(filters.categories, {'Groceries'})
+
+    def test_invalid_day_drops_the_date_filter(self):
+        filters = parse_query("what did I buy on 2024-02-30?", TODAY)
+        self.assertEqual((filters.start, filters.end), (None, None))
+
+    def test_invalid_month_drops_the_date_filter(self):
+        filters = parse_query("groceries in 2024-13", TODAY)
+        self.assertEqual((filters.start, filters.end), (None, None))
+        self.assertEqual(filters.categories, {'Groceries'})
+
+
+class BuildChatContextTests(TestCase):
+    def test_invalid_dates_still_build_a_context(self):
+        for query in ("what did I buy on 2024-02-30?", "how much in 2024-13?"):
+            self.assertIsInstance(build_chat_context(query).text, str)
+
+    def test_context_size_is_recorded(self):
+        tokens = (chat_context.context_tokens.count(), chat_context.context_tokens.sum())
+        receipts = chat_context.context_receipts.count()
+        context = build_chat_context("what did I buy last week?")
+
+        self.assertEqual(chat_context.context_tokens.count(), tokens[0] + 1)
+        self.assertEqual(chat_context.context_tokens.sum(), tokens[1] + context.estimated_tokens)
+        self.assertEqual(chat_context.context_receipts.count(), receipts + 1)
+        self.assertIn('receipts_chat_context_tokens_bucket', self.client.get('/metrics').content.decode())
+
+
+class CategoryTotalsTests(TestCase):
+    def setUp(self):
+        receipts = []
+        for day, category, total in (('2024-09-04', 'Groceries', '12.00'), ('2024-09-10', 'Food & Dining', '30.00'),
+                                     ('2024-09-06', None, '4.00')):
+            receipt = Receipt()
+            receipt.set_extraction({'Merchant Name': 'Shop', 'Transaction Date': day, 'Total Amount': total,
+                                    'Category': category, 'Items': []})
+            receipt.category = category
+            receipt.save()
+            receipts.append(receipt)
+        MonthlySpendRollup.add_receipts(receipts, ReceiptItem.objects.none())
+
+    def category_totals(self, query):
+        lines = build_chat_context(query, today=date(2024, 9, 15)).text.splitlines()
+        start = next(index for index, line in enumerate(lines) if line.startswith('category totals'))
+        end = next(index for index, line in enumerate(lines) if line.startswith('[RECEIPTS]'))
+        return lines[start], lines[start + 1:end]
+
+    def test_partial_month_range_only_counts_receipts_inside_it(self):
+        label, totals = self.category_totals("what did I buy last week?")
+        self.assertEqual(label, "category totals 2024-09-02..2024-09-08:")
+        self.assertEqual(totals, ["Groceries|12.00", "Other|4.00"])
+
+    def test_whole_month_uses_rollups(self):
+        label, totals = self.category_totals("what did I buy in 2024-09?")
+        self.assertEqual(label, "category totals 2024-09-01..2024-09-30:")
+        self.assertEqual(totals, ["Food & Dining|30.00", "Groceries|12.00", "Other|4.00"])
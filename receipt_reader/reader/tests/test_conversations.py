@@ -0,0 +1,60 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from reader.agents import ChatbotAgent
+from reader.conversations import get_conversation, prompt_history, prune_conversations, record_exchange
+from reader.models import Conversation
+
+
+class FailingChatbot:
+    def get_response(self, query, history, receipt_data, summary=''):
+        return ChatbotAgent.ERROR_MESSAGE
+
+
+class ConversationStorageTests(TestCase):
+    def test_new_conversation_is_not_stored_until_an_exchange(self):
+        conversation = get_conversation()
+        self.assertEqual(prompt_history(conversation), ('', []))
+        self.assertFalse(Conversation.objects.exists())
+
+        record_exchange(conversation, "How much on food?", "₹120.00")
+        stored = get_conversation(conversation.session_id)
+        self.assertIsNotNone(stored.pk)
+        self.assertEqual(prompt_history(stored)[1], [{'sender': 'user', 'text': "How much on food?"},
+                                                     {'sender': 'advisor', 'text': "₹120.00"}])
+
+    def test_unknown_session_id_is_kept_for_the_new_conversation(self):
+        conversation = get_conversation('client-chosen')
+        self.assertIsNone(conversation.pk)
+        record_exchange(conversation, "Hi", "Hello")
+        self.assertEqual(Conversation.objects.get().session_id, 'client-chosen')
+
+    def test_failed_first_message_stores_nothing(self):
+        with mock.patch('reader.views.get_agent', return_value=FailingChatbot()), \
+                mock.patch('reader.views.route_question', return_value=None):
+            response = self.client.post('/api/chatbot/', {'query': 'Where did my money go?'},
+                                        content_type='application/json')
+        self.assertEqual(response.json()['response'], ChatbotAgent.ERROR_MESSAGE)
+        self.assertFalse(Conversation.objects.exists())
+
+
+@override_settings(CHATBOT_CONVERSATION_RETENTION=3600)
+class ConversationPruningTests(TestCase):
+    def test_idle_conversations_are_pruned(self):
+        record_exchange(get_conversation('idle'), "Hi", "Hello")
+        record_exchange(get_conversation('active'), "Hi", "Hello")
+        Conversation.objects.filter(session_id='idle').update(updated_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(prune_conversations(), 1)
+        self.assertEqual(list(Conversation.objects.values_list('session_id', flat=True)), ['active'])
+
+    def test_new_conversations_trigger_pruning(self):
+        record_exchange(get_conversation('idle'), "Hi", "Hello")
+        Conversation.objects.filter(session_id='idle').update(updated_at=timezone.now() - timedelta(hours=2))
+
+        with mock.patch('reader.conversations.PRUNE_EVERY', 1), self.captureOnCommitCallbacks(execute=True):
+            record_exchange(get_conversation(), "Hi", "Hello")
+        self.assertFalse(Conversation.objects.filter(session_id='idle').exists())
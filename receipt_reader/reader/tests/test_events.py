@@ -0,0 +1,74 @@
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from reader.events import _sendable, event_stream, publish
+from reader.models import DashboardEvent
+
+
+@override_settings(DASHBOARD_EVENTS_POLL_INTERVAL=0.1, DASHBOARD_EVENTS_STREAM_SECONDS=300,
+                   DASHBOARD_EVENTS_WSGI_STREAM_SECONDS=0.5)
+class WSGIEventStreamTests(TransactionTestCase):
+    def test_stream_is_a_short_poll(self):
+        event = publish(DashboardEvent.BUDGET, {'year': 2024, 'month': 3, 'limit': '100.00'})
+
+        started = time.monotonic()
+        response = self.client.get('/api/events/', {'last_event_id': event.id - 1})
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertIn(f"id: {event.id - 1}\n\n", body)
+        self.assertIn(f"id: {event.id}\nevent: budget\n", body)
+
+    def test_reconnect_resumes_from_last_event_id(self):
+        first = publish(DashboardEvent.BUDGET, {'year': 2024, 'month': 3, 'limit': '100.00'})
+        second = publish(DashboardEvent.BUDGET, {'year': 2024, 'month': 3, 'limit': '200.00'})
+
+        response = self.client.get('/api/events/', {'last_event_id': 0}, headers={'Last-Event-ID': str(first.id)})
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertNotIn(f"id: {first.id}\nevent", body)
+        self.assertIn(f"id: {second.id}\nevent: budget\n", body)
+
+
+def events(*ids):
+    return [SimpleNamespace(id=event_id) for event_id in ids]
+
+
+@override_settings(DASHBOARD_EVENTS_GAP_GRACE=2.0)
+class EventGapTests(SimpleTestCase):
+    def sendable(self, ids, last_id, gap, now):
+        with mock.patch('reader.events.time.monotonic', return_value=now):
+            sendable, gap = _sendable(events(*ids), last_id, gap)
+        return [event.id for event in sendable], gap
+
+    def test_consecutive_ids_are_sent(self):
+        self.assertEqual(self.sendable([5, 6, 7], 4, None, 100.0), ([5, 6, 7], None))
+
+    def test_events_after_a_missing_id_are_held_back(self):
+        self.assertEqual(self.sendable([5, 7, 8], 4, None, 100.0), ([5], (6, 100.0)))
+
+    def test_late_commit_fills_the_gap(self):
+        _, gap = self.sendable([7], 5, None, 100.0)
+        self.assertEqual(self.sendable([6, 7], 5, gap, 100.5), ([6, 7], (6, 100.0)))
+
+    def test_gap_is_skipped_after_the_grace_period(self):
+        _, gap = self.sendable([7], 5, None, 100.0)
+        self.assertEqual(self.sendable([7], 5, gap, 101.0)[0], [])
+        self.assertEqual(self.sendable([7, 8], 5, gap, 102.5)[0], [7, 8])
+
+
+@override_settings(DASHBOARD_EVENTS_POLL_INTERVAL=0.05, DASHBOARD_EVENTS_WSGI_STREAM_SECONDS=0.3,
+                   DASHBOARD_EVENTS_GAP_GRACE=60)
+class EventStreamGapTests(TransactionTestCase):
+    def test_stream_does_not_skip_an_uncommitted_id(self):
+        first = publish(DashboardEvent.BUDGET, {'year': 2024, 'month': 3, 'limit': '100.00'})
+        # As if id first.id + 1 were still being inserted by another transaction
+        later = DashboardEvent.objects.create(id=first.id + 2, kind=DashboardEvent.BUDGET, data={})
+
+        body = ''.join(event_stream(first.id - 1))
+
+        self.assertIn(f"id: {first.id}\nevent: budget\n", body)
+        self.assertNotIn(f"id: {later.id}\n", body)
@@ -0,0 +1,86 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from reader.intents import COUNT, MAX_ITEM, MAX_PURCHASE, SUM, intent_requests, route
+from reader.models import MonthlySpendRollup, Receipt, ReceiptItem
+
+TODAY = date(2024, 9, 15)
+
+RECEIPTS = [
+    ('City Mart', '2024-09-03', 'Groceries', '40.00', [('Rice', '25.00'), ('Oil', '15.00')]),
+    ('City Mart', '2024-09-12', 'Groceries', '10.50', [('Milk', '10.50')]),
+    ('Cinema Hall', '2024-09-13', 'Entertainment', '30.00', [('Ticket', '30.00')]),
+    ('Cafe Blue', '2024-08-20', 'Food & Dining', '120.00', [('Dinner', '120.00')]),
+]
+
+MATCHED = [
+    (SUM, "How much did I spend on groceries in September?",
+     "You spent ₹50.50 on Groceries in September 2024, across 2 receipts."),
+    (SUM, "How much did I spend last week?",
+     "You spent ₹40.00 between 02 September 2024 and 08 September 2024, across 1 receipt."),
+    (COUNT, "How many receipts from City Mart this month?",
+     "You have 2 receipts at City Mart in September 2024, adding up to ₹50.50."),
+    (MAX_PURCHASE, "What was my biggest purchase last month?",
+     "Your biggest purchase in August 2024 was ₹120.00 at Cafe Blue on 2024-08-20."),
+    (MAX_ITEM, "What was the most expensive item this week?",
+     "Your most expensive item between 09 September 2024 and 15 September 2024 was Ticket for ₹30.00, "
+     "bought at Cinema Hall on 2024-09-13."),
+    (SUM, "How much did I spend at City Mart in August?",
+     "I couldn't find any receipts at City Mart in August 2024."),
+]
+
+DECLINED = [
+    "How much did I spend on groceries and entertainment in September?",  # more than one category
+    "How much did I spend in the last 3 days?",  # a period parse_query does not understand
+    "How can I save money on groceries?",  # advice
+    "How much did I spend at Corner Shop this month?",  # unknown merchant
+    "How much did I spend on pizza this month?",  # a word the router cannot account for
+]
+
+
+class FastPathTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        receipts = []
+        for merchant, day, category, total, items in RECEIPTS:
+            receipt = Receipt()
+            receipt.set_extraction({'Merchant Name': merchant, 'Transaction Date': day, 'Total Amount': total,
+                                    'Category': category,
+                                    'Items': [{'Item': name, 'Price': price} for name, price in items]})
+            receipt.save()
+            receipts.append(receipt)
+        items = ReceiptItem.objects.bulk_create([item for receipt in receipts for item in receipt.build_items()])
+        MonthlySpendRollup.add_receipts(receipts, items)
+
+    def test_matched_questions_are_answered_exactly(self):
+        for kind, question, answer in MATCHED:
+            with self.subTest(question):
+                before = intent_requests.value(intent=kind)
+                self.assertEqual(route(question, TODAY), answer)
+                self.assertEqual(intent_requests.value(intent=kind), before + 1)
+
+    def test_declined_questions_go_to_the_model(self):
+        for question in DECLINED:
+            with self.subTest(question):
+                before = intent_requests.value(intent='none')
+                self.assertIsNone(route(question, TODAY))
+                self.assertEqual(intent_requests.value(intent='none'), before + 1)
+
+    def test_whole_months_are_summed_from_rollups(self):
+        rollup_table = MonthlySpendRollup._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            route("How much did I spend on groceries in September?", TODAY)
+        self.assertTrue(any(rollup_table in query['sql'] for query in queries.captured_queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            route("How much did I spend last week?", TODAY)
+        self.assertFalse(any(rollup_table in query['sql'] for query in queries.captured_queries))
+
+    def test_merchant_totals_come_from_receipts(self):
+        with CaptureQueriesContext(connection) as queries:
+            route("How many receipts from City Mart this month?", TODAY)
+        self.assertFalse(any(MonthlySpendRollup._meta.db_table in query['sql']
+                             for query in queries.captured_queries))
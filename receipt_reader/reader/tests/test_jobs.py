@@ -0,0 +1,64 @@
+import time
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from reader.jobs import ReceiptWorkerPool, requeue_stale_jobs
+from reader.models import Receipt, ReceiptJob
+
+
+def stale_job(attempts):
+    started = timezone.now() - timedelta(seconds=601)
+    return ReceiptJob.objects.create(receipt=Receipt.objects.create(), status=ReceiptJob.RUNNING,
+                                     started_at=started, attempts=attempts)
+
+
+@override_settings(RECEIPT_JOB_TIMEOUT=600, RECEIPT_JOB_MAX_ATTEMPTS=3)
+class RequeueStaleJobsTests(TestCase):
+    def test_stale_job_goes_back_on_the_queue(self):
+        job = stale_job(attempts=1)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.started_at), (ReceiptJob.PENDING, None))
+
+    def test_job_out_of_attempts_fails(self):
+        job = stale_job(attempts=3)
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReceiptJob.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertTrue(job.error)
+
+    def test_running_job_within_timeout_is_left_alone(self):
+        job = ReceiptJob.objects.create(receipt=Receipt.objects.create(), status=ReceiptJob.RUNNING,
+                                        started_at=timezone.now(), attempts=1)
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReceiptJob.RUNNING)
+
+
+@override_settings(RECEIPT_JOB_TIMEOUT=600, RECEIPT_JOB_MAX_ATTEMPTS=3)
+class WorkerPoolRequeueTests(TransactionTestCase):
+    def test_idle_workers_requeue_jobs_orphaned_elsewhere(self):
+        pool = ReceiptWorkerPool(size=1, poll_interval=0.05, requeue_interval=0.05)
+        pool.start()
+        self.addCleanup(pool.stop, 5)
+        # Orphaned by a worker in another process after this pool started
+        job = stale_job(attempts=3)
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            job.refresh_from_db()
+            if job.status != ReceiptJob.RUNNING:
+                break
+            time.sleep(0.05)
+        self.assertEqual(job.status, ReceiptJob.FAILED)
+
+    def test_requeue_is_throttled(self):
+        pool = ReceiptWorkerPool(size=1, requeue_interval=60)
+        pool._requeue_if_due()
+        job = stale_job(attempts=1)
+        pool._requeue_if_due()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReceiptJob.RUNNING)
@@ -0,0 +1,38 @@
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TransactionTestCase
+
+from reader import metrics
+
+from .helpers import asgi_request
+
+
+class ASGIQueryMetricsTests(TransactionTestCase):
+    """
+    Under ASGI, queries run in sync_to_async threads; they must still be counted for the request.
+    """
+    def assert_queries_recorded(self, path, view):
+        count, queries = metrics.db_queries.count(view=view), metrics.db_queries.sum(view=view)
+        status, _ = async_to_sync(asgi_request)('GET', path)
+        self.assertEqual(status, 200)
+        self.assertEqual(metrics.db_queries.count(view=view), count + 1)
+        self.assertGreater(metrics.db_queries.sum(view=view), queries)
+        self.assertGreater(metrics.db_duration.sum(view=view), 0)
+
+    def test_sync_view_queries_are_counted(self):
+        self.assert_queries_recorded('/api/budget/', 'budget-manager')
+
+    def test_async_view_queries_are_counted(self):
+        self.assert_queries_recorded('/api/async/tracker/', 'async-expense-tracker')
+
+    def test_wsgi_queries_are_counted_once(self):
+        executed = []
+
+        def count(execute, sql, params, many, context):
+            executed.append(sql)
+            return execute(sql, params, many, context)
+
+        before = metrics.db_queries.sum(view='budget-manager')
+        with connection.execute_wrapper(count):
+            self.assertEqual(self.client.get('/api/budget/').status_code, 200)
+        self.assertEqual(metrics.db_queries.sum(view='budget-manager') - before, len(executed))
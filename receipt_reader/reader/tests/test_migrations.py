@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTestCase(TransactionTestCase):
+    """
+    Migrates back to `migrate_from`, lets setUpBeforeMigration add rows with the historical
+    models, then migrates forward to `migrate_to`.
+    """
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('reader', self.migrate_from)])
+        self.setUpBeforeMigration(executor.loader.project_state([('reader', self.migrate_from)]).apps)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([('reader', self.migrate_to)])
+        self.apps = executor.loader.project_state([('reader', self.migrate_to)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def setUpBeforeMigration(self, apps):
+        pass
+
+
+class ReceiptItemBackfillTests(MigrationTestCase):
+    migrate_from = '0006_receiptitem'
+    migrate_to = '0008_populate_monthlyspendrollup'
+
+    def setUpBeforeMigration(self, apps):
+        Receipt = apps.get_model('reader', 'Receipt')
+        for merchant, category, items in (('Bakery', 'Groceries', [('Bread', '2.50'), ('Cake', '9.00')]),
+                                          ('Kiosk', 'Groceries', [('Milk', '1.20')]),
+                                          ('Market', None, [('Soap', '3.40')])):
+            Receipt.objects.create(
+                image='receipts/test.png', transaction_date='2024-03-05', merchant_name=merchant,
+                category=category, total_amount=sum(Decimal(price) for _, price in items),
+                json_data={'Items': [{'Item': name, 'Price': price} for name, price in items]},
+            )
+
+    def test_existing_receipts_get_their_items(self):
+        ReceiptItem = self.apps.get_model('reader', 'ReceiptItem')
+        items = ReceiptItem.objects.order_by('receipt_id', 'position').values_list(
+            'receipt__merchant_name', 'name', 'price', 'position', 'transaction_date')
+        self.assertEqual([row[:4] for row in items], [('Bakery', 'Bread', Decimal('2.50'), 0),
+                                                      ('Bakery', 'Cake', Decimal('9.00'), 1),
+                                                      ('Kiosk', 'Milk', Decimal('1.20'), 0),
+                                                      ('Market', 'Soap', Decimal('3.40'), 0)])
+        self.assertTrue(all(row[4] is not None for row in items))
+
+    def test_rollups_see_the_backfilled_items(self):
+        rollup = self.apps.get_model('reader', 'MonthlySpendRollup').objects.get(category='Groceries')
+        self.assertEqual((rollup.max_item_name, rollup.max_item_price), ('Cake', Decimal('9.00')))
+
+    def test_uncategorized_receipts_count_in_other(self):
+        rollup = self.apps.get_model('reader', 'MonthlySpendRollup').objects.get(category='Other')
+        self.assertEqual((rollup.total, rollup.receipt_count), (Decimal('3.40'), 1))
+        self.assertEqual((rollup.max_item_name, rollup.max_item_price), ('Soap', Decimal('3.40')))
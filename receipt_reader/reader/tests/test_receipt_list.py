@@ -0,0 +1,25 @@
+import time
+
+from django.test import TestCase
+from django.utils.http import http_date
+
+from reader.models import Receipt
+
+
+class ReceiptListCachingTests(TestCase):
+    def setUp(self):
+        self.receipts = [Receipt.objects.create(merchant_name=name) for name in ('Bakery', 'Kiosk')]
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get('/api/receipts/')['ETag']
+        self.assertEqual(self.client.get('/api/receipts/', headers={'if-none-match': etag}).status_code, 304)
+
+    def test_delete_invalidates_cached_list(self):
+        response = self.client.get('/api/receipts/')
+        self.assertNotIn('Last-Modified', response)
+        self.receipts[0].delete()
+
+        for headers in ({'if-none-match': response['ETag']}, {'if-modified-since': http_date(time.time() + 60)}):
+            response = self.client.get('/api/receipts/', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 1)
@@ -0,0 +1,72 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from PIL import Image
+
+from reader.agents import ReceiptScanningAgent
+from reader.extraction import ExtractionResult
+from reader.extraction_cache import ExtractionCache
+from reader.models import ExtractionCacheEntry, Receipt
+from reader.storage import receipt_storage
+
+EXTRACTED = {
+    'Merchant Name': 'Corner Shop',
+    'Transaction Date': '2024-03-05',
+    'Transaction Time': '10:15',
+    'Items': [{'Item': 'Bread', 'Price': 2.5}],
+    'Subtotal': 2.5,
+    'Tax': 0,
+    'Total Amount': 2.5,
+    'Category': 'Groceries',
+}
+
+
+class FakeExtractor:
+    name = 'fake'
+
+    def extract(self, prepared, prompt):
+        return ExtractionResult(dict(EXTRACTED), self.name, 1.0)
+
+
+class ReextractCommandTests(TransactionTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.checkpoint = os.path.join(media_root, 'checkpoint.json')
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 60), 'white').save(buffer, format='PNG')
+        self.receipt = Receipt(image=receipt_storage.save('receipts/receipt.png', ContentFile(buffer.getvalue())))
+        self.receipt.set_extraction({'Merchant Name': 'Old Name', 'Total Amount': 1}, 'old')
+        self.receipt.save()
+
+        agent = ReceiptScanningAgent(cache=ExtractionCache(), extractor=FakeExtractor())
+        patcher = mock.patch('reader.management.commands.reextract.get_agent', return_value=agent)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reextract(self, *args):
+        call_command('reextract', '--checkpoint', self.checkpoint, *args, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_dry_run_writes_nothing(self):
+        self.reextract('--dry-run')
+
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.json_data['Merchant Name'], 'Old Name')
+        self.assertFalse(ExtractionCacheEntry.objects.exists())
+
+    def test_run_updates_receipt_and_cache(self):
+        self.reextract()
+
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.json_data, EXTRACTED)
+        self.assertEqual(ExtractionCacheEntry.objects.count(), 1)
@@ -0,0 +1,160 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from reader import resilience
+from reader.models import ModelQuota
+from reader.resilience import CircuitOpen, ModelUnavailable, RateLimited
+
+
+class FakeClock:
+    """
+    Stands in for the time module inside reader.resilience; sleeping moves the clock forward.
+    """
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def fail_with(error):
+    def fn():
+        raise error
+    return fn
+
+
+@override_settings(
+    GEMINI_CIRCUIT_FAILURE_THRESHOLD=3, GEMINI_CIRCUIT_COOLDOWN=30, GEMINI_MAX_RETRIES=2,
+    GEMINI_BACKOFF_BASE=0.5, GEMINI_BACKOFF_MAX=20,
+    GEMINI_RATE_LIMIT_PER_MINUTE=60, GEMINI_RATE_LIMIT_BURST=10, GEMINI_RATE_LIMIT_MAX_WAIT=30,
+)
+class ResilienceTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(resilience, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        resilience._open_until.clear()
+        self.addCleanup(resilience._open_until.clear)
+
+
+class CircuitBreakerTests(ResilienceTestCase):
+    def open_circuit(self):
+        with self.assertRaises(ModelUnavailable) as raised, self.assertLogs('reader.resilience', 'WARNING'):
+            resilience.call('model', fail_with(ConnectionError("reset")))
+        return raised.exception
+
+    def test_exhausted_retries_carry_retry_after(self):
+        error = self.open_circuit()
+        self.assertNotIsInstance(error, CircuitOpen)
+        self.assertEqual(error.retry_after, 0.5 * 2 ** 2)
+        self.assertIsInstance(error.__cause__, ConnectionError)
+
+    def test_opens_after_the_threshold(self):
+        self.open_circuit()
+        quota = ModelQuota.objects.get(name='model')
+        self.assertEqual(quota.failures, 3)
+        self.assertEqual(quota.opened_until, self.clock.now + 30)
+
+        fn = mock.Mock(return_value='ok')
+        self.clock.now += 10
+        with self.assertRaises(CircuitOpen) as raised:
+            resilience.call('model', fn)
+        self.assertAlmostEqual(raised.exception.retry_after, 20)
+        fn.assert_not_called()
+
+    def test_stays_closed_below_the_threshold(self):
+        with override_settings(GEMINI_MAX_RETRIES=1):
+            with self.assertRaises(ModelUnavailable):
+                resilience.call('model', fail_with(ConnectionError("reset")))
+        self.assertIsNone(ModelQuota.objects.get(name='model').opened_until)
+        self.assertEqual(resilience.call('model', lambda: 'ok'), 'ok')
+
+    def test_open_circuit_is_seen_from_the_database(self):
+        self.open_circuit()
+        # Another process opened it; this one has no local state yet
+        resilience._open_until.clear()
+        with self.assertRaises(CircuitOpen) as raised:
+            resilience.acquire('model')
+        self.assertAlmostEqual(raised.exception.retry_after, 30)
+
+    def test_half_opens_after_the_cooldown(self):
+        self.open_circuit()
+        self.clock.now += 30
+
+        self.assertEqual(resilience.call('model', lambda: 'ok'), 'ok')
+        quota = ModelQuota.objects.get(name='model')
+        self.assertEqual((quota.failures, quota.opened_until), (0, None))
+        self.assertNotIn('model', resilience._open_until)
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self.open_circuit()
+        self.clock.now += 30
+
+        with override_settings(GEMINI_MAX_RETRIES=0), self.assertLogs('reader.resilience', 'WARNING'):
+            with self.assertRaises(ModelUnavailable):
+                resilience.call('model', fail_with(ConnectionError("reset")))
+        with self.assertRaises(CircuitOpen):
+            resilience.call('model', lambda: 'ok')
+
+    def test_other_errors_are_raised_unchanged(self):
+        with self.assertRaises(ValueError):
+            resilience.call('model', fail_with(ValueError("bad prompt")))
+        self.assertEqual(ModelQuota.objects.get(name='model').failures, 0)
+
+
+class BackoffTests(ResilienceTestCase):
+    @override_settings(GEMINI_MAX_RETRIES=4, GEMINI_BACKOFF_MAX=1.5, GEMINI_CIRCUIT_FAILURE_THRESHOLD=10)
+    def test_full_jitter_is_capped(self):
+        # Take the top of each jitter range
+        with mock.patch.object(resilience.random, 'uniform', side_effect=lambda low, high: high) as uniform:
+            with self.assertRaises(ModelUnavailable):
+                resilience.call('model', fail_with(TimeoutError()))
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0, 1.5, 1.5])
+        self.assertTrue(all(call.args[0] == 0 for call in uniform.call_args_list))
+
+    def test_retry_then_success(self):
+        fn = mock.Mock(side_effect=[ConnectionError("reset"), 'ok'])
+        self.assertEqual(resilience.call('model', fn), 'ok')
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertTrue(0 <= self.clock.sleeps[0] <= 0.5)
+        self.assertEqual(ModelQuota.objects.get(name='model').failures, 0)
+
+
+@override_settings(GEMINI_RATE_LIMIT_PER_MINUTE=60, GEMINI_RATE_LIMIT_BURST=2)
+class TokenBucketTests(ResilienceTestCase):
+    def test_waits_for_a_refill_once_the_burst_is_spent(self):
+        resilience.acquire('model')
+        resilience.acquire('model')
+        self.assertEqual(self.clock.sleeps, [])
+
+        resilience.acquire('model')
+        self.assertEqual(len(self.clock.sleeps), 1)
+        # One token a second, with up to 20% jitter
+        self.assertTrue(1.0 <= self.clock.sleeps[0] <= 1.2)
+
+    def test_refills_up_to_the_burst(self):
+        resilience.acquire('model')
+        self.clock.now += 3600
+        resilience.acquire('model')
+        self.assertEqual(ModelQuota.objects.get(name='model').tokens, 1)
+
+    @override_settings(GEMINI_RATE_LIMIT_MAX_WAIT=0.5)
+    def test_rate_limited_carries_retry_after(self):
+        resilience.acquire('model')
+        resilience.acquire('model')
+
+        with self.assertRaises(RateLimited) as raised:
+            resilience.acquire('model')
+        self.assertAlmostEqual(raised.exception.retry_after, 1.0)
+        self.assertEqual(self.clock.sleeps, [])
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from reader.models import MonthlySpendRollup, Receipt, ReceiptItem
+
+
+class RollupMaxItemTests(TestCase):
+    def add_receipt(self, price, category):
+        receipt = Receipt()
+        receipt.set_extraction({'Transaction Date': '2024-03-05', 'Total Amount': price,
+                                'Items': [{'Item': f'Item {price}', 'Price': price}]})
+        receipt.category = category
+        receipt.save()
+        items = ReceiptItem.objects.bulk_create(receipt.build_items())
+        MonthlySpendRollup.add_receipts([receipt], items)
+        return receipt
+
+    def test_uncategorized_receipts_keep_their_max_item_in_other(self):
+        self.add_receipt('5.00', None)
+        self.add_receipt('9.00', 'Other')
+        self.add_receipt('7.00', None).delete()
+
+        bucket = MonthlySpendRollup.objects.get(year=2024, month=3, category='Other')
+        self.assertEqual(bucket.receipt_count, 2)
+        self.assertEqual(bucket.max_item_price, Decimal('9.00'))
+
+    def test_max_item_falls_back_to_an_uncategorized_receipt(self):
+        self.add_receipt('5.00', None)
+        self.add_receipt('9.00', 'Other').delete()
+
+        bucket = MonthlySpendRollup.objects.get(year=2024, month=3, category='Other')
+        self.assertEqual((bucket.max_item_name, bucket.max_item_price), ('Item 5.00', Decimal('5.00')))
+
+    def test_rebuild_counts_uncategorized_items(self):
+        self.add_receipt('5.00', None)
+        MonthlySpendRollup.rebuild(2024, 3)
+
+        bucket = MonthlySpendRollup.objects.get(year=2024, month=3, category='Other')
+        self.assertEqual(bucket.max_item_price, Decimal('5.00'))
@@ -0,0 +1,112 @@
+import json
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, TransactionTestCase
+
+from reader import export
+from reader.agents import ChatbotAgent
+from reader.models import ConversationTurn, Receipt
+
+from .helpers import asgi_request
+
+
+class FakeChatbot:
+    def __init__(self, finished):
+        self.finished = finished
+
+    def stream_response(self, query, history, receipt_data, summary=''):
+        yield "You spent"
+        yield " a lot."
+        self.finished.set()
+
+
+class ASGIStreamingTests(TransactionTestCase):
+    """
+    Under ASGI the first chunk must go out while the view's iterator is still running,
+    not after Django has read it to the end.
+    """
+    def request(self, method, path, finished, **kwargs):
+        chunks = []
+        status, body = async_to_sync(asgi_request)(
+            method, path, on_body=lambda chunk: chunks.append((chunk, finished.is_set())), **kwargs)
+        self.assertEqual(status, 200)
+        self.assertGreater(len(chunks), 1)
+        return chunks, body
+
+    def test_chat_tokens_stream_before_the_answer_is_complete(self):
+        finished = threading.Event()
+        with mock.patch('reader.views.get_agent', return_value=FakeChatbot(finished)), \
+                mock.patch('reader.views.route_question', return_value=None):
+            chunks, body = self.request('POST', '/api/chatbot/stream/', finished,
+                                        body=json.dumps({'query': 'Where did my money go?'}).encode(),
+                                        headers=[(b'content-type', b'application/json'),
+                                                 (b'accept', b'text/event-stream')])
+        self.assertFalse(chunks[0][1])
+        self.assertIn(b'event: token', chunks[0][0])
+        self.assertIn(b'event: done', body)
+
+    def test_export_streams_before_every_row_is_read(self):
+        receipts = []
+        for day in range(1, 4):
+            receipt = Receipt(image=f'receipts/{day}.png')
+            receipt.set_extraction({'Merchant Name': 'City Mart', 'Transaction Date': f'2026-09-0{day}',
+                                    'Total Amount': '10.00', 'Category': 'Groceries', 'Items': []})
+            receipts.append(receipt)
+        Receipt.objects.bulk_create(receipts)
+
+        finished = threading.Event()
+
+        def tracked_export(*args, **kwargs):
+            yield from export.stream_export(*args, lines_per_write=1, **kwargs)
+            finished.set()
+
+        with mock.patch('reader.views.stream_export', tracked_export):
+            chunks, body = self.request('GET', '/api/export/receipts.csv', finished)
+        self.assertFalse(chunks[0][1])
+        self.assertEqual(len(body.decode().strip().splitlines()), 4)
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FailingModel:
+    """Streams the given chunks, then fails."""
+    def __init__(self, *texts):
+        self.texts = texts
+
+    def generate_content(self, prompt, stream=False):
+        for text in self.texts:
+            yield Chunk(text)
+        raise RuntimeError("connection reset")
+
+
+class ChatStreamFailureTests(TestCase):
+    def stream(self, model):
+        agent = ChatbotAgent()
+        agent.model = model
+        with mock.patch('reader.views.get_agent', return_value=agent), \
+                mock.patch('reader.views.route_question', return_value=None):
+            response = self.client.post('/api/chatbot/stream/', {'query': 'Where did my money go?'},
+                                        content_type='application/json', headers={'accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_failure_mid_answer_sends_error_and_records_nothing(self):
+        body = self.stream(FailingModel("You spent", " a lot"))
+
+        self.assertIn('event: token', body)
+        self.assertIn('event: error', body)
+        self.assertNotIn('event: done', body)
+        self.assertNotIn(ChatbotAgent.ERROR_MESSAGE, body)
+        self.assertFalse(ConversationTurn.objects.exists())
+
+    def test_failure_before_answer_sends_error_message(self):
+        body = self.stream(FailingModel())
+
+        self.assertIn(ChatbotAgent.ERROR_MESSAGE, body)
+        self.assertIn('event: done', body)
+        self.assertFalse(ConversationTurn.objects.exists())
@@ -0,0 +1,30 @@
+from django.test import TestCase
+
+from reader.models import MonthlySpendRollup, Receipt, ReceiptItem
+
+
+class TrackerPayloadTests(TestCase):
+    def setUp(self):
+        receipts = []
+        for merchant, total, category in (('Bakery', '12.50', 'Groceries'), ('Cinema', '30.25', 'Entertainment')):
+            receipt = Receipt()
+            receipt.set_extraction({
+                'Merchant Name': merchant,
+                'Transaction Date': '2024-03-05',
+                'Total Amount': total,
+                'Category': category,
+                'Items': [{'Item Name': 'Ticket', 'Item Price': total}],
+            })
+            receipt.save()
+            receipts.append(receipt)
+        items = ReceiptItem.objects.bulk_create([item for receipt in receipts for item in receipt.build_items()])
+        MonthlySpendRollup.add_receipts(receipts, items)
+
+    def test_sync_and_async_payloads_match(self):
+        sync = self.client.get('/api/tracker/', {'year': 2024, 'month': 3})
+        asynchronous = self.client.get('/api/async/tracker/', {'year': 2024, 'month': 3})
+
+        self.assertEqual(sync.status_code, 200)
+        self.assertEqual(asynchronous.status_code, 200)
+        self.assertEqual(sync.json(), asynchronous.json())
+        self.assertEqual(asynchronous.json()['total_spent'], 42.75)
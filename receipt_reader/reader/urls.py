@@ -1,16 +1,36 @@
-from django.urls import path
+from django.urls import path, re_path
+from .async_views import AsyncChatbotView, AsyncExpenseTrackerView, AsyncReceiptProcessView, DashboardEventsView
 from .views import (
     ReceiptProcessView,
+    ReceiptBatchProcessView,
+    ReceiptJobStatusView,
+    ReceiptListView,
     ChatbotView,
+    ChatbotStreamView,
     ExpenseReportView,
     BudgetView,
-    ExpenseTrackerView
+    ExpenseTrackerView,
+    DashboardView,
+    ExportView,
+    AnalyticsView
 )
 
 urlpatterns = [
     path('process/', ReceiptProcessView.as_view(), name='receipt-process'),
+    path('process/batch/', ReceiptBatchProcessView.as_view(), name='receipt-batch-process'),
+    path('process/<int:job_id>/', ReceiptJobStatusView.as_view(), name='receipt-job-status'),
+    path('receipts/', ReceiptListView.as_view(), name='receipt-list'),
     path('chatbot/', ChatbotView.as_view(), name='chatbot'),
+    path('chatbot/stream/', ChatbotStreamView.as_view(), name='chatbot-stream'),
     path('expense-report/', ExpenseReportView.as_view(), name='expense-report'),
     path('budget/', BudgetView.as_view(), name='budget-manager'),
     path('tracker/', ExpenseTrackerView.as_view(), name='expense-tracker'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('events/', DashboardEventsView.as_view(), name='dashboard-events'),
+    # Async variants of the model-bound endpoints, for ASGI deployments
+    path('async/process/', AsyncReceiptProcessView.as_view(), name='async-receipt-process'),
+    path('async/chatbot/', AsyncChatbotView.as_view(), name='async-chatbot'),
+    path('async/tracker/', AsyncExpenseTrackerView.as_view(), name='async-expense-tracker'),
+    re_path(r'^export/(?P<kind>receipts|items)\.(?P<format>csv|jsonl)$', ExportView.as_view(), name='export'),
 ]
\ No newline at end of file
@@ -1,23 +1,40 @@
-import google.generativeai as genai
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import ReceiptSerializer, MonthlyBudgetSerializer
-import os
-from dotenv import load_dotenv
+from rest_framework.renderers import JSONRenderer
+from .serializers import ReceiptSerializer, MonthlyBudgetSerializer, ReceiptJobSerializer
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+import hashlib
+import itertools
 import json
-from .models import Receipt, MonthlyBudget
-from datetime import datetime
+import math
+from .models import Receipt, MonthlyBudget, ReceiptJob, ReceiptItem, MonthlySpendRollup
+from datetime import datetime, timedelta
 from decimal import Decimal
-from collections import defaultdict
-# --- IMPORT BOTH AGENTS ---
-from .agents import ReceiptScanningAgent, ChatbotAgent
-
-load_dotenv()
-
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
+# --- AGENTS ARE SHARED PROCESS-WIDE VIA THE REGISTRY ---
+from .agents import ChatbotAgent
+from .batch import BatchError, iter_archive_images, process_batch
+from .chat_context import build_chat_context
+from .conversations import InvalidSession, get_conversation, prompt_history, record_exchange
+from . import analytics
+from .dashboard import get_dashboard
+from .intents import route as route_question
+from .export import CONTENT_TYPES, filtered_queryset, stream_export
+from .jobs import enqueue_receipt
+from . import metrics
+from .llm import get_agent
+from .pagination import ReceiptCursorPagination
+from .renderers import CSVRenderer, EventStreamRenderer, JSONLinesRenderer
+from .resilience import ModelUnavailable
+from .parsing import month_bounds
+from .suggestions import get_suggestion, overspend_item
 
 def home_view(request):
     """
@@ -26,71 +43,271 @@ def home_view(request):
     return render(request, 'index.html')
 
 
+def metrics_view(request):
+    """
+    Serves this process's metrics in the Prometheus text format.
+    """
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class ReceiptProcessView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = ReceiptSerializer(data=request.data)
         if serializer.is_valid():
             receipt_instance = serializer.save()
-            image_path = receipt_instance.image.path
-
-            try:
-                agent = ReceiptScanningAgent()
-                json_response = agent.process_receipt(image_path)
-                receipt_instance.json_data = json_response
-                receipt_instance.category = json_response.get('Category', 'Other')
-                receipt_instance.save()
-                return Response(ReceiptSerializer(receipt_instance).data, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                return Response({'error': f"An error occurred during processing: {str(e)}"},
-                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            # Extraction runs on the worker pool; the client polls the job for the result
+            job = enqueue_receipt(receipt_instance)
+            data = ReceiptJobSerializer(job, context={'request': request}).data
+            data['status_url'] = reverse('receipt-job-status', kwargs={'job_id': job.id})
+            return Response(data, status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ReceiptBatchProcessView(APIView):
+    """
+    Accepts many `images` or a ZIP `archive`, extracts them over a bounded pool and
+    returns a result or an error for every file.
+    """
+    def post(self, request, *args, **kwargs):
+        images = request.FILES.getlist('images')
+        archive = request.FILES.get('archive')
+        if not images and not archive:
+            return Response({'error': 'Upload one or more images or a ZIP archive.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        named_files = [(image.name, image) for image in images]
+        try:
+            if archive:
+                named_files = itertools.chain(named_files, iter_archive_images(archive))
+            items = process_batch(named_files)
+        except BatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [
+            {
+                'filename': item.filename,
+                'status': 'failed' if item.error else 'created',
+                'error': item.error,
+                'receipt': ReceiptSerializer(item.receipt, context={'request': request}).data if item.receipt else None,
+            }
+            for item in items
+        ]
+        failed = sum(1 for item in items if item.error)
+        return Response(
+            {'created': len(items) - failed, 'failed': failed, 'results': results},
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_201_CREATED
+        )
+
+
+class ReceiptJobStatusView(APIView):
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = ReceiptJob.objects.select_related('receipt').get(pk=job_id)
+        except ReceiptJob.DoesNotExist:
+            return Response({'error': 'Job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ReceiptJobSerializer(job, context={'request': request}).data)
+
+
 class ReceiptListView(APIView):
     def get(self, request, *args, **kwargs):
-        receipts = Receipt.objects.all().order_by('-uploaded_at')
-        serializer = ReceiptSerializer(receipts, many=True)
-        return Response(serializer.data)
+        # The list is unchanged unless a receipt was added, edited or deleted. There is no
+        # Last-Modified: a delete does not move Max(updated_at), only the count in the ETag
+        stats = Receipt.objects.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        etag = quote_etag(hashlib.md5(
+            f"{stats['last_modified']}:{stats['count']}:{request.GET.urlencode()}".encode()
+        ).hexdigest())
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        fields = request.query_params.get('fields')
+        fields = [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+        if fields is not None:
+            unknown = set(fields) - set(ReceiptSerializer.Meta.fields)
+            if unknown:
+                return Response({'error': f"Unknown fields: {', '.join(sorted(unknown))}."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        include_items = request.query_params.get('include_items', 'true').lower() not in ('0', 'false', 'no')
+
+        receipts = Receipt.objects.all()
+        if fields is not None:
+            # Only load the projected columns (plus the cursor keys)
+            receipts = receipts.only(*(set(fields) | {'id', 'uploaded_at'}))
+
+        paginator = ReceiptCursorPagination()
+        page = paginator.paginate_queryset(receipts, request, view=self)
+        serializer = ReceiptSerializer(page, many=True, fields=fields, include_items=include_items,
+                                       context={'request': request})
+        response = paginator.get_paginated_response(serializer.data)
+
+        response['ETag'] = etag
+        return response
 
 
 # --- UPDATED CHATBOT VIEW USING THE NEW AGENT ---
 class ChatbotView(APIView):
+    """
+    Answers one chat message. The conversation is kept server-side: send the `session_id` from
+    the previous answer along with the new `query`, or none to start a new conversation.
+    """
     def post(self, request, *args, **kwargs):
         query = request.data.get('query')
-        history = request.data.get('history', [])
 
         if not query:
             return Response({'error': 'A query is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # 1. Gather all necessary data
-            receipts = Receipt.objects.all().order_by('-uploaded_at')
-            receipts_data = "[]"
-            if receipts.exists():
-                serializer = ReceiptSerializer(receipts, many=True)
-                receipts_data = json.dumps(serializer.data)
+            conversation = get_conversation(request.data.get('session_id'))
+        except InvalidSession as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 0. Plain aggregate questions are answered straight from the database
+        with metrics.phase('fast_path'):
+            answer = route_question(query)
+        if answer is not None:
+            record_exchange(conversation, query, answer)
+            return Response({'response': answer, 'session_id': conversation.session_id})
+
+        try:
+            # 1. Gather only the receipts and aggregates relevant to the question, within the token budget
+            with metrics.phase('context'):
+                context = build_chat_context(query)
+                summary, history = prompt_history(conversation)
+            receipts_data = context.text
 
             # 2. Instantiate the new, specialized agent
-            agent = ChatbotAgent()
+            agent = get_agent(ChatbotAgent)
 
             # 3. Delegate the entire conversation logic to the agent
-            response_text = agent.get_response(query, history, receipts_data)
+            response_text = agent.get_response(query, history, receipts_data, summary)
+            if response_text != ChatbotAgent.ERROR_MESSAGE:
+                record_exchange(conversation, query, response_text)
 
             # 4. Return the agent's response
-            return Response({'response': response_text})
+            return Response({'response': response_text, 'session_id': conversation.session_id})
 
+        except ModelUnavailable as e:
+            headers = {'Retry-After': str(max(1, math.ceil(e.retry_after or 1)))}
+            return Response({'error': str(e), 'response': ChatbotAgent.BUSY_MESSAGE,
+                             'session_id': conversation.session_id},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=headers)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _sse_event(event, data):
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _aiterate(iterator):
+    """Yields the items of a sync iterator, each read in this request's sync thread."""
+    done = object()
+    try:
+        while True:
+            item = await sync_to_async(next)(iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        # Run the generator's cleanup if the client went away mid-stream
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close)()
+
+
+def streaming_response(request, content, **kwargs):
+    """
+    A StreamingHttpResponse that streams under ASGI as well. Django's ASGI handler reads a
+    sync iterator to the end before sending anything, so there the chunks are handed over
+    one by one through an async generator.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _aiterate(iter(content))
+    return StreamingHttpResponse(content, **kwargs)
+
+
+def _single_event_stream(request, answer, session_id):
+    """A complete answer sent in the same event format as a streamed one."""
+    events = [_sse_event('token', {'text': answer}), _sse_event('done', {'response': answer, 'session_id': session_id})]
+    response = streaming_response(request, events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class ChatbotStreamView(APIView):
+    """
+    Streams the advisor's answer as Server-Sent Events: a 'token' event per chunk, then 'done'
+    with the full answer and the session_id to send with the next message.
+    The JSON ChatbotView is kept for clients that cannot read a stream.
+    """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def post(self, request, *args, **kwargs):
+        query = request.data.get('query')
+
+        if not query:
+            return Response({'error': 'A query is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            conversation = get_conversation(request.data.get('session_id'))
+        except InvalidSession as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with metrics.phase('fast_path'):
+            answer = route_question(query)
+        if answer is not None:
+            record_exchange(conversation, query, answer)
+            return _single_event_stream(request, answer, conversation.session_id)
+
+        try:
+            with metrics.phase('context'):
+                context = build_chat_context(query)
+                summary, history = prompt_history(conversation)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        agent = get_agent(ChatbotAgent)
+
+        def event_stream():
+            chunks = []
+            try:
+                for text in agent.stream_response(query, history, context.text, summary):
+                    chunks.append(text)
+                    yield _sse_event('token', {'text': text})
+                answer = ''.join(chunks)
+                if answer not in (ChatbotAgent.ERROR_MESSAGE, ChatbotAgent.BUSY_MESSAGE):
+                    record_exchange(conversation, query, answer)
+                yield _sse_event('done', {'response': answer, 'session_id': conversation.session_id})
+            except Exception as e:
+                yield _sse_event('error', {'error': str(e)})
+
+        response = streaming_response(request, event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx-style proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+def _item_summary(item):
+    """Formats a ReceiptItem the way the expense report has always returned items."""
+    if item is None:
+        return None
+    return {
+        'Item': item.name,
+        'Price': float(item.price),
+        'Merchant': item.merchant_name or 'N/A',
+        'Date': item.transaction_date.isoformat() if item.transaction_date else 'N/A'
+    }
+
+
 class ExpenseReportView(APIView):
     def get(self, request, *args, **kwargs):
-        all_receipts = Receipt.objects.all()
         start_date_str = request.query_params.get('start_date')
         end_date_str = request.query_params.get('end_date')
 
-        filtered_receipts = []
+        filtered_receipts = Receipt.objects.filter(json_data__isnull=False)
+        items = ReceiptItem.objects.all()
 
         if start_date_str and end_date_str:
             try:
@@ -100,60 +317,32 @@ class ExpenseReportView(APIView):
                 return Response({"error": "Invalid date format. Please use YYYY-MM-DD."},
                                 status=status.HTTP_400_BAD_REQUEST)
 
-            for receipt in all_receipts:
-                if receipt.json_data and 'Transaction Date' in receipt.json_data:
-                    date_str = receipt.json_data['Transaction Date']
-                    try:
-                        receipt_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        if start_date <= receipt_date <= end_date:
-                            filtered_receipts.append(receipt)
-                    except (ValueError, TypeError):
-                        continue
-        else:
-            filtered_receipts = all_receipts
-
-        if not filtered_receipts:
+            filtered_receipts = filtered_receipts.filter(transaction_date__range=(start_date, end_date))
+            items = items.filter(transaction_date__range=(start_date, end_date))
+
+        if not filtered_receipts.exists():
             return Response({"error": "No receipts found for the selected criteria."}, status=status.HTTP_404_NOT_FOUND)
 
-        most_expensive_item = None
-        least_expensive_item = None
-        max_price = -1
-        min_price = float('inf')
-
-        for receipt in filtered_receipts:
-            data = receipt.json_data
-            if data and 'Items' in data and isinstance(data['Items'], list):
-                for item in data['Items']:
-                    try:
-                        if isinstance(item, dict) and 'Price' in item and item['Price'] is not None:
-                            price = float(item['Price'])
-                            if price > max_price:
-                                max_price = price
-                                most_expensive_item = {
-                                    'Item': item.get('Item', 'N/A'),
-                                    'Price': price,
-                                    'Merchant': data.get('Merchant Name', 'N/A'),
-                                    'Date': data.get('Transaction Date', 'N/A')
-                                }
-                            if price < min_price:
-                                min_price = price
-                                least_expensive_item = {
-                                    'Item': item.get('Item', 'N/A'),
-                                    'Price': price,
-                                    'Merchant': data.get('Merchant Name', 'N/A'),
-                                    'Date': data.get('Transaction Date', 'N/A')
-                                }
-                    except (ValueError, TypeError):
-                        continue
-
-        if not most_expensive_item and not least_expensive_item:
+        most_expensive = items.order_by('-price', 'id').first()
+        least_expensive = items.order_by('price', 'id').first()
+
+        if not most_expensive and not least_expensive:
             return Response({"error": "Could not find any valid items in the selected receipts."},
                             status=status.HTTP_404_NOT_FOUND)
 
         report = {
-            'most_expensive': most_expensive_item,
-            'least_expensive': least_expensive_item
+            'most_expensive': _item_summary(most_expensive),
+            'least_expensive': _item_summary(least_expensive)
         }
+
+        top = request.query_params.get('top')
+        if top:
+            try:
+                top = max(1, min(int(top), 100))
+            except ValueError:
+                return Response({"error": "top must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+            report['top_items'] = [_item_summary(item) for item in items.order_by('-price', 'id')[:top]]
+
         return Response(report, status=status.HTTP_200_OK)
 
 
@@ -189,66 +378,159 @@ class ExpenseTrackerView(APIView):
         today = datetime.now()
         year = int(request.query_params.get('year', today.year))
         month = int(request.query_params.get('month', today.month))
+        # Only the most recent transactions are listed; the full month is available from /api/receipts/
+        recent = max(0, min(int(request.query_params.get('recent', 10)), 100))
 
         budget, _ = MonthlyBudget.objects.get_or_create(
             year=year, month=month,
             defaults={'limit': Decimal('10000.00')}
         )
 
-        monthly_receipts = []
-        total_spent = Decimal('0.00')
-        category_summary = defaultdict(Decimal)
-        most_expensive_item = {'Price': -1}
+        month_start, month_end = month_bounds(year, month)
+        recent_receipts = Receipt.objects.filter(
+            transaction_date__gte=month_start, transaction_date__lt=month_end
+        ).order_by('-uploaded_at', '-id')[:recent]
+
+        # Totals come from the rollup table: one row per category, however many receipts the month holds
+        with metrics.phase('totals'):
+            rollups = list(MonthlySpendRollup.objects.filter(year=year, month=month))
+
+        # The suggestion is computed in the background when the month goes over budget; never wait for the model here
+        with metrics.phase('suggestion'):
+            suggestion, suggestion_status = None, None
+            item_name = overspend_item(year, month, budget=budget, rollups=rollups)
+            if item_name:
+                suggestion, suggestion_status = get_suggestion(year, month, item_name)
 
+        with metrics.phase('serialize'):
+            response_data = tracker_payload(budget, rollups, recent_receipts, suggestion, suggestion_status)
 
-        all_receipts = Receipt.objects.filter(uploaded_at__year=year, uploaded_at__month=month).order_by('-uploaded_at')
+        return Response(response_data)
 
-        for receipt in all_receipts:
-            if receipt.json_data and 'Transaction Date' in receipt.json_data:
+
+def tracker_payload(budget, rollups, recent_receipts, suggestion, suggestion_status):
+    """
+    The tracker response, shared by the sync and async tracker views.
+    """
+    return {
+        'budget': MonthlyBudgetSerializer(budget).data,
+        'total_spent': sum((rollup.total for rollup in rollups), Decimal('0.00')),
+        'transactions': ReceiptSerializer(recent_receipts, many=True, include_items=False).data,
+        'transaction_count': sum(rollup.receipt_count for rollup in rollups),
+        'suggestion': suggestion,
+        'suggestion_status': suggestion_status,
+        'category_summary': {rollup.category: rollup.total for rollup in rollups}
+    }
+
+
+class DashboardView(APIView):
+    """
+    One cached payload for the home and tracker pages: month total, recent transactions,
+    category summary, weekly sparkline, budget and the overspend suggestion.
+    """
+    def get(self, request, *args, **kwargs):
+        today = datetime.now()
+        year = int(request.query_params.get('year', today.year))
+        month = int(request.query_params.get('month', today.month))
+        recent = request.query_params.get('recent')
+        recent = max(0, min(int(recent), 100)) if recent is not None else None
+
+        # The time-of-day part of the greeting is left to the browser's clock; the server runs on UTC
+        response_data = dict(get_dashboard(year, month, recent), greeting={'name': 'User', 'today': today.date()})
+        return Response(response_data)
+
+
+class ExportView(APIView):
+    """
+    Streams receipts or line items as CSV or JSON Lines, picked by the URL suffix
+    (/api/export/items.csv). Optional filters: start_date, end_date (YYYY-MM-DD, inclusive)
+    and category, which may be repeated or comma separated. Rows are read in keyset pages,
+    so a year of data exports in constant memory and the header goes out straight away.
+    """
+    renderer_classes = [CSVRenderer, JSONLinesRenderer]
+
+    def get(self, request, kind, *args, **kwargs):
+        dates = {}
+        for param in ('start_date', 'end_date'):
+            value = request.query_params.get(param)
+            if value:
                 try:
-                    receipt_date = datetime.strptime(receipt.json_data['Transaction Date'], '%Y-%m-%d').date()
-                    if receipt_date.year == year and receipt_date.month == month:
-                        monthly_receipts.append(receipt)
-                        total = Decimal(str(receipt.json_data.get('Total Amount', 0)))
-                        total_spent += total
-                        category_summary[receipt.category or 'Other'] += total
-
-
-                        if 'Items' in receipt.json_data and isinstance(receipt.json_data['Items'], list):
-                            for item in receipt.json_data['Items']:
-                                if isinstance(item, dict) and 'Price' in item and item['Price'] is not None:
-                                    price = float(item['Price'])
-                                    if price > most_expensive_item['Price']:
-                                        most_expensive_item = {
-                                            'Item': item.get('Item', 'N/A'),
-                                            'Price': price
-                                        }
-                except (ValueError, TypeError):
-                    continue
-
-        suggestion = None
-        if total_spent > budget.limit and most_expensive_item['Price'] > 0:
-            try:
-                search_query = f"price for {most_expensive_item['Item']} in India"
-                model = genai.GenerativeModel("gemini-1.5-flash")
-                prompt = f"""
-                A user has overspent their budget. Their most expensive purchase was "{most_expensive_item['Item']}".
-                Perform a quick web search to find a better price or deal for this item.
-                Summarize your findings in a short, helpful suggestion. For example: "You could save money on this. I found it for a lower price at [Store/Website]."
-                Provide a single, concise paragraph.
-                """
-                response = model.generate_content(prompt)
-                suggestion = response.text.strip()
-            except Exception as e:
-                suggestion = f"Could not fetch suggestions at this time. Error: {str(e)}"
-
-        response_data = {
-            'budget': MonthlyBudgetSerializer(budget).data,
-            'total_spent': total_spent,
-            'transactions': ReceiptSerializer(monthly_receipts, many=True).data,
-            'suggestion': suggestion,
-            'category_summary': category_summary
-        }
+                    dates[param] = datetime.strptime(value, '%Y-%m-%d').date()
+                except ValueError:
+                    return Response({"error": "Invalid date format. Please use YYYY-MM-DD."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+        categories = [category.strip() for value in request.query_params.getlist('category')
+                      for category in value.split(',') if category.strip()]
+
+        file_format = request.accepted_renderer.format
+        queryset = filtered_queryset(kind, dates.get('start_date'), dates.get('end_date'), categories)
+        filename = '-'.join([kind] + [str(dates[param]) for param in ('start_date', 'end_date') if param in dates])
+
+        response = streaming_response(request, stream_export(kind, file_format, queryset),
+                                      content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 
+class AnalyticsView(APIView):
+    """
+    Spend trends over a date range: daily and weekly series, per-category moving averages,
+    outlier transactions, and the month-end projection against the budget.
+
+    Query parameters: start_date and end_date (YYYY-MM-DD, inclusive; the last 90 days by default),
+    category (limits the daily and weekly series), window (moving average days, default 7), and
+    year/month for the projection (the current month by default).
+    """
+    MAX_DAYS = 3660
 
-        return Response(response_data)
\ No newline at end of file
+    def get(self, request, *args, **kwargs):
+        today = datetime.now().date()
+        try:
+            end = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d').date() \
+                if request.query_params.get('end_date') else today
+            start = datetime.strptime(request.query_params['start_date'], '%Y-%m-%d').date() \
+                if request.query_params.get('start_date') else end - timedelta(days=89)
+        except ValueError:
+            return Response({"error": "Invalid date format. Please use YYYY-MM-DD."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        end += timedelta(days=1)
+        if start >= end or (end - start).days > self.MAX_DAYS:
+            return Response({"error": f"start_date must be on or before end_date, at most {self.MAX_DAYS} days apart."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            window = max(1, min(int(request.query_params.get('window', 7)), 90))
+            year = int(request.query_params.get('year', today.year))
+            month = int(request.query_params.get('month', today.month))
+        except ValueError:
+            return Response({"error": "window, year and month must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= month <= 12:
+            return Response({"error": "month must be between 1 and 12."}, status=status.HTTP_400_BAD_REQUEST)
+        # Dates end in 9999, and the projection also needs the first day of the following month
+        if not 1 <= year <= 9998:
+            return Response({"error": "year must be between 1 and 9998."}, status=status.HTTP_400_BAD_REQUEST)
+        category = request.query_params.get('category') or None
+
+        with metrics.phase('load'):
+            columns = analytics.get_columns()
+        budget = MonthlyBudget.objects.filter(year=year, month=month).first()
+
+        with metrics.phase('compute'):
+            flagged = analytics.outliers(columns, start, end)
+            response_data = {
+                'start_date': start,
+                'end_date': end - timedelta(days=1),
+                'receipts': int(columns.window(start, end, category).sum()),
+                'daily': analytics.daily_series(columns, start, end, category),
+                'weekly': analytics.weekly_series(columns, start, end, category),
+                'moving_averages': analytics.moving_averages(columns, start, end, window),
+                'projection': analytics.month_projection(columns, year, month, budget.limit if budget else None, today),
+            }
+
+        merchants = dict(Receipt.objects.filter(id__in=[row[0] for row in flagged]).values_list('id', 'merchant_name'))
+        response_data['outliers'] = [
+            {'id': receipt_id, 'merchant_name': merchants.get(receipt_id), 'category': category_name,
+             'transaction_date': day, 'total_amount': round(amount / 100, 2), 'score': score}
+            for receipt_id, category_name, day, amount, score in flagged
+        ]
+        return Response(response_data)
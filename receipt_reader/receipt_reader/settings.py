@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reader.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -136,4 +137,135 @@ MEDIA_ROOT = (
 BASE_DIR
 )
 
-MEDIA_URL = '/media/'
\ No newline at end of file
+MEDIA_URL = '/media/'
+
+
+# Receipt extraction queue
+# Uploads are queued as ReceiptJob rows and drained by a bounded pool of worker threads.
+# Set RECEIPT_WORKER_AUTOSTART to False when running `manage.py run_receipt_workers` separately.
+RECEIPT_WORKER_AUTOSTART = True
+RECEIPT_WORKER_THREADS = 4
+RECEIPT_WORKER_POLL_INTERVAL = 2.0
+RECEIPT_JOB_TIMEOUT = 600
+# Jobs left running past RECEIPT_JOB_TIMEOUT by a dead worker are requeued this often
+RECEIPT_JOB_REQUEUE_INTERVAL = 60
+
+# Extraction cache
+# Results are keyed by image hash, prompt and model. The optional perceptual hash also matches
+# re-encoded or resized copies, but receipts look alike at 8x8 so it is off unless opted in.
+RECEIPT_EXTRACTION_CACHE_MAX_ENTRIES = 5000
+RECEIPT_EXTRACTION_CACHE_PERCEPTUAL_HASH = False
+
+# Chatbot context
+# Receipts are compacted into a table and only the most relevant ones are sent, up to this many tokens.
+CHATBOT_CONTEXT_TOKEN_BUDGET = 4000
+CHATBOT_CONTEXT_ITEMS_PER_RECEIPT = 5
+
+# Gemini SDK
+# Imported lazily on the first model call. Point this at a module with the same API to swap in a stand-in.
+GENAI_MODULE = 'google.generativeai'
+
+# Image preprocessing
+# Receipts are rotated, cropped, downscaled and re-encoded before they are sent to the model;
+# the stored original is left untouched. Images up to RECEIPT_INLINE_IMAGE_MAX_BYTES go inline.
+RECEIPT_IMAGE_PREPROCESSING = True
+RECEIPT_IMAGE_MAX_DIMENSION = 1600
+RECEIPT_IMAGE_GRAYSCALE = True
+RECEIPT_IMAGE_CROP = True
+RECEIPT_IMAGE_FORMAT = 'JPEG'
+RECEIPT_IMAGE_QUALITY = 80
+RECEIPT_INLINE_IMAGE_MAX_BYTES = 4 * 1024 * 1024
+
+# Batch uploads
+# Uploads above FILE_UPLOAD_MAX_MEMORY_SIZE (2.5 MB by default) are streamed to a temporary file,
+# and ZIP members are decompressed one at a time straight into storage.
+RECEIPT_BATCH_PARALLELISM = 4
+RECEIPT_BATCH_MAX_FILES = 500
+RECEIPT_BATCH_MAX_FILE_BYTES = 20 * 1024 * 1024
+DATA_UPLOAD_MAX_NUMBER_FILES = RECEIPT_BATCH_MAX_FILES
+
+# Overspend price suggestions
+# Computed in the background when a month goes over budget and kept per month and item for
+# PRICE_SUGGESTION_TTL seconds. Failed lookups are retried after PRICE_SUGGESTION_RETRY_AFTER.
+PRICE_SUGGESTION_WORKERS = 1
+PRICE_SUGGESTION_TTL = 24 * 60 * 60
+PRICE_SUGGESTION_RETRY_AFTER = 5 * 60
+PRICE_SUGGESTION_PENDING_TIMEOUT = 5 * 60
+
+# Cache
+# Local memory by default. In production point DJANGO_CACHE_BACKEND at a shared backend, e.g.
+# django.core.cache.backends.redis.RedisCache with DJANGO_CACHE_LOCATION=redis://host:6379/1,
+# so every worker sees the same entries and invalidations.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'smart-receipts'),
+    }
+}
+
+# Dashboard
+# The home and tracker pages share one cached payload, dropped whenever receipts or budgets change.
+DASHBOARD_CACHE_TIMEOUT = 300
+DASHBOARD_RECENT_TRANSACTIONS = 3
+
+# Metrics
+# Prometheus-format counters and histograms are served at /metrics, per process. Requests slower
+# than SLOW_REQUEST_THRESHOLD seconds are logged with a per-phase timing breakdown.
+SLOW_REQUEST_THRESHOLD = 1.0
+
+# Extraction cascade
+# Models are tried in order, cheapest first. An answer is accepted when it passes schema and
+# totals validation and fills at least this share of merchant, date, total and items.
+RECEIPT_EXTRACTION_TIERS = ['gemini-2.5-flash-lite', 'gemini-2.5-flash']
+RECEIPT_EXTRACTION_MIN_CONFIDENCE = 0.75
+
+# Gemini rate limiting, retries and circuit breaker
+# Every process draws from one token bucket per model, stored in the database. Retryable errors
+# (429/5xx, timeouts) are retried with full-jitter exponential backoff; after enough consecutive
+# failures the circuit opens and calls fail fast for GEMINI_CIRCUIT_COOLDOWN seconds.
+GEMINI_RATE_LIMIT_PER_MINUTE = 60
+GEMINI_RATE_LIMIT_BURST = 10
+GEMINI_RATE_LIMIT_MAX_WAIT = 30
+GEMINI_MAX_RETRIES = 4
+GEMINI_BACKOFF_BASE = 0.5
+GEMINI_BACKOFF_MAX = 20
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = 5
+GEMINI_CIRCUIT_COOLDOWN = 30
+RECEIPT_JOB_MAX_ATTEMPTS = 5
+
+# Receipt image storage
+# Images and thumbnails are stored under the SHA-256 of their content in hash-prefixed directories,
+# so identical uploads share one file. Thumbnails are made at ingestion for list views.
+RECEIPT_THUMBNAIL_SIZE = 320
+RECEIPT_THUMBNAIL_FORMAT = 'JPEG'
+RECEIPT_THUMBNAIL_QUALITY = 70
+
+# Chatbot conversation memory
+# Conversations are stored server-side per session. Once the turns not yet summarized pass either
+# limit, all but the most recent CHATBOT_HISTORY_RECENT_TURNS are folded into a rolling summary in
+# the background, so each prompt carries the summary plus a bounded window of recent turns.
+# A conversation is stored with its first answer and pruned after CHATBOT_CONVERSATION_RETENTION idle seconds.
+CHATBOT_HISTORY_MAX_TURNS = 12
+CHATBOT_HISTORY_MAX_TOKENS = 1500
+CHATBOT_HISTORY_RECENT_TURNS = 4
+CHATBOT_SUMMARY_WORKERS = 1
+CHATBOT_CONVERSATION_RETENTION = 30 * 24 * 3600
+
+# Chatbot fast path
+# Sum, count and "biggest purchase/item" questions by category, merchant and date are answered from
+# the database without a model call. Everything else goes to the model.
+CHATBOT_FAST_PATH = True
+
+# Live dashboard events
+# Receipt, category total and budget changes are stored as events and streamed from /api/events/.
+# Each stream polls every DASHBOARD_EVENTS_POLL_INTERVAL seconds and ends after
+# DASHBOARD_EVENTS_STREAM_SECONDS; the browser reconnects and resumes from its last event id.
+# Under WSGI a stream holds a worker thread, so it ends after DASHBOARD_EVENTS_WSGI_STREAM_SECONDS.
+# Events after a missing id wait up to DASHBOARD_EVENTS_GAP_GRACE seconds for it to commit.
+# Events older than DASHBOARD_EVENTS_RETENTION seconds are pruned.
+DASHBOARD_EVENTS_POLL_INTERVAL = 1.0
+DASHBOARD_EVENTS_HEARTBEAT = 15
+DASHBOARD_EVENTS_STREAM_SECONDS = 300
+DASHBOARD_EVENTS_WSGI_STREAM_SECONDS = 5
+DASHBOARD_EVENTS_GAP_GRACE = 2.0
+DASHBOARD_EVENTS_RETENTION = 3600
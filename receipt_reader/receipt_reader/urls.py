@@ -5,7 +5,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from reader.views import home_view
+from reader.views import home_view, metrics_view
 
 urlpatterns = [
     # Root URL now points to the home_view to render index.html
@@ -13,6 +13,9 @@ urlpatterns = [
 
     path('admin/', admin.site.urls),
 
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
+
     # All API endpoints are now under /api/
     path('api/', include('reader.urls')),
 